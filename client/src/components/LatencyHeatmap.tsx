@@ -0,0 +1,73 @@
+import { useEffect, useRef } from 'react';
+import { useQuery } from '@tanstack/react-query';
+import { LatencyHeatmap as LatencyHeatmapData, TimeRange } from '../types/observability';
+
+interface LatencyHeatmapProps {
+  serviceName: string;
+  timeRange: TimeRange;
+  height?: number;
+}
+
+const formatMs = (ms: number) => (ms >= 1000 ? `${(ms / 1000).toFixed(1)}s` : `${ms.toFixed(ms < 10 ? 1 : 0)}ms`);
+
+export function LatencyHeatmap({ serviceName, timeRange, height = 200 }: LatencyHeatmapProps) {
+  const canvasRef = useRef<HTMLCanvasElement>(null);
+
+  const { data: heatmap } = useQuery<LatencyHeatmapData>({
+    queryKey: ['heatmap', serviceName, timeRange],
+    queryFn: async () => {
+      const response = await fetch(`/api/services/${serviceName}/heatmap?time_range=${timeRange}`, {
+        credentials: 'include',
+      });
+      if (!response.ok) {
+        throw new Error('Failed to fetch latency heatmap');
+      }
+      return response.json();
+    },
+    enabled: !!serviceName,
+  });
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    if (!canvas || !heatmap) return;
+    const context = canvas.getContext('2d');
+    if (!context) return;
+
+    const width = canvas.clientWidth;
+    canvas.width = width;
+    canvas.height = height;
+    context.clearRect(0, 0, width, height);
+
+    const steps = heatmap.counts.length;
+    const buckets = heatmap.bucket_lower_ms.length;
+    if (!steps || !buckets || !heatmap.max_count) return;
+
+    // Log color scale so sparse tail buckets stay visible next to the dense body.
+    const scale = Math.log1p(heatmap.max_count);
+    const cellWidth = width / steps;
+    const cellHeight = height / buckets;
+    heatmap.counts.forEach((column, step) => {
+      column.forEach((count, bucket) => {
+        if (!count) return;
+        const intensity = Math.log1p(count) / scale;
+        context.fillStyle = `hsla(160, 60%, ${70 - intensity * 40}%, ${0.25 + intensity * 0.75})`;
+        context.fillRect(step * cellWidth, height - (bucket + 1) * cellHeight, Math.ceil(cellWidth), Math.ceil(cellHeight));
+      });
+    });
+  }, [heatmap, height]);
+
+  if (!heatmap) {
+    return <div className="text-sm text-muted-foreground">Loading heatmap...</div>;
+  }
+
+  const buckets = heatmap.bucket_lower_ms.length;
+  return (
+    <div className="flex gap-2">
+      <div className="flex flex-col justify-between text-xs text-muted-foreground" style={{ height }}>
+        <span>{buckets ? formatMs(heatmap.bucket_upper_ms[buckets - 1]) : ''}</span>
+        <span>{buckets ? formatMs(heatmap.bucket_lower_ms[0]) : ''}</span>
+      </div>
+      <canvas ref={canvasRef} className="flex-1 w-full" style={{ height }} />
+    </div>
+  );
+}
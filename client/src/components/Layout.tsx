@@ -75,6 +75,7 @@ export function Layout({ children, selectedTrace, setSelectedTrace }: LayoutProp
             serviceName={selectedService}
             timeRange={timeRange}
             onClose={() => setSelectedService(null)}
+            onTraceSelect={(traceId) => setSelectedTrace(traceId)}
           />
         )}
 
@@ -2,7 +2,8 @@ import { useState } from 'react';
 import { useQuery } from '@tanstack/react-query';
 import { X, ArrowRight, ArrowLeft } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
-import { ServiceMetricsDetail, TimeRange } from '../types/observability';
+import { LatencyHeatmap } from './LatencyHeatmap';
+import { MetricsTimeSeries, ServiceMetricsDetail, TimeRange } from '../types/observability';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 
 interface DependencyInfo {
@@ -21,9 +22,10 @@ interface ServiceDetailPanelProps {
   serviceName: string;
   timeRange: TimeRange;
   onClose: () => void;
+  onTraceSelect?: (traceId: string) => void;
 }
 
-export function ServiceDetailPanel({ serviceName, timeRange, onClose }: ServiceDetailPanelProps) {
+export function ServiceDetailPanel({ serviceName, timeRange, onClose, onTraceSelect }: ServiceDetailPanelProps) {
   const { data: metrics, isLoading, error } = useQuery<ServiceMetricsDetail>({
     queryKey: ['metrics', serviceName, timeRange],
     queryFn: async () => {
@@ -53,6 +55,14 @@ export function ServiceDetailPanel({ serviceName, timeRange, onClose }: ServiceD
     enabled: !!serviceName,
   });
 
+  // Clicking a point on the latency chart opens that minute's slowest exemplar trace.
+  const openExemplar = (point: MetricsTimeSeries | undefined) => {
+    const exemplar = point?.exemplars?.[0];
+    if (exemplar && onTraceSelect) {
+      onTraceSelect(exemplar.trace_id);
+    }
+  };
+
   const getChangeIndicator = (current: number, baseline: number) => {
     const change = ((current - baseline) / baseline) * 100;
     if (Math.abs(change) < 1) return { text: '~', color: 'text-muted-foreground' };
@@ -172,7 +182,7 @@ export function ServiceDetailPanel({ serviceName, timeRange, onClose }: ServiceD
               </CardHeader>
               <CardContent>
                 <ResponsiveContainer width="100%" height={200}>
-                  <LineChart data={metrics.trends}>
+                  <LineChart data={metrics.trends} onClick={(state) => openExemplar(metrics.trends[Number(state.activeTooltipIndex)])} style={{ cursor: onTraceSelect ? 'pointer' : undefined }}>
                     <CartesianGrid strokeDasharray="3 3" stroke="hsl(var(--border))" />
                     <XAxis 
                       dataKey="timestamp" 
@@ -195,6 +205,15 @@ export function ServiceDetailPanel({ serviceName, timeRange, onClose }: ServiceD
               </CardContent>
             </Card>
 
+            <Card>
+              <CardHeader>
+                <CardTitle>Latency Heatmap</CardTitle>
+              </CardHeader>
+              <CardContent>
+                <LatencyHeatmap serviceName={serviceName} timeRange={timeRange} />
+              </CardContent>
+            </Card>
+
             <Card>
               <CardHeader>
                 <CardTitle>Average Duration Trend</CardTitle>
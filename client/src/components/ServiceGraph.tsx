@@ -31,22 +31,31 @@ export function ServiceGraph({ data, onNodeClick }: ServiceGraphProps) {
 
     svg.call(zoom);
 
-    const simulation = d3.forceSimulation<GraphNode>(data.nodes)
-      .force('link', d3.forceLink<GraphNode, GraphEdge>(data.edges)
+    // Positions precomputed by the server are centred on the origin; start from them
+    // and skip the simulation entirely unless the user drags a node. Copies keep
+    // d3's in-place mutation away from the cached query data.
+    const hasLayout = data.nodes.every(d => d.x != null && d.y != null);
+    const nodes: GraphNode[] = data.nodes.map(d => hasLayout
+      ? { ...d, x: (d.x as number) + width / 2, y: (d.y as number) + height / 2 }
+      : { ...d });
+    const edges: GraphEdge[] = data.edges.map(d => ({ ...d }));
+
+    const simulation = d3.forceSimulation<GraphNode>(nodes)
+      .force('link', d3.forceLink<GraphNode, GraphEdge>(edges)
         .id(d => d.id)
         .distance(100))
       .force('charge', d3.forceManyBody().strength(-300))
       .force('center', d3.forceCenter(width / 2, height / 2))
       .force('collision', d3.forceCollide().radius(40));
 
-    const maxCallCount = d3.max(data.edges, d => d.callCount) || 1;
+    const maxCallCount = d3.max(edges, d => d.callCount) || 1;
     const edgeScale = d3.scaleLinear()
       .domain([0, maxCallCount])
       .range([1, 8]);
 
     const link = g.append('g')
       .selectAll('line')
-      .data(data.edges)
+      .data(edges)
       .join('line')
       .attr('stroke', 'hsl(var(--muted-foreground))')
       .attr('stroke-opacity', 0.4)
@@ -63,7 +72,7 @@ export function ServiceGraph({ data, onNodeClick }: ServiceGraphProps) {
 
     const node = g.append('g')
       .selectAll('circle')
-      .data(data.nodes)
+      .data(nodes)
       .join('circle')
       .attr('r', 20)
       .attr('fill', d => getNodeColor(d.health))
@@ -92,7 +101,7 @@ export function ServiceGraph({ data, onNodeClick }: ServiceGraphProps) {
 
     const label = g.append('g')
       .selectAll('text')
-      .data(data.nodes)
+      .data(nodes)
       .join('text')
       .text(d => d.id)
       .attr('font-size', 12)
@@ -101,7 +110,7 @@ export function ServiceGraph({ data, onNodeClick }: ServiceGraphProps) {
       .attr('fill', 'hsl(var(--foreground))')
       .style('pointer-events', 'none');
 
-    simulation.on('tick', () => {
+    const ticked = () => {
       link
         .attr('x1', (d: any) => d.source.x)
         .attr('y1', (d: any) => d.source.y)
@@ -115,7 +124,13 @@ export function ServiceGraph({ data, onNodeClick }: ServiceGraphProps) {
       label
         .attr('x', (d: any) => d.x)
         .attr('y', (d: any) => d.y);
-    });
+    };
+
+    simulation.on('tick', ticked);
+    if (hasLayout) {
+      simulation.stop();
+      ticked();
+    }
 
     return () => {
       simulation.stop();
@@ -0,0 +1,51 @@
+// Reads a coarse-then-exact NDJSON stream (`?progressive=true` endpoints).
+// Each line is {provisional, source, data[, age_seconds]} or, on failure, {provisional: false, error}.
+
+interface ProgressiveLine<T> {
+  provisional: boolean;
+  source?: string;
+  data?: T;
+  age_seconds?: number;
+  error?: string;
+}
+
+function describeSource<T>(line: ProgressiveLine<T>): string {
+  const source = line.source ?? 'unknown';
+  if (line.age_seconds === undefined) return source;
+  const minutes = Math.round(line.age_seconds / 60);
+  return minutes < 1 ? `${source}, under a minute old` : `${source}, ${minutes} min old`;
+}
+
+export async function fetchProgressive<T>(
+  url: string,
+  onProvisional: (data: T, source: string) => void,
+): Promise<T> {
+  const response = await fetch(url, { credentials: 'include' });
+  if (!response.ok || !response.body) {
+    const errorText = await response.text();
+    throw new Error(`Request failed: ${response.status} - ${errorText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    let newline = buffered.indexOf('\n');
+    while (newline >= 0) {
+      const text = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      newline = buffered.indexOf('\n');
+      if (!text) continue;
+      const line = JSON.parse(text) as ProgressiveLine<T>;
+      if (line.error) throw new Error(line.error);
+      if (line.provisional) {
+        onProvisional(line.data as T, describeSource(line));
+      } else {
+        return line.data as T;
+      }
+    }
+    if (done) throw new Error('Stream ended before the exact result');
+  }
+}
@@ -1,24 +1,31 @@
-import { useQuery } from '@tanstack/react-query';
+import { useState } from 'react';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 import { ServiceGraph } from '../components/ServiceGraph';
 import { useServiceContext } from '../contexts/ServiceContext';
 import { useTimeRange } from '../contexts/TimeRangeContext';
 import { DependencyGraph } from '../types/observability';
 import { apiClient } from '../fastapi_client';
+import { fetchProgressive } from '../lib/progressive';
 
 export function DependencyMapView() {
   const { timeRange } = useTimeRange();
   const { setSelectedService } = useServiceContext();
 
+  const queryClient = useQueryClient();
+  const [provisionalSource, setProvisionalSource] = useState<string | null>(null);
+
   const { data, isLoading, error } = useQuery<DependencyGraph>({
     queryKey: ['dependencies', timeRange],
     queryFn: async () => {
-      const response = await fetch(`/api/dependencies/graph?time_range=${timeRange}`, {
-        credentials: 'include',
-      });
-      if (!response.ok) {
-        throw new Error('Failed to fetch dependency graph');
-      }
-      return response.json();
+      const exact = await fetchProgressive<DependencyGraph>(
+        `/api/dependencies/graph?time_range=${timeRange}&progressive=true`,
+        (graph, source) => {
+          setProvisionalSource(source);
+          queryClient.setQueryData(['dependencies', timeRange], graph);
+        },
+      );
+      setProvisionalSource(null);
+      return exact;
     },
   });
 
@@ -32,6 +39,9 @@ export function DependencyMapView() {
         <h2 className="text-2xl font-bold text-foreground">Service Dependency Map</h2>
         <p className="text-sm text-muted-foreground">
           Visualize service relationships and health status
+          {provisionalSource && (
+            <span className="ml-2 italic">(provisional from {provisionalSource}, refining…)</span>
+          )}
         </p>
       </div>
 
@@ -1,9 +1,10 @@
 import { useState, useMemo } from 'react';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 import { ArrowUpDown, ArrowUp, ArrowDown } from 'lucide-react';
 import { ServiceHealth } from '../types/observability';
 import { useServiceContext } from '../contexts/ServiceContext';
 import { useTimeRange } from '../contexts/TimeRangeContext';
+import { fetchProgressive } from '../lib/progressive';
 
 type SortField = 'service_name' | 'health_status' | 'current_latency_p50' | 'current_latency_p95' | 'current_latency_p99' | 'error_rate' | 'request_count' | 'requests_per_second';
 type SortOrder = 'asc' | 'desc';
@@ -14,18 +15,22 @@ export function ServicesListView() {
   const [sortField, setSortField] = useState<SortField>('request_count');
   const [sortOrder, setSortOrder] = useState<SortOrder>('desc');
 
+  const queryClient = useQueryClient();
+  const [provisionalSource, setProvisionalSource] = useState<string | null>(null);
+
   const { data: services, isLoading, error } = useQuery<ServiceHealth[]>({
     queryKey: ['services', timeRange],
     queryFn: async () => {
-      const response = await fetch(`/api/services/list?time_range=${timeRange}`, {
-        credentials: 'include',
-      });
-      if (!response.ok) {
-        const errorText = await response.text();
-        console.error('API Error:', response.status, errorText);
-        throw new Error(`Failed to fetch services: ${response.status} - ${errorText}`);
-      }
-      return response.json();
+      // Paint a provisional list from rollups/cache/sampling, then swap in the exact one.
+      const exact = await fetchProgressive<ServiceHealth[]>(
+        `/api/services/list?time_range=${timeRange}&progressive=true`,
+        (data, source) => {
+          setProvisionalSource(source);
+          queryClient.setQueryData(['services', timeRange], data);
+        },
+      );
+      setProvisionalSource(null);
+      return exact;
     },
   });
 
@@ -82,6 +87,9 @@ export function ServicesListView() {
         <h2 className="text-2xl font-bold text-foreground">Services List</h2>
         <p className="text-sm text-muted-foreground">
           All services with performance metrics
+          {provisionalSource && (
+            <span className="ml-2 italic">(provisional from {provisionalSource}, refining…)</span>
+          )}
         </p>
       </div>
 
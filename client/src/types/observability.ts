@@ -1,3 +1,8 @@
+export interface ConfidenceInterval {
+  lower: number;
+  upper: number;
+}
+
 export interface MetricsSnapshot {
   latency_p50: number;
   latency_p95: number;
@@ -8,6 +13,9 @@ export interface MetricsSnapshot {
   error_rate: number;
   request_count: number;
   requests_per_second: number;
+  approximate?: boolean;
+  sample_fraction?: number | null;
+  confidence_intervals?: Record<string, ConfidenceInterval> | null;
 }
 
 export interface ServiceHealth {
@@ -22,6 +30,15 @@ export interface ServiceHealth {
   error_rate: number;
   request_count: number;
   requests_per_second: number;
+  approximate?: boolean;
+  sample_fraction?: number | null;
+  confidence_intervals?: Record<string, ConfidenceInterval> | null;
+}
+
+export interface Exemplar {
+  trace_id: string;
+  duration_ms: number;
+  is_error: boolean;
 }
 
 export interface MetricsTimeSeries {
@@ -30,6 +47,7 @@ export interface MetricsTimeSeries {
   avg_duration_ms: number;
   error_count: number;
   request_count: number;
+  exemplars?: Exemplar[];
 }
 
 export interface ServiceMetricsDetail {
@@ -56,17 +74,31 @@ export interface GraphNode {
   health: 'healthy' | 'warning' | 'critical';
   errorRate: number;
   requestCount: number;
+  isGroup?: boolean;
+  memberCount?: number;
+  group?: string | null;
+  x?: number | null;
+  y?: number | null;
 }
 
 export interface GraphEdge {
   source: string;
   target: string;
   callCount: number;
+  callsPerSecond?: number;
+  errorRate?: number;
+  avgLatency?: number;
+  latencyP50?: number;
+  latencyP95?: number;
+  latencyP99?: number;
 }
 
 export interface DependencyGraph {
   nodes: GraphNode[];
   edges: GraphEdge[];
+  hiddenNodes?: number;
+  hiddenEdges?: number;
+  layoutVersion?: string | null;
 }
 
 export interface WarehouseInfo {
@@ -76,3 +108,14 @@ export interface WarehouseInfo {
 }
 
 export type TimeRange = '15m' | '1h' | '24h';
+
+export interface LatencyHeatmap {
+  service_name: string;
+  start: string;
+  step_seconds: number;
+  timestamps: string[];
+  bucket_lower_ms: number[];
+  bucket_upper_ms: number[];
+  counts: number[][];
+  max_count: number;
+}
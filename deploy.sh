@@ -219,6 +219,7 @@ else
   npm run build > /dev/null 2>&1
 fi
 cd ..
+uv run python scripts/precompress_static.py
 echo "✅ Frontend build complete"
 print_timing "Frontend build completed"
 
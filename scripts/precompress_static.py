@@ -0,0 +1,70 @@
+"""Write brotli and gzip variants next to the compressible files of the client build."""
+
+import gzip
+import os
+from pathlib import Path
+
+import click
+
+COMPRESSIBLE = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.wasm', '.ico'}
+MIN_SIZE = 1024
+
+
+def brotli_compress():
+  """brotli.compress at maximum quality, or None when the optional `brotli` package is missing."""
+  try:
+    import brotli
+  except ImportError:
+    return None
+  return lambda data: brotli.compress(data, quality=11)
+
+
+def write_variant(source: Path, suffix: str, compressed: bytes, original_size: int) -> bool:
+  """Write the variant only if it is smaller; a stale larger one is removed."""
+  target = source.with_name(source.name + suffix)
+  if len(compressed) >= original_size:
+    target.unlink(missing_ok=True)
+    return False
+  temporary = target.with_name(f'.{target.name}.tmp')
+  temporary.write_bytes(compressed)
+  os.replace(temporary, target)
+  return True
+
+
+@click.command()
+@click.option('--build-dir', default='client/build', help='Directory produced by the frontend build')
+def main(build_dir: str) -> None:
+  """Precompress static assets so the server can send them without compressing per request."""
+  compress_br = brotli_compress()
+  if compress_br is None:
+    print('[precompress_static] brotli not installed; writing gzip variants only')
+
+  files = 0
+  original_total = 0
+  served_total = 0
+  for path in sorted(Path(build_dir).rglob('*')):
+    if not path.is_file() or path.suffix.lower() not in COMPRESSIBLE:
+      continue
+    data = path.read_bytes()
+    if len(data) < MIN_SIZE:
+      continue
+    files += 1
+    original_total += len(data)
+    smallest = len(data)
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    if write_variant(path, '.gz', gzipped, len(data)):
+      smallest = min(smallest, len(gzipped))
+    if compress_br is not None:
+      compressed = compress_br(data)
+      if write_variant(path, '.br', compressed, len(data)):
+        smallest = min(smallest, len(compressed))
+    served_total += smallest
+
+  print(
+    f'[precompress_static] {files} files, {original_total / 1024:.0f} KiB -> '
+    f'{served_total / 1024:.0f} KiB with the best encoding'
+  )
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,92 @@
+"""Measure app startup: import time per module and time to the first healthy /health."""
+
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import click
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_times(module: str) -> list[tuple[str, int, int, int]]:
+  """(module, self us, cumulative us, depth) for every import, from `python -X importtime`."""
+  result = subprocess.run(
+    [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  rows = []
+  for line in result.stderr.splitlines():
+    match = IMPORT_TIME_LINE.match(line)
+    if match:
+      self_us, cumulative_us, indent, name = match.groups()
+      rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+  return rows
+
+
+def free_port() -> int:
+  with socket.socket() as s:
+    s.bind(('127.0.0.1', 0))
+    return s.getsockname()[1]
+
+
+def time_to_healthy(app: str, timeout_seconds: float) -> float:
+  """Seconds from launching uvicorn to the first 200 from /health."""
+  port = free_port()
+  env = dict(os.environ, BACKGROUND_REFRESH_ENABLED=os.getenv('BACKGROUND_REFRESH_ENABLED', 'false'))
+  started = time.monotonic()
+  server = subprocess.Popen(
+    [sys.executable, '-m', 'uvicorn', app, '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+    env=env,
+  )
+  try:
+    while time.monotonic() - started < timeout_seconds:
+      if server.poll() is not None:
+        raise RuntimeError(f'uvicorn exited with code {server.returncode}')
+      try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+          if response.status == 200:
+            return time.monotonic() - started
+      except (urllib.error.URLError, ConnectionError):
+        pass
+      time.sleep(0.01)
+    raise TimeoutError(f'/health not healthy after {timeout_seconds}s')
+  finally:
+    server.terminate()
+    server.wait()
+
+
+@click.command()
+@click.option('--module', default='server.app', help='Module whose import is profiled')
+@click.option('--app', default='server.app:app', help='ASGI app started for the /health timing')
+@click.option('--top', default=25, help='Number of slowest imports to list')
+@click.option('--prefix', default='', help='Only list modules starting with this prefix, e.g. server.')
+@click.option('--runs', default=3, help='Server starts to time')
+@click.option('--timeout', default=60.0, help='Seconds to wait for /health per run')
+def main(module: str, app: str, top: int, prefix: str, runs: int, timeout: float) -> None:
+  """Report import time per module and time to first healthy /health."""
+  rows = import_times(module)
+  total = next((cumulative for name, _, cumulative, depth in rows if name == module and depth == 0), 0)
+  print(f'Importing {module}: {total / 1e6:.3f}s over {len(rows)} modules')
+  print(f'{"cumulative s":>12} {"self s":>8}  module')
+  listed = sorted((row for row in rows if row[0].startswith(prefix)), key=lambda row: -row[2])
+  for name, self_us, cumulative_us, depth in listed[:top]:
+    print(f'{cumulative_us / 1e6:12.3f} {self_us / 1e6:8.3f}  {"  " * depth}{name}')
+
+  timings = [time_to_healthy(app, timeout) for _ in range(runs)]
+  print(
+    f'\nTime to first healthy /health over {runs} runs: '
+    f'min {min(timings):.3f}s, median {statistics.median(timings):.3f}s, max {max(timings):.3f}s'
+  )
+
+
+if __name__ == '__main__':
+  main()
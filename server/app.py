@@ -1,5 +1,6 @@
 """FastAPI application for Databricks App Template."""
 
+import asyncio
 import os
 import logging
 from contextlib import asynccontextmanager
@@ -7,9 +8,24 @@ from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
+from server.config import ALERT_RULES_PATH, OTLP_RECEIVER_ENABLED, SLO_DEFINITIONS_PATH
 from server.routers import router
+from server.routers.otlp import router as otlp_router
+from server.services.alerts import alert_engine, load_alert_rules
+from server.services.background import refresher
+from server.services.edges import edge_rollups
+from server.services.health import health_engine
+from server.services.http_cache import ConditionalCompressionMiddleware
+from server.services.service_rollups import service_rollups
+from server.services.slo import load_slo_definitions, slo_ledger
+from server.services.static_assets import PrecompressedStaticFiles
+from server.services.top_traces import top_traces
+from server.services.trace_assembler import trace_assembler
+from server.services.trace_details import export_trace_details, restore_trace_details
+from server.services.trace_index import trace_index
+from server.services.warehouse_manager import warm_up
+from server.services.warm_start import warm_start
 
 logging.basicConfig(
     level=logging.INFO,
@@ -39,7 +55,30 @@ load_env_file('.env.local')
 @asynccontextmanager
 async def lifespan(app: FastAPI):
   """Manage application lifespan."""
+  # Health baselines index the service rollups, so they restore after them.
+  warm_start.register('service_rollups', service_rollups.export_state, service_rollups.restore_state)
+  warm_start.register('edge_rollups', edge_rollups.export_state, edge_rollups.restore_state)
+  warm_start.register('service_health', health_engine.export_state, health_engine.restore_state)
+  warm_start.register('trace_details', export_trace_details, restore_trace_details)
+  # First job, so snapshots are restored before the first refresh and it only loads what is newer.
+  refresher.register('warm_start', warm_start.refresh)
+  refresher.register('trace_index', trace_index.refresh)
+  refresher.register('top_traces', top_traces.refresh)
+  if OTLP_RECEIVER_ENABLED:
+    refresher.register('trace_assembler', trace_assembler.refresh)
+  refresher.register('edge_rollups', edge_rollups.refresh)
+  refresher.register('service_health', health_engine.refresh)
+  slo_ledger.load(load_slo_definitions(SLO_DEFINITIONS_PATH))
+  refresher.register('slo', slo_ledger.refresh)
+  alert_engine.load(load_alert_rules(ALERT_RULES_PATH))
+  refresher.register('alerts', alert_engine.refresh)
+  refresher.start()
+  # Build the warehouse client off the event loop, so /health answers while it connects.
+  warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
   yield
+  warm_up_task.cancel()
+  await refresher.stop()
+  await asyncio.to_thread(warm_start.shutdown)
 
 
 app = FastAPI(
@@ -61,10 +100,16 @@ app.add_middleware(
   allow_credentials=True,
   allow_methods=['*'],
   allow_headers=['*'],
+  expose_headers=['X-Next-Cursor', 'X-Settled-Until'],
 )
+app.add_middleware(ConditionalCompressionMiddleware)
 
 app.include_router(router, prefix='/api', tags=['api'])
 
+# OTLP exporters post to <endpoint>/v1/traces, so the receiver lives outside /api.
+if OTLP_RECEIVER_ENABLED:
+  app.include_router(otlp_router, tags=['otlp'])
+
 
 @app.get('/health')
 async def health():
@@ -79,4 +124,4 @@ async def health():
 # It catches all unmatched requests and serves the React app.
 # Any routes added after this will be unreachable!
 if os.path.exists('client/build'):
-  app.mount('/', StaticFiles(directory='client/build', html=True), name='static')
+  app.mount('/', PrecompressedStaticFiles(directory='client/build', html=True), name='static')
@@ -3,3 +3,59 @@ import os
 OBSERVABILITY_CATALOG = os.getenv("OBSERVABILITY_CATALOG", "jmr_demo")
 OBSERVABILITY_SCHEMA = os.getenv("OBSERVABILITY_SCHEMA", "zerobus")
 OBSERVABILITY_TABLE_PREFIX = f"{OBSERVABILITY_CATALOG}.{OBSERVABILITY_SCHEMA}"
+
+BACKGROUND_REFRESH_ENABLED = os.getenv("BACKGROUND_REFRESH_ENABLED", "true").lower() == "true"
+BACKGROUND_REFRESH_SECONDS = int(os.getenv("BACKGROUND_REFRESH_SECONDS", "30"))
+
+# The silver tables land minutes behind the exporters. Everything read from them
+# (trace index, rollups) re-reads this far behind its newest data before treating
+# it as final.
+WAREHOUSE_LATENESS_SECONDS = int(os.getenv("WAREHOUSE_LATENESS_SECONDS", "900"))
+
+TRACE_INDEX_WINDOW_SECONDS = int(os.getenv("TRACE_INDEX_WINDOW_SECONDS", "3600"))
+TRACE_INDEX_MAX_TRACES = int(os.getenv("TRACE_INDEX_MAX_TRACES", "200000"))
+TRACE_INDEX_LATENESS_SECONDS = int(os.getenv("TRACE_INDEX_LATENESS_SECONDS", str(WAREHOUSE_LATENESS_SECONDS)))
+
+TRACE_DETAIL_CACHE_SIZE = int(os.getenv("TRACE_DETAIL_CACHE_SIZE", "5000"))
+TRACE_DETAIL_TTL_SECONDS = int(os.getenv("TRACE_DETAIL_TTL_SECONDS", str(6 * 3600)))
+TRACE_DETAIL_PREFETCH_BATCH = int(os.getenv("TRACE_DETAIL_PREFETCH_BATCH", "200"))
+TRACE_ANALYSIS_MAX_SPANS = int(os.getenv("TRACE_ANALYSIS_MAX_SPANS", "20000"))
+
+ROLLUP_RETENTION_MINUTES = int(os.getenv("ROLLUP_RETENTION_MINUTES", str(24 * 60)))
+ROLLUP_LATENESS_MINUTES = int(os.getenv("ROLLUP_LATENESS_MINUTES", str(-(-WAREHOUSE_LATENESS_SECONDS // 60))))
+
+SLO_DEFINITIONS_PATH = os.getenv("SLO_DEFINITIONS_PATH", "slos.json")
+SLO_HISTORY_MINUTES = int(os.getenv("SLO_HISTORY_MINUTES", str(3 * 24 * 60)))
+
+ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "alert_rules.json")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+ALERT_LOG_PATH = os.getenv("ALERT_LOG_PATH", "alerts.jsonl")
+
+TOP_TRACES_K = int(os.getenv("TOP_TRACES_K", "20"))
+
+OTLP_RECEIVER_ENABLED = os.getenv("OTLP_RECEIVER_ENABLED", "false").lower() == "true"
+OTLP_MAX_BODY_BYTES = int(os.getenv("OTLP_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+# Bound on a gzipped export after decompression, so a small compressed body cannot exhaust memory.
+OTLP_MAX_DECODED_BYTES = int(os.getenv("OTLP_MAX_DECODED_BYTES", str(4 * OTLP_MAX_BODY_BYTES)))
+LIVE_SPAN_BUFFER_SECONDS = int(os.getenv("LIVE_SPAN_BUFFER_SECONDS", "900"))
+LIVE_SPAN_BUFFER_MAX_SPANS = int(os.getenv("LIVE_SPAN_BUFFER_MAX_SPANS", "500000"))
+TRACE_ASSEMBLER_INACTIVITY_SECONDS = int(os.getenv("TRACE_ASSEMBLER_INACTIVITY_SECONDS", "30"))
+TRACE_ASSEMBLER_LATENESS_SECONDS = int(os.getenv("TRACE_ASSEMBLER_LATENESS_SECONDS", "10"))
+TRACE_ASSEMBLER_MAX_OPEN_TRACES = int(os.getenv("TRACE_ASSEMBLER_MAX_OPEN_TRACES", "100000"))
+TRACE_ASSEMBLER_MAX_CLOSED_TRACES = int(os.getenv("TRACE_ASSEMBLER_MAX_CLOSED_TRACES", "50000"))
+
+APPROX_SAMPLE_PERCENT = float(os.getenv("APPROX_SAMPLE_PERCENT", "10"))
+
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "true").lower() == "true"
+# Under the app directory rather than /tmp, where another local user could create it first.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(".shared_cache", "shared_cache.sqlite3"))
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+SHARED_QUERY_TTL_SECONDS = int(os.getenv("SHARED_QUERY_TTL_SECONDS", str(BACKGROUND_REFRESH_SECONDS)))
+
+WARM_START_ENABLED = os.getenv("WARM_START_ENABLED", "true").lower() == "true"
+WARM_START_DIR = os.getenv("WARM_START_DIR", ".warm_start")
+WARM_START_SAVE_SECONDS = int(os.getenv("WARM_START_SAVE_SECONDS", "300"))
+WARM_START_MAX_AGE_SECONDS = int(os.getenv("WARM_START_MAX_AGE_SECONDS", str(6 * 3600)))
+
+API_COMPRESSION_MIN_BYTES = int(os.getenv("API_COMPRESSION_MIN_BYTES", "1024"))
+API_COMPRESSED_CACHE_SIZE = int(os.getenv("API_COMPRESSED_CACHE_SIZE", "256"))
@@ -1,4 +1,8 @@
-"""Generate OpenAPI spec without starting server."""
+"""Generate OpenAPI spec without starting server.
+
+Importing the app does not import the Databricks SDK or run the lifespan, so this
+never connects to a workspace.
+"""
 
 import json
 from pathlib import Path
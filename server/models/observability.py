@@ -1,8 +1,13 @@
-from pydantic import BaseModel
-from typing import List, Literal
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
 
+class ConfidenceInterval(BaseModel):
+    lower: float
+    upper: float
+
+
 class MetricsSnapshot(BaseModel):
     latency_p50: float
     latency_p95: float
@@ -13,6 +18,10 @@ class MetricsSnapshot(BaseModel):
     error_rate: float
     request_count: int
     requests_per_second: float
+    # Set by the sampled query mode: 95% intervals per metric name.
+    approximate: bool = False
+    sample_fraction: Optional[float] = None
+    confidence_intervals: Optional[Dict[str, ConfidenceInterval]] = None
 
 
 class ServiceHealth(BaseModel):
@@ -27,6 +36,17 @@ class ServiceHealth(BaseModel):
     error_rate: float
     request_count: int
     requests_per_second: float
+    approximate: bool = False
+    sample_fraction: Optional[float] = None
+    confidence_intervals: Optional[Dict[str, ConfidenceInterval]] = None
+    # Minute health_status was scored at; it is the latest status, not one for the requested time range.
+    health_as_of: Optional[str] = None
+
+
+class Exemplar(BaseModel):
+    trace_id: str
+    duration_ms: float
+    is_error: bool
 
 
 class MetricsTimeSeries(BaseModel):
@@ -35,6 +55,7 @@ class MetricsTimeSeries(BaseModel):
     avg_duration_ms: float
     error_count: int
     request_count: int
+    exemplars: List[Exemplar] = []
 
 
 class ServiceMetricsDetail(BaseModel):
@@ -61,17 +82,33 @@ class GraphNode(BaseModel):
     health: Literal['healthy', 'warning', 'critical']
     errorRate: float
     requestCount: int
+    isGroup: bool = False
+    memberCount: int = 1
+    group: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
 
 
 class GraphEdge(BaseModel):
     source: str
     target: str
     callCount: int
+    callsPerSecond: float = 0.0
+    errorRate: float = 0.0
+    avgLatency: float = 0.0
+    latencyP50: float = 0.0
+    latencyP95: float = 0.0
+    latencyP99: float = 0.0
 
 
 class DependencyGraph(BaseModel):
     nodes: List[GraphNode]
     edges: List[GraphEdge]
+    hiddenNodes: int = 0
+    hiddenEdges: int = 0
+    layoutVersion: Optional[str] = None
+    # Minute node health was scored at; it is the latest status, not one for the requested time range.
+    healthAsOf: Optional[str] = None
 
 
 class WarehouseInfo(BaseModel):
@@ -97,3 +134,196 @@ class TraceDetail(BaseModel):
     trace_id: str
     trace_start: str
     spans: List[SpanDetail]
+
+
+class ServiceTimeBreakdown(BaseModel):
+    service_name: str
+    span_count: int
+    error_count: int
+    self_time_ms: float
+    critical_path_ms: float
+
+
+class CriticalPathSegment(BaseModel):
+    span: int
+    start_ms: float
+    end_ms: float
+
+
+class TraceWaterfall(BaseModel):
+    services: List[str]
+    names: List[str]
+    span_id: List[str]
+    parent: List[int]
+    depth: List[int]
+    service: List[int]
+    name: List[int]
+    start_ms: List[float]
+    duration_ms: List[float]
+    self_time_ms: List[float]
+    critical_path_ms: List[float]
+    error: List[bool]
+
+
+class TraceAnalysis(BaseModel):
+    trace_id: str
+    duration_ms: float
+    span_count: int
+    truncated: bool
+    services: List[ServiceTimeBreakdown]
+    critical_path: List[CriticalPathSegment]
+    waterfall: TraceWaterfall
+
+
+class AffectedService(BaseModel):
+    service_name: str
+    hops: int
+
+
+class BlastRadius(BaseModel):
+    service_name: str
+    upstream: List[AffectedService]
+    downstream: List[AffectedService]
+
+
+class CallPath(BaseModel):
+    services: List[str]
+    latency_ms: float
+    bottleneck_call_count: int
+    error_rate: float
+
+
+class CallPaths(BaseModel):
+    source: str
+    target: str
+    exhaustive: bool
+    paths: List[CallPath]
+
+
+class ServiceAnomaly(BaseModel):
+    service_name: str
+    health_status: Literal['healthy', 'warning', 'critical']
+    latency_z: float
+    error_rate_z: float
+    throughput_z: float
+    latency_p95_ms: float
+    baseline_latency_p95_ms: float
+    error_rate: float
+    baseline_error_rate: float
+    requests_per_minute: float
+    baseline_requests_per_minute: float
+    seasonal: bool
+    updated_at: str
+
+
+class SloDefinition(BaseModel):
+    name: str
+    service_name: str
+    kind: Literal['availability', 'latency']
+    objective: float = Field(gt=0.0, lt=1.0)
+    latency_threshold_ms: Optional[float] = None
+    description: Optional[str] = None
+
+
+class BurnRate(BaseModel):
+    window: str
+    minutes_covered: int
+    total_count: int
+    bad_count: int
+    burn_rate: float
+
+
+class SloStatus(BaseModel):
+    slo: SloDefinition
+    status: Literal['ok', 'warning', 'critical']
+    budget_remaining: float
+    burn_rates: List[BurnRate]
+    alerts: List[str]
+    updated_at: Optional[str] = None
+
+
+class AlertRule(BaseModel):
+    name: str
+    service_name: str = '*'
+    kind: Literal['threshold', 'anomaly']
+    metric: Literal[
+        'latency_p50', 'latency_p95', 'latency_p99', 'error_rate', 'requests_per_second',
+        'latency_z', 'error_rate_z', 'throughput_z',
+    ]
+    operator: Literal['>', '<'] = '>'
+    threshold: float
+    window_minutes: int = Field(default=5, ge=1)
+    for_minutes: int = Field(default=0, ge=0)
+    severity: Literal['warning', 'critical'] = 'warning'
+    description: Optional[str] = None
+
+
+class Alert(BaseModel):
+    fingerprint: str
+    rule: str
+    service_name: str
+    severity: Literal['warning', 'critical']
+    state: Literal['pending', 'firing', 'resolved']
+    metric: str
+    value: float
+    threshold: float
+    summary: str
+    started_at: str
+    fired_at: Optional[str] = None
+    resolved_at: Optional[str] = None
+
+
+class WindowStats(BaseModel):
+    start: str
+    end: str
+    request_count: int
+    error_rate: float
+    requests_per_second: float
+    avg_duration_ms: float
+    latency_p50: float
+    latency_p90: float
+    latency_p95: float
+    latency_p99: float
+
+
+class PercentileDelta(BaseModel):
+    percentile: float
+    baseline_ms: float
+    current_ms: float
+    delta_ms: float
+    delta_ratio: float
+
+
+class DistributionShift(BaseModel):
+    ks_statistic: float
+    p_value: float
+    wasserstein_ms: float
+
+
+class DependencyAttribution(BaseModel):
+    service_name: str
+    baseline_calls_per_request: float
+    current_calls_per_request: float
+    baseline_avg_latency_ms: float
+    current_avg_latency_ms: float
+    contribution_ms: float
+
+
+class WindowComparison(BaseModel):
+    service_name: str
+    baseline: WindowStats
+    current: WindowStats
+    percentiles: List[PercentileDelta]
+    shift: DistributionShift
+    dependencies: List[DependencyAttribution]
+
+
+class LatencyHeatmap(BaseModel):
+    service_name: str
+    start: str
+    step_seconds: int
+    timestamps: List[str]
+    bucket_lower_ms: List[float]
+    bucket_upper_ms: List[float]
+    counts: List[List[int]]
+    max_count: int
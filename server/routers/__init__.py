@@ -8,6 +8,8 @@ from .services import router as services_router
 from .dependencies import router as dependencies_router
 from .warehouse import router as warehouse_router
 from .traces import router as traces_router
+from .slo import router as slo_router
+from .alerts import router as alerts_router
 
 router = APIRouter()
 router.include_router(user_router, prefix='/user', tags=['user'])
@@ -15,3 +17,5 @@ router.include_router(services_router, prefix='/services', tags=['services'])
 router.include_router(dependencies_router, prefix='/dependencies', tags=['dependencies'])
 router.include_router(warehouse_router, prefix='/warehouse', tags=['warehouse'])
 router.include_router(traces_router, prefix='/traces', tags=['traces'])
+router.include_router(slo_router, prefix='/slo', tags=['slo'])
+router.include_router(alerts_router, prefix='/alerts', tags=['alerts'])
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Query
+from typing import Literal, Optional
+from server.models.observability import Alert, AlertRule
+from server.services.alerts import alert_engine
+
+router = APIRouter()
+
+
+@router.get("")
+async def list_alerts(
+    service_name: Optional[str] = Query(default=None, description="Only alerts for this service"),
+    state: Optional[Literal["pending", "firing", "resolved"]] = Query(default=None, description="Only alerts in this state")
+) -> list[Alert]:
+    alerts = alert_engine.alerts(service_name)
+    if state is not None:
+        alerts = [alert for alert in alerts if alert.state == state]
+    return alerts
+
+
+@router.get("/rules")
+async def list_alert_rules(
+    service_name: Optional[str] = Query(default=None, description="Rules that apply to this service")
+) -> list[AlertRule]:
+    if service_name is None:
+        return alert_engine.rules
+    return alert_engine.rules_for(service_name)
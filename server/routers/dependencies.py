@@ -1,7 +1,27 @@
 from fastapi import APIRouter, HTTPException, Query, Request
-from typing import Literal
-from server.models.observability import DependencyGraph, GraphNode, GraphEdge
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+from server.models.observability import (
+    AffectedService,
+    BlastRadius,
+    CallPath,
+    CallPaths,
+    DependencyGraph,
+    GraphEdge,
+    GraphNode,
+)
+from server.config import WARM_START_MAX_AGE_SECONDS
 from server.services.warehouse_manager import WarehouseManager
+from server.services.edges import edge_rollups, edges_from_totals, window_edges
+from server.services.graph_index import GraphIndex, graph_indexes
+from server.services.graph_reduction import GroupBy, RankBy, reduce_graph
+from server.services.graph_layout import graph_layouts
+from server.services.health import health_engine
+from server.services.progressive import Coarse, cached_result, progressive_ndjson
+from server.services.service_rollups import window_service_metrics
+from server.services.shared_cache import shared_rows
+from server.services.trace_pages import NDJSON_MEDIA_TYPE
 
 router = APIRouter()
 
@@ -17,16 +37,8 @@ def get_time_range_interval(time_range: TimeRange) -> tuple[str, int]:
     return intervals[time_range]
 
 
-@router.get("/graph")
-async def get_dependency_graph(
-    request: Request,
-    time_range: TimeRange = Query(default="1h", description="Time range for health metrics")
-) -> DependencyGraph:
-    user_token = request.headers.get("X-Forwarded-Access-Token")
-    warehouse_manager = WarehouseManager(user_token=user_token)
-    interval, seconds = get_time_range_interval(time_range)
-    
-    query = f"""
+def get_graph_nodes_query(interval: str) -> str:
+    return f"""
     WITH current_spans AS (
       SELECT 
         span.service_name,
@@ -37,99 +49,187 @@ async def get_dependency_graph(
       LATERAL VIEW explode(span_details) AS span
       WHERE t.trace_start >= NOW() - INTERVAL {interval}
     ),
-    baseline_spans AS (
-      SELECT 
-        span.service_name,
-        span.duration_ms
-      FROM jmr_demo.zerobus.traces_assembled_silver t
-      LATERAL VIEW explode(span_details) AS span
-      WHERE t.trace_start >= NOW() - INTERVAL {interval} * 2
-        AND t.trace_start < NOW() - INTERVAL {interval}
-    ),
     current_metrics AS (
       SELECT
         service_name,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as latency_p50,
-        SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
         COUNT(*) as request_count,
         CAST(SUM(CASE WHEN is_error THEN 1 ELSE 0 END) AS FLOAT) / NULLIF(COUNT(*), 0) as error_rate
       FROM current_spans
       GROUP BY service_name
     ),
-    baseline_metrics AS (
-      SELECT
-        service_name,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as baseline_latency_p50,
-        COUNT(*) / {seconds} as baseline_rps
-      FROM baseline_spans
-      GROUP BY service_name
-    ),
-    service_health AS (
-      SELECT
-        c.service_name,
-        c.error_count,
-        c.request_count,
-        c.error_rate,
-        CASE 
-          WHEN c.latency_p50 > COALESCE(b.baseline_latency_p50, c.latency_p50) THEN 'critical'
-          WHEN c.request_count / {seconds} > COALESCE(b.baseline_rps, c.request_count / {seconds}) THEN 'warning'
-          ELSE 'healthy'
-        END as health_status
-      FROM current_metrics c
-      LEFT JOIN baseline_metrics b ON c.service_name = b.service_name
-    ),
     all_services AS (
       SELECT DISTINCT source_service as service_name FROM jmr_demo.zerobus.service_dependencies
       UNION
       SELECT DISTINCT target_service as service_name FROM jmr_demo.zerobus.service_dependencies
+      UNION
+      SELECT service_name FROM current_metrics
     )
     SELECT 
-      'node' as row_type,
       s.service_name as id,
-      COALESCE(h.health_status, 'healthy') as health,
-      COALESCE(h.error_rate, 0.0) as errorRate,
-      COALESCE(h.request_count, 0) as requestCount,
-      NULL as source,
-      NULL as target,
-      NULL as callCount
+      COALESCE(m.error_rate, 0.0) as errorRate,
+      COALESCE(m.request_count, 0) as requestCount
     FROM all_services s
-    LEFT JOIN service_health h ON s.service_name = h.service_name
+    LEFT JOIN current_metrics m ON s.service_name = m.service_name
+    """
+
+
+def with_edge_endpoints(nodes: List[GraphNode], edges: List[GraphEdge]) -> DependencyGraph:
+    """The graph, adding a zero-traffic node for every edge endpoint without one."""
+    nodes = list(nodes)
+    known = {node.id for node in nodes}
+    for edge in edges:
+        for service in (edge.source, edge.target):
+            if service not in known:
+                nodes.append(GraphNode(id=service, health=health_engine.health_of(service), errorRate=0.0, requestCount=0))
+                known.add(service)
+    return DependencyGraph(nodes=nodes, edges=edges, healthAsOf=health_engine.scored_at)
+
+
+def exact_graph(warehouse_manager: WarehouseManager, interval: str, seconds: int) -> DependencyGraph:
+    results = shared_rows(warehouse_manager, get_graph_nodes_query(interval))
+    nodes = [
+        GraphNode(
+            id=row['id'],
+            health=health_engine.health_of(row['id']),
+            errorRate=float(row['errorRate']),
+            requestCount=int(row['requestCount'])
+        )
+        for row in results
+    ]
+    return with_edge_endpoints(nodes, window_edges(warehouse_manager, interval, seconds))
+
+
+def rollup_graph(seconds: int, max_age_seconds: Optional[float] = None) -> Optional[DependencyGraph]:
+    """The graph from the in-memory service and edge rollups, or None if either lags."""
+    metrics = window_service_metrics(seconds, max_age_seconds)
+    if metrics is None or not edge_rollups.covers_seconds(seconds, max_age_seconds):
+        return None
+    nodes = [
+        GraphNode(
+            id=name,
+            health=health_engine.health_of(name),
+            errorRate=snapshot.error_rate,
+            requestCount=snapshot.request_count
+        )
+        for name, snapshot in metrics.items()
+    ]
+    return with_edge_endpoints(nodes, edges_from_totals(edge_rollups.window_seconds(seconds), seconds))
+
+
+@router.get("/graph")
+async def get_dependency_graph(
+    request: Request,
+    time_range: TimeRange = Query(default="1h", description="Time range for traffic and error metrics; node health is the latest, see healthAsOf"),
+    group_by: GroupBy = Query(default="none", description="Collapse services by namespace prefix or community"),
+    expand: List[str] = Query(default=[], description="Group ids to show as individual services"),
+    max_nodes: Optional[int] = Query(default=300, ge=1, le=5000, description="Budget for healthy nodes; unhealthy nodes are always kept"),
+    max_edges: Optional[int] = Query(default=600, ge=1, le=20000, description="Keep only the top edges by rank_by"),
+    rank_by: RankBy = Query(default="traffic", description="Edge ranking used for pruning"),
+    layout: bool = Query(default=True, description="Include precomputed x/y node positions"),
+    progressive: bool = Query(default=False, description="Stream a provisional NDJSON graph first, then the exact one")
+) -> DependencyGraph:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    interval, seconds = get_time_range_interval(time_range)
     
-    UNION ALL
+    def finish(graph: DependencyGraph, index: bool = True) -> DependencyGraph:
+        if index:
+            graph_indexes.update(time_range, graph.edges, [node.id for node in graph.nodes])
+        graph = reduce_graph(
+            graph,
+            group_by=group_by,
+            expand=expand,
+            max_nodes=max_nodes,
+            max_edges=max_edges,
+            rank_by=rank_by,
+        )
+        return graph_layouts.apply(graph) if layout else graph
     
-    SELECT 
-      'edge' as row_type,
-      NULL as id,
-      NULL as health,
-      NULL as errorRate,
-      NULL as requestCount,
-      d.source_service as source,
-      d.target_service as target,
-      d.call_count as callCount
-    FROM jmr_demo.zerobus.service_dependencies d
-    """
+    if progressive:
+        def from_rollups() -> Coarse:
+            graph = rollup_graph(seconds)
+            if graph is not None:
+                return 'rollups', finish(graph, index=False)
+            # Just after a restart: rollups restored from a warm-start snapshot, with their age.
+            graph = rollup_graph(seconds, WARM_START_MAX_AGE_SECONDS)
+            if graph is not None:
+                return 'snapshot', finish(graph, index=False), edge_rollups.age_seconds()
+            return None
+        
+        cache_key = ('dependencies/graph', warehouse_manager.identity, time_range, group_by, tuple(expand), max_nodes, max_edges, rank_by, layout)
+        stream = progressive_ndjson(
+            [from_rollups, cached_result(cache_key)],
+            lambda: finish(exact_graph(warehouse_manager, interval, seconds)),
+            cache_key,
+        )
+        return StreamingResponse(stream, media_type=NDJSON_MEDIA_TYPE)
     
     try:
-        results = warehouse_manager.execute_query(query)
-        
-        nodes = []
-        edges = []
-        
-        for row in results:
-            if row.get('row_type') == 'node':
-                nodes.append(GraphNode(
-                    id=row['id'],
-                    health=row['health'],
-                    errorRate=float(row['errorRate']),
-                    requestCount=int(row['requestCount'])
-                ))
-            elif row.get('row_type') == 'edge':
-                edges.append(GraphEdge(
-                    source=row['source'],
-                    target=row['target'],
-                    callCount=int(row['callCount'])
-                ))
-        
-        return DependencyGraph(nodes=nodes, edges=edges)
+        return await run_in_threadpool(lambda: finish(exact_graph(warehouse_manager, interval, seconds)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+def get_graph_index(warehouse_manager: WarehouseManager, time_range: TimeRange) -> GraphIndex:
+    interval, seconds = get_time_range_interval(time_range)
+    return graph_indexes.update(time_range, window_edges(warehouse_manager, interval, seconds))
+
+
+@router.get("/blast-radius/{service_name}")
+async def get_blast_radius(
+    request: Request,
+    service_name: str,
+    time_range: TimeRange = Query(default="1h", description="Time range the call graph is built from")
+) -> BlastRadius:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    
+    try:
+        index = await run_in_threadpool(get_graph_index, warehouse_manager, time_range)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    if service_name not in index.position:
+        return BlastRadius(service_name=service_name, upstream=[], downstream=[])
+    
+    upstream = index.blast_radius(service_name, upstream=True)
+    downstream = index.blast_radius(service_name, upstream=False)
+    return BlastRadius(
+        service_name=service_name,
+        upstream=[AffectedService(service_name=name, hops=hops) for name, hops in upstream],
+        downstream=[AffectedService(service_name=name, hops=hops) for name, hops in downstream],
+    )
+
+
+@router.get("/paths")
+async def get_hot_paths(
+    request: Request,
+    source: str = Query(description="Calling service the paths start at"),
+    target: str = Query(description="Service the paths end at"),
+    k: int = Query(default=5, ge=1, le=50, description="Number of paths to return"),
+    time_range: TimeRange = Query(default="1h", description="Time range the call graph is built from")
+) -> CallPaths:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    
+    try:
+        index = await run_in_threadpool(get_graph_index, warehouse_manager, time_range)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    for service in (source, target):
+        if service not in index.position:
+            raise HTTPException(status_code=404, detail=f"Service not in call graph: {service}")
+    
+    found, exhaustive = index.hot_paths(source, target, k)
+    paths = []
+    for latency, edge_ids in found:
+        services = [source] + [index.edge_keys[edge][1] for edge in edge_ids]
+        success = 1.0
+        for edge in edge_ids:
+            success *= 1.0 - float(index.error_rate[edge])
+        paths.append(CallPath(
+            services=services,
+            latency_ms=latency,
+            bottleneck_call_count=int(min(index.calls[edge] for edge in edge_ids)) if edge_ids else 0,
+            error_rate=1.0 - success,
+        ))
+    return CallPaths(source=source, target=target, exhaustive=exhaustive, paths=paths)
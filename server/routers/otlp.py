@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+import logging
+from server.config import OTLP_MAX_BODY_BYTES
+from server.services.live_spans import (
+    JSON_MEDIA_TYPE,
+    PROTOBUF_MEDIA_TYPE,
+    ExportTooLarge,
+    UnsupportedEncoding,
+    decode_export,
+    live_spans,
+)
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """The request body, refused with 413 as soon as its declared or received size passes `max_bytes`."""
+    too_large = HTTPException(status_code=413, detail=f"Export larger than {max_bytes} bytes")
+    declared = request.headers.get("Content-Length")
+    if declared is not None:
+        try:
+            declared_bytes = int(declared)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if declared_bytes > max_bytes:
+            raise too_large
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@router.post("/v1/traces")
+async def export_traces(request: Request) -> Response:
+    """OTLP/HTTP trace export (protobuf or JSON, optionally gzipped) into the live span buffer."""
+    body = await read_body(request, OTLP_MAX_BODY_BYTES)
+    content_type = request.headers.get("Content-Type", "")
+
+    try:
+        batch = await run_in_threadpool(
+            decode_export, body, content_type, request.headers.get("Content-Encoding")
+        )
+    except ExportTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedEncoding as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except Exception as e:
+        logger.warning(f"Undecodable OTLP export: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid export: {str(e)}")
+
+    # Listeners (trace assembly, top traces) run on the batch too; keep them off the event loop.
+    await run_in_threadpool(live_spans.add, batch)
+    # An empty ExportTraceServiceResponse, in the request's encoding.
+    if content_type.startswith(PROTOBUF_MEDIA_TYPE):
+        return Response(content=b"", media_type=PROTOBUF_MEDIA_TYPE)
+    return Response(content=b"{}", media_type=JSON_MEDIA_TYPE)
@@ -1,14 +1,75 @@
-from fastapi import APIRouter, HTTPException, Query, Request
-from typing import Literal
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from typing import Callable, Literal, Optional
 import logging
-from server.models.observability import ServiceHealth, ServiceMetricsDetail
+from server.models.observability import (
+    LatencyHeatmap,
+    ServiceAnomaly,
+    ServiceHealth,
+    ServiceMetricsDetail,
+    TraceAnalysis,
+    TraceInfo,
+    WindowComparison,
+)
 from server.services.warehouse_manager import WarehouseManager
-from server.config import OBSERVABILITY_TABLE_PREFIX
+from server.services.trace_pages import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NDJSON_MEDIA_TYPE,
+    NEXT_CURSOR_HEADER,
+    SETTLED_UNTIL_HEADER,
+    iter_ndjson,
+    paginate,
+    tee_trace_ids,
+)
+from server.services.trace_details import get_trace_detail as get_cached_trace_detail
+from server.services.trace_details import prefetch_trace_details
+from server.services.trace_index import provisional_since, service_trace_rows
+from server.services.trace_analysis import fetch_trace_analysis
+from server.services.approximate import (
+    approximate_service_health,
+    approximate_service_query,
+    approximate_services_query,
+    approximate_snapshot,
+    approximate_trend,
+    approximate_trends_query,
+    new_sample_seed,
+)
+from server.services.comparison import compare_windows
+from server.services.health import health_engine
+from server.services.heatmap import latency_heatmap
+from server.services.http_cache import not_modified, snapshot_etag
+from server.services.live_spans import merge_service_health, merge_service_metrics, with_merge_inputs
+from server.services.shared_cache import shared_rows
+from server.services.rollups import minute_of
+from server.services.progressive import Coarse, cached_result, progressive_ndjson
+from server.services.projection import (
+    Fields,
+    parse_fields,
+    placeholders,
+    project,
+    project_all,
+    select_columns,
+    sparse_response,
+)
+from server.services.service_rollups import (
+    previous_window_snapshot,
+    service_exemplars,
+    service_rollups,
+    window_service_metrics,
+)
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.top_traces import error_traces, slowest_traces
+from server.config import OBSERVABILITY_TABLE_PREFIX, TOP_TRACES_K, WARM_START_MAX_AGE_SECONDS
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 TimeRange = Literal["15m", "1h", "24h"]
+# "approximate" samples traces and returns scaled estimates with confidence intervals.
+QueryMode = Literal["exact", "approximate"]
 
 
 def get_time_range_interval(time_range: TimeRange) -> tuple[str, int]:
@@ -20,16 +81,27 @@ def get_time_range_interval(time_range: TimeRange) -> tuple[str, int]:
     return intervals[time_range]
 
 
-@router.get("/list")
-async def get_services(
-    request: Request,
-    time_range: TimeRange = Query(default="1h", description="Time range for metrics")
-) -> list[ServiceHealth]:
-    user_token = request.headers.get("X-Forwarded-Access-Token")
-    warehouse_manager = WarehouseManager(user_token=user_token)
-    interval, seconds = get_time_range_interval(time_range)
-    
-    query = f"""
+def service_columns(seconds: int) -> dict[str, str]:
+    """SQL per selectable ServiceHealth field of the service list, in response order."""
+    return {
+        "current_latency_p50": "PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms)",
+        "current_latency_p95": "PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms)",
+        "current_latency_p99": "PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration_ms)",
+        "avg_duration_ms": "AVG(duration_ms)",
+        "max_duration_ms": "MAX(duration_ms)",
+        "error_count": "SUM(CASE WHEN is_error THEN 1 ELSE 0 END)",
+        "request_count": "COUNT(*)",
+        "error_rate": "CAST(SUM(CASE WHEN is_error THEN 1 ELSE 0 END) AS FLOAT) / NULLIF(COUNT(*), 0)",
+        "requests_per_second": f"COUNT(*) / {seconds}",
+    }
+
+
+# Always returned by the service list: identity, status (and when it was scored) and the sort key.
+SERVICE_LIST_REQUIRED = ("service_name", "health_status", "health_as_of", "request_count")
+
+
+def get_services_query(interval: str, seconds: int, fields: Fields = None) -> str:
+    return f"""
     WITH current_spans AS (
       SELECT 
         span.service_name,
@@ -39,79 +111,188 @@ async def get_services(
       FROM jmr_demo.zerobus.traces_assembled_silver t
       LATERAL VIEW explode(span_details) AS span
       WHERE t.trace_start >= NOW() - INTERVAL {interval}
-    ),
-    baseline_spans AS (
-      SELECT 
-        span.service_name,
-        span.duration_ms
-      FROM jmr_demo.zerobus.traces_assembled_silver t
-      LATERAL VIEW explode(span_details) AS span
-      WHERE t.trace_start >= NOW() - INTERVAL {interval} * 2
-        AND t.trace_start < NOW() - INTERVAL {interval}
-    ),
-    current_metrics AS (
-      SELECT
-        service_name,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as latency_p50,
-        PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms) as latency_p95,
-        PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration_ms) as latency_p99,
-        AVG(duration_ms) as avg_duration,
-        MAX(duration_ms) as max_duration,
-        SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
-        COUNT(*) as request_count
-      FROM current_spans
-      GROUP BY service_name
-    ),
-    baseline_metrics AS (
-      SELECT
-        service_name,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as baseline_latency_p50,
-        COUNT(*) / {seconds} as baseline_rps
-      FROM baseline_spans
-      GROUP BY service_name
     )
-    SELECT 
-      c.service_name,
-      c.latency_p50 as current_latency_p50,
-      c.latency_p95 as current_latency_p95,
-      c.latency_p99 as current_latency_p99,
-      c.avg_duration as avg_duration_ms,
-      c.max_duration as max_duration_ms,
-      c.error_count,
-      c.request_count,
-      CAST(c.error_count AS FLOAT) / NULLIF(c.request_count, 0) as error_rate,
-      c.request_count / {seconds} as requests_per_second,
-      CASE 
-        WHEN c.latency_p50 > COALESCE(b.baseline_latency_p50, c.latency_p50) THEN 'critical'
-        WHEN c.request_count / {seconds} > COALESCE(b.baseline_rps, c.request_count / {seconds}) THEN 'warning'
-        ELSE 'healthy'
-      END as health_status
-    FROM current_metrics c
-    LEFT JOIN baseline_metrics b ON c.service_name = b.service_name
-    ORDER BY c.request_count DESC
+    SELECT
+      service_name,
+      {select_columns(service_columns(seconds), fields)}
+    FROM current_spans
+    GROUP BY service_name
+    ORDER BY request_count DESC
+    """
+
+
+def exact_services(
+    warehouse_manager: WarehouseManager, interval: str, seconds: int, fields: Fields = None
+) -> list[ServiceHealth]:
+    fields = with_merge_inputs(fields)
+    results = shared_rows(warehouse_manager, get_services_query(interval, seconds, fields))
+    if not results:
+        logger.warning("Query returned no results")
+    else:
+        logger.info(f"Query returned {len(results)} services")
+    defaults = placeholders(ServiceHealth, fields)
+    services = [
+        ServiceHealth(
+            **{**defaults, **row},
+            health_status=health_engine.health_of(row['service_name']),
+            health_as_of=health_engine.scored_at,
+        )
+        for row in results
+    ]
+    return merge_service_health(services, seconds)
+
+
+def rollup_services(seconds: int) -> Coarse:
+    """Provisional service list from the in-memory rollups (histogram percentiles).
+
+    Right after a restart, rollups restored from a warm-start snapshot stand in
+    until the first refresh, labelled with their age.
     """
+    fresh = window_service_metrics(seconds)
+    metrics = fresh if fresh is not None else window_service_metrics(seconds, WARM_START_MAX_AGE_SECONDS)
+    if metrics is None:
+        return None
+    services = [
+        ServiceHealth(
+            service_name=name,
+            health_status=health_engine.health_of(name),
+            health_as_of=health_engine.scored_at,
+            current_latency_p50=snapshot.latency_p50,
+            current_latency_p95=snapshot.latency_p95,
+            current_latency_p99=snapshot.latency_p99,
+            **snapshot.model_dump(exclude={'latency_p50', 'latency_p95', 'latency_p99'}),
+        )
+        for name, snapshot in metrics.items()
+    ]
+    services.sort(key=lambda s: -s.request_count)
+    if fresh is None:
+        return 'snapshot', services, service_rollups.age_seconds()
+    return 'rollups', services
+
+
+@router.get("/list")
+async def get_services(
+    request: Request,
+    time_range: TimeRange = Query(default="1h", description="Time range for metrics; health_status is the latest, see health_as_of"),
+    mode: QueryMode = Query(default="exact", description="exact, or approximate from a sample of traces"),
+    progressive: bool = Query(default=False, description="Stream a provisional NDJSON result first, then the exact one"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated ServiceHealth fields to return; unrequested aggregates are not computed")
+) -> list[ServiceHealth]:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    interval, seconds = get_time_range_interval(time_range)
+    selected = parse_fields(fields, ServiceHealth, SERVICE_LIST_REQUIRED)
+    
+    if mode == "approximate":
+        try:
+            rows = warehouse_manager.execute_query(approximate_services_query(interval))
+            services = approximate_service_health(rows, seconds)
+        except Exception as e:
+            logger.error(f"Approximate services query failed: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+        return services if selected is None else sparse_response(project_all(services, selected))
+    
+    if progressive:
+        def sampled() -> Coarse:
+            rows = warehouse_manager.execute_query(approximate_services_query(interval))
+            return 'sample', approximate_service_health(rows, seconds)
+        
+        def projected(source: Callable[[], Coarse]) -> Callable[[], Coarse]:
+            def coarse() -> Coarse:
+                first = source()
+                return None if first is None else (first[0], project_all(first[1], selected), *first[2:])
+            return coarse
+        
+        cache_key = ('services/list', warehouse_manager.identity, time_range, selected)
+        stream = progressive_ndjson(
+            [projected(lambda: rollup_services(seconds)), cached_result(cache_key), projected(sampled)],
+            lambda: project_all(exact_services(warehouse_manager, interval, seconds, selected), selected),
+            cache_key,
+        )
+        return StreamingResponse(stream, media_type=NDJSON_MEDIA_TYPE)
     
     try:
-        results = warehouse_manager.execute_query(query)
-        if not results:
-            logger.warning("Query returned no results")
-            return []
-        logger.info(f"Query returned {len(results)} services")
-        return [ServiceHealth(**row) for row in results]
+        services = await run_in_threadpool(exact_services, warehouse_manager, interval, seconds, selected)
     except Exception as e:
         logger.error(f"Services query failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    return services if selected is None else sparse_response(project_all(services, selected))
+
+
+def snapshot_columns(seconds: int) -> dict[str, str]:
+    """SQL per selectable MetricsSnapshot field, shared by the current and baseline windows."""
+    return {
+        "latency_p50": "PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms)",
+        "latency_p95": "PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms)",
+        "latency_p99": "PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration_ms)",
+        "avg_duration_ms": "AVG(duration_ms)",
+        "max_duration_ms": "MAX(duration_ms)",
+        "error_count": "SUM(CASE WHEN is_error THEN 1 ELSE 0 END)",
+        "error_rate": "CAST(SUM(CASE WHEN is_error THEN 1 ELSE 0 END) AS FLOAT) / NULLIF(COUNT(*), 0)",
+        "request_count": "COUNT(*)",
+        "requests_per_second": f"COUNT(*) / {seconds}",
+    }
+
+
+TREND_COLUMNS = {
+    "latency_p95": "PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms)",
+    "avg_duration_ms": "AVG(duration_ms)",
+    "error_count": "SUM(CASE WHEN is_error THEN 1 ELSE 0 END)",
+    "request_count": "COUNT(*)",
+}
+# request_count tells an idle service (404) apart from an empty projection.
+METRICS_REQUIRED = ("request_count",)
+
+
+def get_baseline_query(service_name: str, interval: str, seconds: int, fields: Fields = None) -> str:
+    """Metrics over the window before the current one, for when rollups do not cover it."""
+    return f"""
+    WITH service_spans AS (
+      SELECT 
+        span.duration_ms,
+        span.is_error
+      FROM jmr_demo.zerobus.traces_assembled_silver t
+      LATERAL VIEW explode(span_details) AS span
+      WHERE span.service_name = '{service_name}'
+        AND t.trace_start >= NOW() - INTERVAL {interval} * 2
+        AND t.trace_start < NOW() - INTERVAL {interval}
+    )
+    SELECT
+      {select_columns(snapshot_columns(seconds), fields)}
+    FROM service_spans
+    """
+
+
+@router.get("/health")
+async def get_service_anomalies(request: Request, response: Response) -> list[ServiceAnomaly]:
+    """Latest anomaly scores behind `health_status`, worst first."""
+    etag = snapshot_etag('services/health', health_engine.digest)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers['ETag'] = etag
+    severity = {"critical": 0, "warning": 1, "healthy": 2}
+    return sorted(
+        health_engine.snapshot.values(),
+        key=lambda a: (severity[a.health_status], -max(abs(a.latency_z), abs(a.error_rate_z), abs(a.throughput_z))),
+    )
 
 
 @router.get("/{service_name}/metrics")
 async def get_service_metrics(
     request: Request,
     service_name: str,
-    time_range: TimeRange = Query(default="1h", description="Time range for metrics")
+    time_range: TimeRange = Query(default="1h", description="Time range for metrics"),
+    mode: QueryMode = Query(default="exact", description="exact, or approximate from a sample of traces"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated metric names to return for current, baseline and trends")
 ) -> ServiceMetricsDetail:
+    from server.models.observability import MetricsSnapshot, MetricsTimeSeries
+    
     user_token = request.headers.get("X-Forwarded-Access-Token")
     warehouse_manager = WarehouseManager(user_token=user_token)
     interval, seconds = get_time_range_interval(time_range)
+    selected = parse_fields(fields, MetricsSnapshot, METRICS_REQUIRED)
+    current_fields = with_merge_inputs(selected)
     
     current_query = f"""
     WITH service_spans AS (
@@ -125,15 +306,7 @@ async def get_service_metrics(
         AND t.trace_start >= NOW() - INTERVAL {interval}
     )
     SELECT
-      PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as latency_p50,
-      PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms) as latency_p95,
-      PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration_ms) as latency_p99,
-      AVG(duration_ms) as avg_duration_ms,
-      MAX(duration_ms) as max_duration_ms,
-      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
-      CAST(SUM(CASE WHEN is_error THEN 1 ELSE 0 END) AS FLOAT) / NULLIF(COUNT(*), 0) as error_rate,
-      COUNT(*) as request_count,
-      COUNT(*) / {seconds} as requests_per_second
+      {select_columns(snapshot_columns(seconds), current_fields)}
     FROM service_spans
     """
     
@@ -150,62 +323,128 @@ async def get_service_metrics(
     )
     SELECT
       time_bucket as timestamp,
-      PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms) as latency_p95,
-      AVG(duration_ms) as avg_duration_ms,
-      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
-      COUNT(*) as request_count
+      {select_columns(TREND_COLUMNS, selected)}
     FROM service_spans
     GROUP BY time_bucket
     ORDER BY time_bucket
     """
     
-    baseline_query = f"""
-    WITH service_spans AS (
-      SELECT 
-        span.duration_ms,
-        span.is_error
-      FROM jmr_demo.zerobus.traces_assembled_silver t
-      LATERAL VIEW explode(span_details) AS span
-      WHERE span.service_name = '{service_name}'
-        AND t.trace_start >= NOW() - INTERVAL {interval} * 2
-        AND t.trace_start < NOW() - INTERVAL {interval}
-    )
-    SELECT
-      PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as latency_p50,
-      PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms) as latency_p95,
-      PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration_ms) as latency_p99,
-      AVG(duration_ms) as avg_duration_ms,
-      MAX(duration_ms) as max_duration_ms,
-      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
-      CAST(SUM(CASE WHEN is_error THEN 1 ELSE 0 END) AS FLOAT) / NULLIF(COUNT(*), 0) as error_rate,
-      COUNT(*) as request_count,
-      COUNT(*) / {seconds} as requests_per_second
-    FROM service_spans
-    """
-    
     try:
-        from server.models.observability import MetricsSnapshot, MetricsTimeSeries
-        
-        current_results = warehouse_manager.execute_query(current_query)
-        trends_results = warehouse_manager.execute_query(trends_query)
-        baseline_results = warehouse_manager.execute_query(baseline_query)
-        
-        if not current_results:
+        exemplars = service_exemplars(service_name, seconds)
+        if mode == "approximate":
+            parameters = {"service_name": service_name}
+            seed = new_sample_seed()
+            current_results = warehouse_manager.execute_query(approximate_service_query(interval, seed=seed), parameters)
+            trends_results = warehouse_manager.execute_query(approximate_trends_query(interval, seed=seed), parameters)
+            current = approximate_snapshot(current_results[0] if current_results else None, seconds)
+            trends = [
+                approximate_trend(row).model_copy(update={
+                    'exemplars': exemplars.get(minute_of(parse_timestamp(row['timestamp'])), [])
+                })
+                for row in trends_results
+            ]
+        else:
+            current_results = await run_in_threadpool(shared_rows, warehouse_manager, current_query)
+            trends_results = await run_in_threadpool(shared_rows, warehouse_manager, trends_query)
+            
+            snapshot_defaults = placeholders(MetricsSnapshot, current_fields)
+            trend_defaults = placeholders(MetricsTimeSeries, selected)
+            has_current = current_results and int(current_results[0].get('request_count') or 0) > 0
+            current = MetricsSnapshot(**{**snapshot_defaults, **current_results[0]}) if has_current else None
+            trends = [
+                MetricsTimeSeries(**{**trend_defaults, **row}, exemplars=exemplars.get(minute_of(parse_timestamp(row['timestamp'])), []))
+                for row in trends_results
+            ]
+            current, trends = merge_service_metrics(service_name, current, trends, seconds)
+        if current is None:
             raise HTTPException(status_code=404, detail=f"No data found for service: {service_name}")
+        baseline = previous_window_snapshot(service_name, seconds)
+        if baseline is None:
+            baseline_results = await run_in_threadpool(
+                shared_rows, warehouse_manager, get_baseline_query(service_name, interval, seconds, selected)
+            )
+            baseline = (
+                MetricsSnapshot(**{**placeholders(MetricsSnapshot, selected), **baseline_results[0]})
+                if baseline_results else current
+            )
         
-        current = MetricsSnapshot(**current_results[0])
-        trends = [MetricsTimeSeries(**row) for row in trends_results]
-        baseline = MetricsSnapshot(**baseline_results[0]) if baseline_results else current
-        
-        return ServiceMetricsDetail(
+        detail = ServiceMetricsDetail(
             service_name=service_name,
             current=current,
             trends=trends,
             baseline=baseline
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Metrics query failed for {service_name}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    
+    if selected is None:
+        return detail
+    trend_fields = frozenset({"timestamp", "exemplars"} | (selected & set(MetricsTimeSeries.model_fields)))
+    return sparse_response({
+        "service_name": service_name,
+        "current": project(detail.current, selected),
+        "trends": project_all(detail.trends, trend_fields),
+        "baseline": project(detail.baseline, selected),
+    })
+
+
+@router.get("/{service_name}/heatmap")
+async def get_latency_heatmap(
+    request: Request,
+    service_name: str,
+    time_range: TimeRange = Query(default="1h", description="Time range for the heatmap"),
+    step_minutes: Optional[int] = Query(default=None, ge=1, le=1440, description="Minutes per time step; default about 120 steps")
+) -> LatencyHeatmap:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    _, seconds = get_time_range_interval(time_range)
+    
+    try:
+        return latency_heatmap(warehouse_manager, service_name, seconds, step_minutes)
+    except Exception as e:
+        logger.error(f"Heatmap query failed for {service_name}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+# Longest window a comparison accepts, in minutes.
+MAX_COMPARISON_MINUTES = 31 * 24 * 60
+
+
+@router.get("/{service_name}/compare")
+async def compare_service_windows(
+    request: Request,
+    service_name: str,
+    current_start: Optional[datetime] = Query(default=None, description="Start of the window under test; default one hour before current_end"),
+    current_end: Optional[datetime] = Query(default=None, description="End of the window under test; default the latest complete minute"),
+    baseline: Literal["previous", "last_week", "custom"] = Query(default="previous", description="Window to compare against"),
+    baseline_start: Optional[datetime] = Query(default=None, description="Start of the baseline window when baseline=custom"),
+    baseline_end: Optional[datetime] = Query(default=None, description="End of the baseline window when baseline=custom")
+) -> WindowComparison:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    
+    end = minute_of(current_end) if current_end else (service_rollups.watermark or minute_of(utcnow()))
+    start = minute_of(current_start) if current_start else end - 60
+    if baseline == "custom":
+        if baseline_start is None or baseline_end is None:
+            raise HTTPException(status_code=400, detail="baseline=custom needs baseline_start and baseline_end")
+        baseline_window = (minute_of(baseline_start), minute_of(baseline_end))
+    elif baseline == "last_week":
+        baseline_window = (start - 7 * 24 * 60, end - 7 * 24 * 60)
+    else:
+        baseline_window = (start - (end - start), start)
+    for window_start, window_end in ((start, end), baseline_window):
+        if not 0 < window_end - window_start <= MAX_COMPARISON_MINUTES:
+            raise HTTPException(status_code=400, detail="Windows must be non-empty and at most 31 days long")
+    
+    try:
+        return compare_windows(warehouse_manager, service_name, baseline_window, (start, end))
+    except Exception as e:
+        logger.error(f"Window comparison failed for {service_name}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
 
 @router.get("/{service_name}/dependencies")
@@ -219,84 +458,19 @@ async def get_service_dependencies(
     warehouse_manager = WarehouseManager(user_token=user_token)
     
     query = f"""
-    WITH current_spans AS (
-      SELECT 
-        span.service_name,
-        span.duration_ms,
-        t.trace_start
-      FROM jmr_demo.zerobus.traces_assembled_silver t
-      LATERAL VIEW explode(span_details) AS span
-      WHERE t.trace_start >= NOW() - INTERVAL 1 HOUR
-    ),
-    baseline_spans AS (
-      SELECT 
-        span.service_name,
-        span.duration_ms
-      FROM jmr_demo.zerobus.traces_assembled_silver t
-      LATERAL VIEW explode(span_details) AS span
-      WHERE t.trace_start >= NOW() - INTERVAL 2 HOUR
-        AND t.trace_start < NOW() - INTERVAL 1 HOUR
-    ),
-    current_metrics AS (
-      SELECT
-        service_name,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as latency_p50,
-        COUNT(*) as request_count
-      FROM current_spans
-      GROUP BY service_name
-    ),
-    baseline_metrics AS (
-      SELECT
-        service_name,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration_ms) as baseline_latency_p50,
-        COUNT(*) / 3600 as baseline_rps
-      FROM baseline_spans
-      GROUP BY service_name
-    ),
-    service_health AS (
-      SELECT 
-        c.service_name,
-        CASE 
-          WHEN c.latency_p50 > COALESCE(b.baseline_latency_p50, c.latency_p50) THEN 'critical'
-          WHEN c.request_count / 3600 > COALESCE(b.baseline_rps, c.request_count / 3600) THEN 'warning'
-          ELSE 'healthy'
-        END as health_status
-      FROM current_metrics c
-      LEFT JOIN baseline_metrics b ON c.service_name = b.service_name
-    ),
-    inbound_deps AS (
-      SELECT 
-        d.target_service as service_name,
-        d.source_service as related_service,
-        d.call_count,
-        COALESCE(h.health_status, 'unknown') as health_status
-      FROM jmr_demo.zerobus.service_dependencies d
-      LEFT JOIN service_health h ON d.source_service = h.service_name
-      WHERE d.target_service = '{service_name}'
-    ),
-    outbound_deps AS (
-      SELECT 
-        d.source_service as service_name,
-        d.target_service as related_service,
-        d.call_count,
-        COALESCE(h.health_status, 'unknown') as health_status
-      FROM jmr_demo.zerobus.service_dependencies d
-      LEFT JOIN service_health h ON d.target_service = h.service_name
-      WHERE d.source_service = '{service_name}'
-    )
     SELECT 
       'inbound' as direction,
-      related_service as service_name,
-      call_count,
-      health_status
-    FROM inbound_deps
+      source_service as service_name,
+      call_count
+    FROM jmr_demo.zerobus.service_dependencies
+    WHERE target_service = '{service_name}'
     UNION ALL
     SELECT 
       'outbound' as direction,
-      related_service as service_name,
-      call_count,
-      health_status
-    FROM outbound_deps
+      target_service as service_name,
+      call_count
+    FROM jmr_demo.zerobus.service_dependencies
+    WHERE source_service = '{service_name}'
     ORDER BY direction, call_count DESC
     """
     
@@ -314,7 +488,7 @@ async def get_service_dependencies(
             DependencyInfo(
                 service_name=row['service_name'],
                 call_count=row['call_count'],
-                health_status=row['health_status']
+                health_status=health_engine.health_of(row['service_name'], default='unknown')
             )
             for row in results if row['direction'] == 'inbound'
         ]
@@ -323,7 +497,7 @@ async def get_service_dependencies(
             DependencyInfo(
                 service_name=row['service_name'],
                 call_count=row['call_count'],
-                health_status=row['health_status']
+                health_status=health_engine.health_of(row['service_name'], default='unknown')
             )
             for row in results if row['direction'] == 'outbound'
         ]
@@ -341,84 +515,113 @@ async def get_service_dependencies(
 @router.get("/{service_name}/traces")
 async def get_service_traces(
     request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     service_name: str,
-    time_range: TimeRange = Query(default="1h", description="Time range for traces")
+    time_range: TimeRange = Query(default="1h", description="Time range for traces"),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the previous page"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: Literal["json", "ndjson"] = Query(default="json", description="Response encoding")
 ):
-    from server.models.observability import TraceInfo
-    
     user_token = request.headers.get("X-Forwarded-Access-Token")
     warehouse_manager = WarehouseManager(user_token=user_token)
     interval, seconds = get_time_range_interval(time_range)
     
-    query = f"""
-    SELECT 
-      trace_id,
-      trace_start,
-      services_involved,
-      total_trace_duration_ms as total_duration_ms,
-      span_count
-    FROM jmr_demo.zerobus.traces_assembled_silver
-    WHERE array_contains(services_involved, '{service_name}')
-      AND trace_start >= NOW() - INTERVAL {interval}
-    ORDER BY trace_start DESC
-    LIMIT 100
-    """
-    
     try:
-        results = warehouse_manager.execute_query(query)
-        if not results:
-            logger.info(f"No traces found for service: {service_name}")
-            return []
+        settled = provisional_since()
+        headers = {SETTLED_UNTIL_HEADER: format_timestamp(settled)} if settled is not None else {}
+        rows = service_trace_rows(warehouse_manager, service_name, interval, seconds, limit, cursor)
+        trace_ids: list[str] = []
+        rows = tee_trace_ids(rows, trace_ids, limit)
+        background_tasks.add_task(prefetch_trace_details, warehouse_manager, trace_ids)
+        if format == "ndjson":
+            return StreamingResponse(iter_ndjson(rows, limit), media_type=NDJSON_MEDIA_TYPE, headers=headers)
         
-        return [TraceInfo(**row) for row in results]
+        traces, next_cursor = paginate(rows, limit)
+        response.headers.update(headers)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        if not traces:
+            logger.info(f"No traces found for service: {service_name}")
+        return traces
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Traces query failed for {service_name}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
 
+@router.get("/{service_name}/slowest-traces")
+async def get_slowest_traces(
+    request: Request,
+    service_name: str,
+    time_range: TimeRange = Query(default="1h", description="Time range to rank traces in"),
+    k: int = Query(default=10, ge=1, le=TOP_TRACES_K)
+) -> list[TraceInfo]:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    _, seconds = get_time_range_interval(time_range)
+    
+    try:
+        return slowest_traces(warehouse_manager, service_name, seconds, k)
+    except Exception as e:
+        logger.error(f"Slowest traces query failed for {service_name}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+@router.get("/{service_name}/error-traces")
+async def get_error_traces(
+    request: Request,
+    service_name: str,
+    time_range: TimeRange = Query(default="1h", description="Time range to look for erroring traces in"),
+    k: int = Query(default=10, ge=1, le=TOP_TRACES_K)
+) -> list[TraceInfo]:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    _, seconds = get_time_range_interval(time_range)
+    
+    try:
+        return error_traces(warehouse_manager, service_name, seconds, k)
+    except Exception as e:
+        logger.error(f"Error traces query failed for {service_name}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
 @router.get("/traces/{trace_id}")
 async def get_trace_detail(
     request: Request,
     trace_id: str
 ):
-    from server.models.observability import TraceDetail, SpanDetail
-    
     user_token = request.headers.get("X-Forwarded-Access-Token")
     warehouse_manager = WarehouseManager(user_token=user_token)
     
-    trace_query = f"""
-    SELECT 
-      trace_id,
-      trace_start
-    FROM jmr_demo.zerobus.traces_assembled_silver
-    WHERE trace_id = '{trace_id}'
-    LIMIT 1
-    """
-    
-    spans_query = f"""
-    SELECT 
-      service_name,
-      SUM(duration_ms) as total_duration_ms
-    FROM jmr_demo.zerobus.traces_silver
-    WHERE trace_id = '{trace_id}'
-    GROUP BY service_name
-    ORDER BY total_duration_ms DESC
-    """
-    
     try:
-        trace_results = warehouse_manager.execute_query(trace_query)
-        if not trace_results:
+        detail = get_cached_trace_detail(warehouse_manager, trace_id)
+        if detail is None:
             raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
-        
-        spans_results = warehouse_manager.execute_query(spans_query)
-        
-        return TraceDetail(
-            trace_id=trace_results[0]['trace_id'],
-            trace_start=trace_results[0]['trace_start'],
-            spans=[SpanDetail(**row) for row in spans_results]
-        )
+        return detail
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Trace detail query failed for {trace_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+@router.get("/traces/{trace_id}/analysis")
+async def get_trace_analysis(
+    request: Request,
+    trace_id: str
+) -> TraceAnalysis:
+    user_token = request.headers.get("X-Forwarded-Access-Token")
+    warehouse_manager = WarehouseManager(user_token=user_token)
+    
+    try:
+        analysis = fetch_trace_analysis(warehouse_manager, trace_id)
+        if analysis is None:
+            raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
+        return analysis
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Trace analysis failed for {trace_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
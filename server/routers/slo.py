@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from server.models.observability import SloStatus
+from server.services.slo import slo_ledger
+
+router = APIRouter()
+
+
+@router.get("")
+async def list_slos(
+    service_name: Optional[str] = Query(default=None, description="Only SLOs for this service")
+) -> list[SloStatus]:
+    statuses = slo_ledger.evaluate()
+    if service_name is not None:
+        statuses = [status for status in statuses if status.slo.service_name == service_name]
+    return statuses
+
+
+@router.get("/{slo_name}")
+async def get_slo(slo_name: str) -> SloStatus:
+    for status in slo_ledger.evaluate():
+        if status.slo.name == slo_name:
+            return status
+    raise HTTPException(status_code=404, detail=f"Unknown SLO: {slo_name}")
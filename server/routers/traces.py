@@ -1,8 +1,23 @@
-from fastapi import APIRouter, HTTPException, Query, Request
-from typing import Literal
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
 import logging
 from server.models.observability import TraceInfo
 from server.services.warehouse_manager import WarehouseManager
+from server.services.trace_pages import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NDJSON_MEDIA_TYPE,
+    NEXT_CURSOR_HEADER,
+    TRACE_REQUIRED,
+    fetch_trace_page,
+    iter_ndjson,
+    paginate,
+    tee_trace_ids,
+)
+from server.services.projection import parse_fields, project_all, sparse_response
+from server.services.trace_details import prefetch_trace_details
+from server.services.trace_assembler import trace_assembler
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -22,32 +37,47 @@ def get_time_range_interval(time_range: TimeRange) -> tuple[str, int]:
 @router.get("")
 async def get_all_traces(
     request: Request,
-    time_range: TimeRange = Query(default="1h", description="Time range for traces")
+    response: Response,
+    background_tasks: BackgroundTasks,
+    time_range: TimeRange = Query(default="1h", description="Time range for traces"),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the previous page"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: Literal["json", "ndjson"] = Query(default="json", description="Response encoding"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated TraceInfo fields to return")
 ):
     user_token = request.headers.get("X-Forwarded-Access-Token")
     warehouse_manager = WarehouseManager(user_token=user_token)
     interval, seconds = get_time_range_interval(time_range)
-    
-    query = f"""
-    SELECT 
-      trace_id,
-      trace_start,
-      services_involved,
-      total_trace_duration_ms as total_duration_ms,
-      span_count
-    FROM jmr_demo.zerobus.traces_assembled_silver
-    WHERE trace_start >= NOW() - INTERVAL {interval}
-    ORDER BY trace_start DESC
-    LIMIT 100
-    """
+    selected = parse_fields(fields, TraceInfo, TRACE_REQUIRED)
     
     try:
-        results = warehouse_manager.execute_query(query)
-        if not results:
-            logger.info("No traces found")
-            return []
+        rows = fetch_trace_page(warehouse_manager, interval, limit, cursor, fields=selected)
+        trace_ids: list[str] = []
+        rows = tee_trace_ids(rows, trace_ids, limit)
+        background_tasks.add_task(prefetch_trace_details, warehouse_manager, trace_ids)
+        if format == "ndjson":
+            return StreamingResponse(iter_ndjson(rows, limit, selected), media_type=NDJSON_MEDIA_TYPE)
         
-        return [TraceInfo(**row) for row in results]
+        traces, next_cursor = paginate(rows, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        if not traces:
+            logger.info("No traces found")
+        if selected is not None:
+            headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+            return sparse_response(project_all(traces, selected), headers=headers)
+        return traces
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Traces query failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+
+@router.get("/live")
+async def get_live_traces(
+    service_name: Optional[str] = Query(default=None, description="Only traces involving this service"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+) -> list[TraceInfo]:
+    """Traces assembled in-process from received OTLP spans, most recently closed first."""
+    return trace_assembler.recent(service_name, limit)
@@ -0,0 +1,274 @@
+"""Alert rules evaluated in-process on every background refresh.
+
+Rules are indexed by service, so one evaluation computes each metric once for
+all services (health z-scores from the health engine, window aggregates from
+the service rollups) and then only visits the rules attached to each service.
+Each (rule, service) pair moves through pending -> firing -> resolved, and a
+notification is sent only on a transition, or again after `REPEAT_SECONDS` of
+continuous firing.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from server.config import ALERT_LOG_PATH, ALERT_WEBHOOK_URL
+from server.models.observability import Alert, AlertRule
+from server.services.health import HealthEngine, health_engine
+from server.services.rollups import RollupStore, histogram_quantiles
+from server.services.service_rollups import service_rollups
+from server.services.timestamps import format_timestamp, utcnow
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+ANOMALY_METRICS = {"latency_z", "error_rate_z", "throughput_z"}
+REPEAT_SECONDS = 4 * 3600
+# Resolved alerts stay visible for this long before they are forgotten.
+RESOLVED_RETENTION_SECONDS = 3600
+
+
+def load_alert_rules(path: str) -> List[AlertRule]:
+    """Rules from a JSON list of `AlertRule` objects; invalid entries are logged and skipped."""
+    file = Path(path)
+    if not file.exists():
+        logger.info(f"No alert rules at {path}")
+        return []
+    rules = []
+    names = set()
+    for entry in json.loads(file.read_text()):
+        try:
+            rule = AlertRule(**entry)
+        except Exception as e:
+            logger.warning(f"Skipping invalid alert rule {entry!r}: {e}")
+            continue
+        if (rule.kind == "anomaly") != (rule.metric in ANOMALY_METRICS):
+            logger.warning(f"Skipping alert rule {rule.name}: {rule.metric} is not a {rule.kind} metric")
+            continue
+        if rule.name in names:
+            logger.warning(f"Skipping duplicate alert rule {rule.name}")
+            continue
+        names.add(rule.name)
+        rules.append(rule)
+    logger.info(f"Loaded {len(rules)} alert rules from {path}")
+    return rules
+
+
+class AlertSink(Protocol):
+    def send(self, alerts: List[Alert]) -> None: ...
+
+
+class FileSink:
+    """Appends one JSON line per notification; a stand-in for a real notifier."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def send(self, alerts: List[Alert]) -> None:
+        with self.path.open("a") as f:
+            for alert in alerts:
+                f.write(alert.model_dump_json() + "\n")
+
+
+class WebhookSink:
+    """POSTs each batch of notifications as a JSON list."""
+
+    def __init__(self, url: str, timeout_seconds: float = 5.0):
+        self.url = url
+        self.timeout_seconds = timeout_seconds
+
+    def send(self, alerts: List[Alert]) -> None:
+        import httpx
+
+        response = httpx.post(
+            self.url, json=[alert.model_dump() for alert in alerts], timeout=self.timeout_seconds
+        )
+        response.raise_for_status()
+
+
+def default_sink() -> AlertSink:
+    """The configured webhook, or the local notification file when none is set."""
+    if ALERT_WEBHOOK_URL:
+        return WebhookSink(ALERT_WEBHOOK_URL)
+    return FileSink(ALERT_LOG_PATH)
+
+
+def _fingerprint(rule: str, service_name: str) -> str:
+    return hashlib.sha1(f"{rule}\0{service_name}".encode()).hexdigest()[:16]
+
+
+class AlertEngine:
+    def __init__(self, health: HealthEngine, rollups: RollupStore, sink: Optional[AlertSink] = None):
+        self.health = health
+        self.rollups = rollups
+        self.sink = sink
+        self._lock = threading.Lock()
+        self._alerts: Dict[str, Alert] = {}
+        self._notified_at: Dict[str, datetime] = {}
+        self.load([])
+
+    def load(self, rules: Sequence[AlertRule]) -> None:
+        """Replace the rule set and rebuild the per-service index; alerts of removed rules are dropped."""
+        by_service: Dict[str, List[AlertRule]] = defaultdict(list)
+        for rule in rules:
+            by_service[rule.service_name].append(rule)
+        with self._lock:
+            self.rules = list(rules)
+            self.by_service = dict(by_service)
+            names = {rule.name for rule in rules}
+            self._alerts = {key: alert for key, alert in self._alerts.items() if alert.rule in names}
+
+    def rules_for(self, service_name: str) -> List[AlertRule]:
+        return self.by_service.get(service_name, []) + self.by_service.get(WILDCARD, [])
+
+    def _window_metrics(self, minutes: int) -> Optional[Dict[str, Dict[str, float]]]:
+        """Threshold metrics for every service over the trailing window, or None if rollups lag."""
+        seconds = minutes * 60
+        if not self.rollups.covers_seconds(seconds):
+            return None
+        totals = self.rollups.window_seconds(seconds)
+        active = np.flatnonzero(totals.count)
+        percentiles = histogram_quantiles(totals.hist[active], (0.5, 0.95, 0.99))
+        counts = totals.count[active]
+        columns = {
+            "latency_p50": percentiles[:, 0],
+            "latency_p95": percentiles[:, 1],
+            "latency_p99": percentiles[:, 2],
+            "error_rate": totals.errors[active] / counts,
+            "requests_per_second": counts / seconds,
+        }
+        services = [totals.keys[i] for i in active]
+        return {
+            service: {metric: float(values[row]) for metric, values in columns.items()}
+            for row, service in enumerate(services)
+        }
+
+    def _anomaly_metrics(self) -> Dict[str, Dict[str, float]]:
+        return {
+            service: {"latency_z": a.latency_z, "error_rate_z": a.error_rate_z, "throughput_z": a.throughput_z}
+            for service, a in self.health.snapshot.items()
+        }
+
+    def evaluate(self) -> List[Alert]:
+        """Advance every (rule, service) state machine; returns the alerts that need notifying."""
+        now = utcnow()
+        anomaly = self._anomaly_metrics()
+        windows: Dict[int, Optional[Dict[str, Dict[str, float]]]] = {}
+        for rule in self.rules:
+            if rule.kind == "threshold" and rule.window_minutes not in windows:
+                windows[rule.window_minutes] = self._window_metrics(rule.window_minutes)
+
+        services = set(anomaly)
+        for metrics in windows.values():
+            services.update(metrics or ())
+        services.update(name for name in self.by_service if name != WILDCARD)
+
+        observed: Dict[str, Tuple[AlertRule, str, float, bool]] = {}
+        for service in services:
+            for rule in self.rules_for(service):
+                metrics = anomaly if rule.kind == "anomaly" else windows[rule.window_minutes]
+                if metrics is None:
+                    continue
+                value = metrics.get(service, {}).get(rule.metric)
+                if value is None and rule.metric == "requests_per_second":
+                    value = 0.0
+                if value is None:
+                    # No traffic in the window: nothing to compare, so the condition is not met.
+                    active = False
+                    value = 0.0
+                else:
+                    active = value > rule.threshold if rule.operator == ">" else value < rule.threshold
+                observed[_fingerprint(rule.name, service)] = (rule, service, value, active)
+
+        with self._lock:
+            notify = [
+                alert for key, (rule, service, value, active) in observed.items()
+                if (alert := self._transition(key, rule, service, value, active, now)) is not None
+            ]
+            for key, alert in list(self._alerts.items()):
+                if alert.state == "resolved" and alert.resolved_at is not None:
+                    resolved = datetime.fromisoformat(alert.resolved_at.replace("Z", "+00:00"))
+                    if (now - resolved).total_seconds() > RESOLVED_RETENTION_SECONDS:
+                        del self._alerts[key]
+                        self._notified_at.pop(key, None)
+        return notify
+
+    def _transition(
+        self, key: str, rule: AlertRule, service: str, value: float, active: bool, now: datetime
+    ) -> Optional[Alert]:
+        alert = self._alerts.get(key)
+        stamp = format_timestamp(now)
+        if not active:
+            if alert is None or alert.state == "resolved":
+                return None
+            if alert.state == "pending":
+                del self._alerts[key]
+                return None
+            self._alerts[key] = alert.model_copy(update={"state": "resolved", "value": value, "resolved_at": stamp})
+            return self._alerts[key]
+
+        if alert is None or alert.state == "resolved":
+            alert = Alert(
+                fingerprint=key,
+                rule=rule.name,
+                service_name=service,
+                severity=rule.severity,
+                state="pending",
+                metric=rule.metric,
+                value=value,
+                threshold=rule.threshold,
+                summary=f"{service}: {rule.metric} {value:.4g} {rule.operator} {rule.threshold:g}",
+                started_at=stamp,
+            )
+        else:
+            alert = alert.model_copy(update={
+                "value": value, "summary": f"{service}: {rule.metric} {value:.4g} {rule.operator} {rule.threshold:g}",
+            })
+        started = datetime.fromisoformat(alert.started_at.replace("Z", "+00:00"))
+        if alert.state == "pending" and (now - started).total_seconds() >= rule.for_minutes * 60:
+            alert = alert.model_copy(update={"state": "firing", "fired_at": stamp})
+        self._alerts[key] = alert
+        if alert.state != "firing":
+            return None
+        last = self._notified_at.get(key)
+        if last is not None and (now - last).total_seconds() < REPEAT_SECONDS and alert.fired_at != stamp:
+            return None
+        return alert
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> None:
+        """Background job: evaluate after the health and rollup jobs, then notify the sink."""
+        notify = self.evaluate()
+        if not notify or self.sink is None:
+            return
+        try:
+            self.sink.send(notify)
+        except Exception as e:
+            logger.warning(f"Alert sink failed for {len(notify)} notifications: {e}")
+            return
+        now = utcnow()
+        with self._lock:
+            for alert in notify:
+                if alert.state == "firing":
+                    self._notified_at[alert.fingerprint] = now
+                else:
+                    self._notified_at.pop(alert.fingerprint, None)
+        logger.info(f"Sent {len(notify)} alert notifications")
+
+    def alerts(self, service_name: Optional[str] = None) -> List[Alert]:
+        with self._lock:
+            alerts = list(self._alerts.values())
+        if service_name is not None:
+            alerts = [alert for alert in alerts if alert.service_name == service_name]
+        order = {"firing": 0, "pending": 1, "resolved": 2}
+        return sorted(alerts, key=lambda a: (order[a.state], a.severity != "critical", a.started_at))
+
+
+alert_engine = AlertEngine(health_engine, service_rollups, default_sink())
@@ -0,0 +1,231 @@
+"""Approximate service metrics from a sample of traces, with 95% confidence intervals.
+
+Whole traces are sampled with TABLESAMPLE, so the exploded span scan shrinks by
+the sampling rate, and percentiles use `approx_percentile` instead of an exact
+sort. Counts are scaled back up by the sampling rate. Each metric comes with a
+normal-approximation interval: counts as Bernoulli draws, error rates as a
+Wilson interval, means from the sample standard deviation, and percentiles from
+the order statistics around the target rank, read off a grid of quantiles the
+query returns alongside them. Spans of one trace are sampled together, so the
+intervals are somewhat narrower than the true ones for services called many
+times per trace. Queries given the same `seed` (REPEATABLE) read the same
+sample, so a snapshot and its trend agree.
+"""
+
+import json
+import math
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from server.config import APPROX_SAMPLE_PERCENT, OBSERVABILITY_TABLE_PREFIX
+from server.models.observability import ConfidenceInterval, MetricsSnapshot, MetricsTimeSeries, ServiceHealth
+from server.services.health import health_engine
+
+Z_95 = 1.96
+# Relative accuracy passed to approx_percentile (its default is 10000).
+PERCENTILE_ACCURACY = 10000
+TARGETS = (0.5, 0.95, 0.99)
+# Quantile levels returned for every group: the targets plus enough neighbours to
+# interpolate their confidence bounds. 0 and 1 (the sample min and max) bound
+# intervals wider than the grid.
+QUANTILE_GRID: Tuple[float, ...] = tuple(sorted(set(
+    [0.0, 1.0]
+    + [round(0.3 + 0.02 * i, 3) for i in range(21)]
+    + [round(0.85 + 0.01 * i, 3) for i in range(15)]
+    + [round(0.98 + 0.001 * i, 4) for i in range(20)]
+    + [0.9995, 0.9999]
+)))
+
+
+def _grid_sql() -> str:
+    return ", ".join(repr(level) for level in QUANTILE_GRID)
+
+
+def new_sample_seed() -> int:
+    """Seed for TABLESAMPLE REPEATABLE; one per request, shared by all of its sampled queries."""
+    return random.randrange(2**31)
+
+
+def _sampled_spans(interval: str, sample_percent: float, service_filter: bool, seed: Optional[int]) -> str:
+    service_clause = "AND span.service_name = :service_name" if service_filter else ""
+    repeatable = f" REPEATABLE ({int(seed)})" if seed is not None else ""
+    return f"""
+    sampled_spans AS (
+      SELECT
+        span.service_name,
+        span.duration_ms,
+        span.is_error,
+        t.trace_start
+      FROM {OBSERVABILITY_TABLE_PREFIX}.traces_assembled_silver TABLESAMPLE ({sample_percent:g} PERCENT){repeatable} t
+      LATERAL VIEW explode(span_details) AS span
+      WHERE t.trace_start >= NOW() - INTERVAL {interval}
+        {service_clause}
+    )"""
+
+
+def _aggregate_columns() -> str:
+    return f"""
+      approx_percentile(duration_ms, array({_grid_sql()}), {PERCENTILE_ACCURACY}) as quantiles,
+      AVG(duration_ms) as avg_duration_ms,
+      STDDEV(duration_ms) as duration_stddev,
+      MAX(duration_ms) as max_duration_ms,
+      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
+      COUNT(*) as request_count"""
+
+
+def approximate_services_query(
+    interval: str, sample_percent: float = APPROX_SAMPLE_PERCENT, seed: Optional[int] = None
+) -> str:
+    return f"""
+    WITH {_sampled_spans(interval, sample_percent, service_filter=False, seed=seed)}
+    SELECT
+      service_name,{_aggregate_columns()}
+    FROM sampled_spans
+    GROUP BY service_name
+    ORDER BY request_count DESC
+    """
+
+
+def approximate_service_query(
+    interval: str, sample_percent: float = APPROX_SAMPLE_PERCENT, seed: Optional[int] = None
+) -> str:
+    """One service's window; bind `service_name`."""
+    return f"""
+    WITH {_sampled_spans(interval, sample_percent, service_filter=True, seed=seed)}
+    SELECT{_aggregate_columns()}
+    FROM sampled_spans
+    """
+
+
+def approximate_trends_query(
+    interval: str, sample_percent: float = APPROX_SAMPLE_PERCENT, seed: Optional[int] = None
+) -> str:
+    """Per-minute trend of one service; pass the snapshot query's `seed` to read the same sample."""
+    return f"""
+    WITH {_sampled_spans(interval, sample_percent, service_filter=True, seed=seed)}
+    SELECT
+      date_trunc('minute', trace_start) as timestamp,
+      approx_percentile(duration_ms, 0.95, {PERCENTILE_ACCURACY}) as latency_p95,
+      AVG(duration_ms) as avg_duration_ms,
+      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as error_count,
+      COUNT(*) as request_count
+    FROM sampled_spans
+    GROUP BY 1
+    ORDER BY 1
+    """
+
+
+def count_interval(sampled: int, fraction: float) -> Tuple[float, ConfidenceInterval]:
+    """Scaled-up count and its interval, treating each item as kept with probability `fraction`."""
+    estimate = sampled / fraction
+    margin = Z_95 * math.sqrt(sampled * (1.0 - fraction)) / fraction
+    return estimate, ConfidenceInterval(lower=max(estimate - margin, float(sampled)), upper=estimate + margin)
+
+
+def wilson_interval(successes: int, n: int) -> ConfidenceInterval:
+    if n == 0:
+        return ConfidenceInterval(lower=0.0, upper=1.0)
+    p = successes / n
+    denominator = 1 + Z_95 * Z_95 / n
+    center = (p + Z_95 * Z_95 / (2 * n)) / denominator
+    margin = Z_95 * math.sqrt(p * (1 - p) / n + Z_95 * Z_95 / (4 * n * n)) / denominator
+    return ConfidenceInterval(lower=max(center - margin, 0.0), upper=min(center + margin, 1.0))
+
+
+def quantile_interval(grid_values: np.ndarray, q: float, n: int) -> ConfidenceInterval:
+    """Bounds of the q-quantile: the sample quantiles at ranks n*q -/+ z*sqrt(n*q*(1-q))."""
+    margin = Z_95 * math.sqrt(q * (1 - q) / max(n, 1))
+    lower = float(np.interp(max(q - margin, 0.0), QUANTILE_GRID, grid_values))
+    upper = float(np.interp(min(q + margin, 1.0), QUANTILE_GRID, grid_values))
+    return ConfidenceInterval(lower=lower, upper=upper)
+
+
+def _grid_values(row: Dict[str, Any]) -> np.ndarray:
+    values = row.get("quantiles")
+    if isinstance(values, str):
+        values = json.loads(values)
+    return np.array([float(v) for v in values or [0.0] * len(QUANTILE_GRID)], dtype=np.float64)
+
+
+def estimate_metrics(row: Dict[str, Any], seconds: int, sample_percent: float) -> Optional[Dict[str, Any]]:
+    """Scaled metrics plus `confidence_intervals` from one sampled aggregate row; None if empty."""
+    n = int(row.get("request_count") or 0)
+    if n == 0:
+        return None
+    fraction = sample_percent / 100.0
+    errors = int(row.get("error_count") or 0)
+    grid = _grid_values(row)
+    mean = float(row.get("avg_duration_ms") or 0.0)
+    stddev = float(row.get("duration_stddev") or 0.0)
+
+    request_count, count_ci = count_interval(n, fraction)
+    error_count, error_ci = count_interval(errors, fraction)
+    percentiles = {q: float(np.interp(q, QUANTILE_GRID, grid)) for q in TARGETS}
+    mean_margin = Z_95 * stddev / math.sqrt(n)
+    intervals = {
+        "latency_p50": quantile_interval(grid, 0.5, n),
+        "latency_p95": quantile_interval(grid, 0.95, n),
+        "latency_p99": quantile_interval(grid, 0.99, n),
+        "avg_duration_ms": ConfidenceInterval(lower=max(mean - mean_margin, 0.0), upper=mean + mean_margin),
+        "error_count": error_ci,
+        "error_rate": wilson_interval(errors, n),
+        "request_count": count_ci,
+        "requests_per_second": ConfidenceInterval(lower=count_ci.lower / seconds, upper=count_ci.upper / seconds),
+    }
+    return {
+        "latency_p50": percentiles[0.5],
+        "latency_p95": percentiles[0.95],
+        "latency_p99": percentiles[0.99],
+        "avg_duration_ms": mean,
+        # The sample maximum only bounds the true maximum from below.
+        "max_duration_ms": float(row.get("max_duration_ms") or 0.0),
+        "error_count": round(error_count),
+        "error_rate": errors / n,
+        "request_count": round(request_count),
+        "requests_per_second": request_count / seconds,
+        "confidence_intervals": intervals,
+        "sample_fraction": fraction,
+    }
+
+
+def approximate_service_health(
+    rows: List[Dict[str, Any]], seconds: int, sample_percent: float = APPROX_SAMPLE_PERCENT
+) -> List[ServiceHealth]:
+    services = []
+    for row in rows:
+        metrics = estimate_metrics(row, seconds, sample_percent)
+        if metrics is None:
+            continue
+        for name in ("latency_p50", "latency_p95", "latency_p99"):
+            metrics[f"current_{name}"] = metrics.pop(name)
+        intervals = metrics["confidence_intervals"]
+        for name in ("latency_p50", "latency_p95", "latency_p99"):
+            intervals[f"current_{name}"] = intervals.pop(name)
+        services.append(ServiceHealth(
+            service_name=row["service_name"],
+            health_status=health_engine.health_of(row["service_name"]),
+            health_as_of=health_engine.scored_at,
+            approximate=True,
+            **metrics,
+        ))
+    return services
+
+
+def approximate_snapshot(
+    row: Optional[Dict[str, Any]], seconds: int, sample_percent: float = APPROX_SAMPLE_PERCENT
+) -> Optional[MetricsSnapshot]:
+    metrics = estimate_metrics(row or {}, seconds, sample_percent)
+    return MetricsSnapshot(approximate=True, **metrics) if metrics is not None else None
+
+
+def approximate_trend(row: Dict[str, Any], sample_percent: float = APPROX_SAMPLE_PERCENT) -> MetricsTimeSeries:
+    fraction = sample_percent / 100.0
+    return MetricsTimeSeries(
+        timestamp=row["timestamp"],
+        latency_p95=float(row["latency_p95"] or 0.0),
+        avg_duration_ms=float(row["avg_duration_ms"] or 0.0),
+        error_count=round(int(row["error_count"] or 0) / fraction),
+        request_count=round(int(row["request_count"] or 0) / fraction),
+    )
@@ -0,0 +1,69 @@
+"""Periodic background refresh of in-process indexes and snapshots."""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from server.config import BACKGROUND_REFRESH_ENABLED, BACKGROUND_REFRESH_SECONDS
+from server.services.warehouse_manager import WarehouseManager, get_shared_warehouse_manager
+
+logger = logging.getLogger(__name__)
+
+RefreshJob = Callable[[WarehouseManager], None]
+
+
+class BackgroundRefresher:
+    """Runs registered jobs in order, once per cadence tick, off the event loop."""
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self._jobs: List[Tuple[str, RefreshJob]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Dict[str, float] = {}
+        self.last_error: Dict[str, str] = {}
+
+    def register(self, name: str, job: RefreshJob) -> None:
+        """Add a job, replacing any job already registered under the same name."""
+        self._jobs = [(existing, fn) for existing, fn in self._jobs if existing != name]
+        self._jobs.append((name, job))
+
+    def run_once(self) -> None:
+        warehouse_manager = get_shared_warehouse_manager()
+        for name, job in self._jobs:
+            started = time.monotonic()
+            try:
+                job(warehouse_manager)
+                self.last_run[name] = time.time()
+                self.last_error.pop(name, None)
+                logger.debug(f"Refresh job {name} took {time.monotonic() - started:.2f}s")
+            except Exception as e:
+                self.last_error[name] = str(e)
+                logger.warning(f"Refresh job {name} failed: {e}", exc_info=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.warning(f"Background refresh tick failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if not BACKGROUND_REFRESH_ENABLED:
+            logger.info("Background refresh disabled")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+refresher = BackgroundRefresher(BACKGROUND_REFRESH_SECONDS)
@@ -0,0 +1,308 @@
+"""Compare one service's latency distribution between two arbitrary windows.
+
+A window is assembled from pieces: minutes the in-memory rollups still hold are
+merged from there, whole past hours come from a per-service hour-segment cache,
+and only what is left is read from the warehouse, as hourly histograms, and
+then cached. Comparisons of long or old windows (the same hour last week) thus
+cost one small query the first time and none afterwards.
+"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from server.config import OBSERVABILITY_TABLE_PREFIX
+from server.models.observability import (
+    DependencyAttribution,
+    DistributionShift,
+    PercentileDelta,
+    WindowComparison,
+    WindowStats,
+)
+from server.services.cache import TTLCache
+from server.services.edges import PARENT_LOOKBACK, edge_rollups
+from server.services.rollups import (
+    BUCKET_COUNT,
+    BUCKET_LOWER,
+    BUCKET_UPPER,
+    bucket_sql,
+    histogram_quantiles,
+    minute_of,
+    minute_start,
+)
+from server.services.service_rollups import service_rollups
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+HOUR = 60
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+# Key of the service's own spans inside a segment; other keys are called services.
+SELF = ""
+# Past hours never change once late data has settled, so they can live long enough
+# to serve week-over-week comparisons.
+SEGMENT_TTL_SECONDS = 8 * 24 * 3600
+SEGMENT_SETTLE_MINUTES = 10
+
+
+@dataclass
+class Aggregate:
+    count: int = 0
+    errors: int = 0
+    duration_sum: float = 0.0
+    duration_max: float = 0.0
+    hist: np.ndarray = field(default_factory=lambda: np.zeros(BUCKET_COUNT, dtype=np.int64))
+
+    def add(self, other: "Aggregate") -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.duration_sum += other.duration_sum
+        self.duration_max = max(self.duration_max, other.duration_max)
+        self.hist += other.hist
+
+
+Segment = Dict[str, Aggregate]
+
+segment_cache: TTLCache[Segment] = TTLCache(20000, SEGMENT_TTL_SECONDS)
+
+
+def _merge(target: Segment, source: Segment) -> None:
+    for key, aggregate in source.items():
+        target.setdefault(key, Aggregate()).add(aggregate)
+
+
+def _from_rollups(service_name: str, start: int, end: int) -> Segment:
+    segment: Segment = {}
+    totals = service_rollups.window(start, end)
+    for key_id, key in totals.rows():
+        if key == service_name:
+            segment[SELF] = Aggregate(
+                int(totals.count[key_id]), int(totals.errors[key_id]), float(totals.duration_sum[key_id]),
+                float(totals.duration_max[key_id]), totals.hist[key_id].copy(),
+            )
+    totals = edge_rollups.window(start, end)
+    for key_id, (source, target) in totals.rows():
+        if source == service_name:
+            segment[target] = Aggregate(
+                int(totals.count[key_id]), int(totals.errors[key_id]), float(totals.duration_sum[key_id]),
+                float(totals.duration_max[key_id]), totals.hist[key_id].copy(),
+            )
+    return segment
+
+
+def _segment_query() -> str:
+    return f"""
+    SELECT
+      date_trunc('hour', start_time) as hour,
+      '' as target,
+      {bucket_sql("duration_ms")} as bucket,
+      COUNT(*) as count,
+      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as errors,
+      SUM(duration_ms) as duration_sum,
+      MAX(duration_ms) as duration_max
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver
+    WHERE service_name = :service_name
+      AND start_time >= CAST(:since AS TIMESTAMP)
+      AND start_time < CAST(:until AS TIMESTAMP)
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT
+      date_trunc('hour', c.start_time) as hour,
+      c.service_name as target,
+      {bucket_sql("c.duration_ms")} as bucket,
+      COUNT(*) as count,
+      SUM(CASE WHEN c.is_error THEN 1 ELSE 0 END) as errors,
+      SUM(c.duration_ms) as duration_sum,
+      MAX(c.duration_ms) as duration_max
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver c
+    JOIN {OBSERVABILITY_TABLE_PREFIX}.traces_silver p
+      ON c.trace_id = p.trace_id AND c.parent_span_id = p.span_id
+    WHERE p.service_name = :service_name
+      AND c.service_name <> :service_name
+      AND c.start_time >= CAST(:since AS TIMESTAMP)
+      AND c.start_time < CAST(:until AS TIMESTAMP)
+      AND p.start_time >= CAST(:since AS TIMESTAMP) - {PARENT_LOOKBACK}
+    GROUP BY 1, 2, 3
+    """
+
+
+def _from_warehouse(
+    warehouse_manager: WarehouseManager, service_name: str, start: int, end: int
+) -> Dict[int, Segment]:
+    """Hourly segments for [start, end), keyed by the first minute of each hour."""
+    parameters = {
+        "service_name": service_name,
+        "since": format_timestamp(minute_start(start)),
+        "until": format_timestamp(minute_start(end)),
+    }
+    segments: Dict[int, Segment] = {}
+    for row in warehouse_manager.iter_query(_segment_query(), parameters):
+        hour = max(minute_of(parse_timestamp(row["hour"])), start)
+        aggregate = segments.setdefault(hour, {}).setdefault(row["target"] or SELF, Aggregate())
+        count = int(row["count"])
+        aggregate.count += count
+        aggregate.errors += int(row["errors"] or 0)
+        aggregate.duration_sum += float(row["duration_sum"] or 0.0)
+        aggregate.duration_max = max(aggregate.duration_max, float(row["duration_max"] or 0.0))
+        aggregate.hist[int(row["bucket"])] += count
+    return segments
+
+
+def _pieces(start: int, end: int) -> List[Tuple[int, int]]:
+    """Split [start, end) at hour boundaries."""
+    pieces = []
+    cursor = start
+    while cursor < end:
+        boundary = min((cursor // HOUR + 1) * HOUR, end)
+        pieces.append((cursor, boundary))
+        cursor = boundary
+    return pieces
+
+
+def load_window(warehouse_manager: WarehouseManager, service_name: str, start: int, end: int) -> Segment:
+    """The service's own latency histogram and its outbound calls over minutes [start, end)."""
+    total: Segment = {}
+    in_memory = (
+        service_rollups.covers(start) and edge_rollups.covers(start)
+        and end <= min(service_rollups.watermark, edge_rollups.watermark)
+    )
+    if in_memory:
+        return _from_rollups(service_name, start, end)
+
+    settled = minute_of(utcnow()) - SEGMENT_SETTLE_MINUTES
+    missing: List[Tuple[int, int]] = []
+    for piece_start, piece_end in _pieces(start, end):
+        whole_hour = piece_end - piece_start == HOUR
+        cached = segment_cache.get((service_name, piece_start)) if whole_hour else None
+        if cached is not None:
+            _merge(total, cached)
+        elif missing and missing[-1][1] == piece_start:
+            missing[-1] = (missing[-1][0], piece_end)
+        else:
+            missing.append((piece_start, piece_end))
+
+    for run_start, run_end in missing:
+        segments = _from_warehouse(warehouse_manager, service_name, run_start, run_end)
+        for piece_start, piece_end in _pieces(run_start, run_end):
+            segment = segments.get(piece_start, {})
+            if piece_end - piece_start == HOUR and piece_end <= settled:
+                segment_cache.set((service_name, piece_start), segment)
+            _merge(total, segment)
+    logger.info(f"Window {start}..{end} for {service_name}: {len(missing)} warehouse reads")
+    return total
+
+
+def window_stats(aggregate: Aggregate, start: int, end: int) -> WindowStats:
+    p50, p90, p95, p99 = histogram_quantiles(aggregate.hist, PERCENTILES)
+    count = aggregate.count
+    return WindowStats(
+        start=format_timestamp(minute_start(start)),
+        end=format_timestamp(minute_start(end)),
+        request_count=count,
+        error_rate=aggregate.errors / count if count else 0.0,
+        requests_per_second=count / ((end - start) * 60),
+        avg_duration_ms=aggregate.duration_sum / count if count else 0.0,
+        latency_p50=float(p50),
+        latency_p90=float(p90),
+        latency_p95=float(p95),
+        latency_p99=float(p99),
+    )
+
+
+def _kolmogorov_p_value(statistic: float, n1: int, n2: int) -> float:
+    """Asymptotic two-sample KS p-value (Stephens' small-sample correction)."""
+    if n1 == 0 or n2 == 0 or statistic <= 0:
+        return 1.0
+    effective = math.sqrt(n1 * n2 / (n1 + n2))
+    lam = (effective + 0.12 + 0.11 / effective) * statistic
+    # The alternating series converges too slowly to truncate for small lambda,
+    # where the p-value is 1 to within 1e-5 anyway.
+    if lam < 0.3:
+        return 1.0
+    total = sum(2 * (-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return min(max(total, 0.0), 1.0)
+
+
+def distribution_shift(baseline: np.ndarray, current: np.ndarray) -> DistributionShift:
+    """KS statistic and Wasserstein-1 distance between two bucketed latency distributions.
+
+    Both are computed on bucket edges, so the KS statistic is a lower bound of the
+    exact one and the Wasserstein distance is accurate to a bucket width.
+    """
+    n1, n2 = int(baseline.sum()), int(current.sum())
+    if n1 == 0 or n2 == 0:
+        return DistributionShift(ks_statistic=0.0, p_value=1.0, wasserstein_ms=0.0)
+    cdf1 = np.cumsum(baseline) / n1
+    cdf2 = np.cumsum(current) / n2
+    difference = np.abs(cdf1 - cdf2)
+    statistic = float(difference.max())
+    return DistributionShift(
+        ks_statistic=statistic,
+        p_value=_kolmogorov_p_value(statistic, n1, n2),
+        wasserstein_ms=float((difference * (BUCKET_UPPER - BUCKET_LOWER)).sum()),
+    )
+
+
+def attribute(baseline: Segment, current: Segment) -> List[DependencyAttribution]:
+    """Change in time spent per request of the service in each called service, largest first.
+
+    For each dependency, calls per request times average call latency is the time
+    a request spends waiting on it; its change between windows is the dependency's
+    share of the service's latency change (ignoring concurrency between calls).
+    """
+    requests = (baseline.get(SELF, Aggregate()).count, current.get(SELF, Aggregate()).count)
+    attributions = []
+    for target in sorted((set(baseline) | set(current)) - {SELF}):
+        values = []
+        for segment, request_count in zip((baseline, current), requests):
+            aggregate = segment.get(target, Aggregate())
+            per_request = aggregate.count / request_count if request_count else 0.0
+            latency = aggregate.duration_sum / aggregate.count if aggregate.count else 0.0
+            values.append((per_request, latency))
+        (base_calls, base_latency), (cur_calls, cur_latency) = values
+        attributions.append(DependencyAttribution(
+            service_name=target,
+            baseline_calls_per_request=base_calls,
+            current_calls_per_request=cur_calls,
+            baseline_avg_latency_ms=base_latency,
+            current_avg_latency_ms=cur_latency,
+            contribution_ms=cur_calls * cur_latency - base_calls * base_latency,
+        ))
+    return sorted(attributions, key=lambda a: -abs(a.contribution_ms))
+
+
+def compare_windows(
+    warehouse_manager: WarehouseManager,
+    service_name: str,
+    baseline_window: Tuple[int, int],
+    current_window: Tuple[int, int],
+) -> WindowComparison:
+    baseline = load_window(warehouse_manager, service_name, *baseline_window)
+    current = load_window(warehouse_manager, service_name, *current_window)
+    base_self, cur_self = baseline.get(SELF, Aggregate()), current.get(SELF, Aggregate())
+    base_stats = window_stats(base_self, *baseline_window)
+    cur_stats = window_stats(cur_self, *current_window)
+
+    percentiles = []
+    for q in PERCENTILES:
+        field_name = f"latency_p{int(q * 100)}"
+        before, after = getattr(base_stats, field_name), getattr(cur_stats, field_name)
+        percentiles.append(PercentileDelta(
+            percentile=q,
+            baseline_ms=before,
+            current_ms=after,
+            delta_ms=after - before,
+            delta_ratio=(after - before) / before if before else 0.0,
+        ))
+    return WindowComparison(
+        service_name=service_name,
+        baseline=base_stats,
+        current=cur_stats,
+        percentiles=percentiles,
+        shift=distribution_shift(base_self.hist, cur_self.hist),
+        dependencies=attribute(baseline, current),
+    )
@@ -0,0 +1,121 @@
+"""Caller -> callee edges derived from parent/child spans that cross a service boundary."""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from server.config import OBSERVABILITY_TABLE_PREFIX, ROLLUP_LATENESS_MINUTES, ROLLUP_RETENTION_MINUTES
+from server.models.observability import GraphEdge
+from server.services.rollups import RollupStore, WindowTotals, bucket_sql, histogram_quantiles
+from server.services.shared_cache import shared_rows
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+EdgeKey = Tuple[str, str]
+
+# Parents of spans near the start of a window may have started a little earlier.
+PARENT_LOOKBACK = "INTERVAL 1 HOUR"
+
+
+def _edge_rollup_query() -> str:
+    return f"""
+    SELECT
+      date_trunc('minute', c.start_time) as minute,
+      p.service_name as source,
+      c.service_name as target,
+      {bucket_sql("c.duration_ms")} as bucket,
+      COUNT(*) as count,
+      SUM(CASE WHEN c.is_error THEN 1 ELSE 0 END) as errors,
+      SUM(c.duration_ms) as duration_sum,
+      MAX(c.duration_ms) as duration_max
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver c
+    JOIN {OBSERVABILITY_TABLE_PREFIX}.traces_silver p
+      ON c.trace_id = p.trace_id AND c.parent_span_id = p.span_id
+    WHERE c.start_time >= CAST(:since AS TIMESTAMP)
+      AND c.start_time < CAST(:until AS TIMESTAMP)
+      AND p.start_time >= CAST(:since AS TIMESTAMP) - {PARENT_LOOKBACK}
+      AND p.service_name <> c.service_name
+    GROUP BY 1, 2, 3, 4
+    """
+
+
+def _edge_key(row: Dict[str, Any]) -> EdgeKey:
+    return (row["source"], row["target"])
+
+
+edge_rollups = RollupStore(
+    name="edges",
+    query=_edge_rollup_query,
+    key_of=_edge_key,
+    retention_minutes=ROLLUP_RETENTION_MINUTES,
+    lateness_minutes=ROLLUP_LATENESS_MINUTES,
+)
+
+
+def edges_from_totals(totals: WindowTotals, seconds: int) -> List[GraphEdge]:
+    """Turn merged edge rollups into graph edges with rate, error rate and latency percentiles."""
+    active = np.flatnonzero(totals.count)
+    if active.size == 0:
+        return []
+    percentiles = histogram_quantiles(totals.hist[active], (0.5, 0.95, 0.99))
+    edges = []
+    for row, key_id in enumerate(active):
+        source, target = totals.keys[key_id]
+        count = int(totals.count[key_id])
+        edges.append(GraphEdge(
+            source=source,
+            target=target,
+            callCount=count,
+            callsPerSecond=count / seconds,
+            errorRate=float(totals.errors[key_id]) / count,
+            latencyP50=float(percentiles[row, 0]),
+            latencyP95=float(percentiles[row, 1]),
+            latencyP99=float(percentiles[row, 2]),
+            avgLatency=float(totals.duration_sum[key_id]) / count,
+        ))
+    return edges
+
+
+def _window_edge_query(interval: str) -> str:
+    return f"""
+    SELECT
+      p.service_name as source,
+      c.service_name as target,
+      COUNT(*) as call_count,
+      SUM(CASE WHEN c.is_error THEN 1 ELSE 0 END) as error_count,
+      AVG(c.duration_ms) as avg_latency,
+      PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY c.duration_ms) as latency_p50,
+      PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY c.duration_ms) as latency_p95,
+      PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY c.duration_ms) as latency_p99
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver c
+    JOIN {OBSERVABILITY_TABLE_PREFIX}.traces_silver p
+      ON c.trace_id = p.trace_id AND c.parent_span_id = p.span_id
+    WHERE c.start_time >= NOW() - INTERVAL {interval}
+      AND p.start_time >= NOW() - INTERVAL {interval} - {PARENT_LOOKBACK}
+      AND p.service_name <> c.service_name
+    GROUP BY 1, 2
+    """
+
+
+def window_edges(warehouse_manager: WarehouseManager, interval: str, seconds: int) -> List[GraphEdge]:
+    """Edges for the trailing window, from rollups when they cover it, else one windowed query."""
+    if edge_rollups.covers_seconds(seconds):
+        return edges_from_totals(edge_rollups.window_seconds(seconds), seconds)
+
+    edges = []
+    for row in shared_rows(warehouse_manager, _window_edge_query(interval)):
+        count = int(row["call_count"])
+        edges.append(GraphEdge(
+            source=row["source"],
+            target=row["target"],
+            callCount=count,
+            callsPerSecond=count / seconds,
+            errorRate=int(row["error_count"] or 0) / count if count else 0.0,
+            latencyP50=float(row["latency_p50"] or 0.0),
+            latencyP95=float(row["latency_p95"] or 0.0),
+            latencyP99=float(row["latency_p99"] or 0.0),
+            avgLatency=float(row["avg_latency"] or 0.0),
+        ))
+    return edges
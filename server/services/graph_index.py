@@ -0,0 +1,234 @@
+"""Dependency-graph index: CSR adjacency, SCC condensation and precomputed reachability."""
+
+import heapq
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from server.models.observability import GraphEdge
+
+logger = logging.getLogger(__name__)
+
+# Bounds the simple-path search between two services on dense, cyclic graphs.
+MAX_PATH_EXPANSIONS = 5000
+
+
+def _csr(n: int, sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Offsets, neighbours and the edge position of each neighbour, grouped by source."""
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(offsets, sources + 1, 1)
+    return np.cumsum(offsets), targets[order], order
+
+
+def _strongly_connected(n: int, offsets: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Component id per node (iterative Tarjan); ids come out in reverse topological order."""
+    index = np.full(n, -1, dtype=np.int64)
+    low = np.zeros(n, dtype=np.int64)
+    component = np.full(n, -1, dtype=np.int64)
+    on_stack = np.zeros(n, dtype=bool)
+    stack: List[int] = []
+    counter = 0
+    components = 0
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        work = [(root, int(offsets[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                succ = int(targets[edge])
+                if index[succ] < 0:
+                    index[succ] = low[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack[succ] = True
+                    work.append((succ, int(offsets[succ])))
+                elif on_stack[succ]:
+                    low[node] = min(low[node], index[succ])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = components
+                    if member == node:
+                        break
+                components += 1
+    return component
+
+
+class GraphIndex:
+    """Immutable-topology index over one edge set; edge weights can be swapped in place.
+
+    Reachability is stored per SCC as Python-int bitsets over components, built
+    once per topology in reverse topological order, so blast-radius lookups are a
+    bit scan rather than a graph walk.
+    """
+
+    def __init__(self, edges: Sequence[GraphEdge], services: Sequence[str] = ()):
+        names = list(dict.fromkeys([*services, *(e.source for e in edges), *(e.target for e in edges)]))
+        self.names = names
+        self.position = {name: i for i, name in enumerate(names)}
+        self.topology = frozenset((e.source, e.target) for e in edges)
+        n = len(names)
+
+        self.edge_keys = [(e.source, e.target) for e in edges]
+        self.edge_position = {key: i for i, key in enumerate(self.edge_keys)}
+        sources = np.array([self.position[e.source] for e in edges], dtype=np.int64)
+        targets = np.array([self.position[e.target] for e in edges], dtype=np.int64)
+        self.out_offsets, self.out_targets, self.out_edges = _csr(n, sources, targets)
+        self.in_offsets, self.in_sources, self.in_edges = _csr(n, targets, sources)
+
+        self.component = _strongly_connected(n, self.out_offsets, self.out_targets)
+        self.component_count = int(self.component.max()) + 1 if n else 0
+        self.members: List[List[int]] = [[] for _ in range(self.component_count)]
+        for node, comp in enumerate(self.component):
+            self.members[comp].append(node)
+        self.downstream = self._reachability(sources, targets, ascending=True)
+        self.upstream = self._reachability(targets, sources, ascending=False)
+        self.set_weights(edges)
+
+    def _reachability(self, sources: np.ndarray, targets: np.ndarray, ascending: bool) -> List[int]:
+        """Bitset of components reachable from each component (itself included).
+
+        Tarjan numbers sink components first, so condensation edges point to lower
+        ids; successors are therefore final before their predecessors when walking
+        ids ascending for call edges and descending for reversed ones.
+        """
+        successors: List[Set[int]] = [set() for _ in range(self.component_count)]
+        for s, t in zip(self.component[sources], self.component[targets]):
+            if s != t:
+                successors[s].add(int(t))
+        reach = [1 << c for c in range(self.component_count)]
+        order = range(self.component_count) if ascending else range(self.component_count - 1, -1, -1)
+        for comp in order:
+            for succ in successors[comp]:
+                reach[comp] |= reach[succ]
+        return reach
+
+    def set_weights(self, edges: Sequence[GraphEdge]) -> None:
+        """Refresh per-edge metrics without touching topology-derived structures."""
+        size = len(self.edge_keys)
+        self.latency = np.zeros(size)
+        self.calls = np.zeros(size)
+        self.error_rate = np.zeros(size)
+        for edge in edges:
+            i = self.edge_position[(edge.source, edge.target)]
+            self.latency[i] = edge.latencyP95 or edge.avgLatency
+            self.calls[i] = edge.callCount
+            self.error_rate[i] = edge.errorRate
+
+    def _services_in(self, bitset: int) -> List[int]:
+        nodes = []
+        comp = 0
+        while bitset:
+            if bitset & 1:
+                nodes.extend(self.members[comp])
+            bitset >>= 1
+            comp += 1
+        return nodes
+
+    def _hops(self, start: int, offsets: np.ndarray, neighbours: np.ndarray, allowed: Set[int]) -> Dict[int, int]:
+        hops = {start: 0}
+        frontier = [start]
+        while frontier:
+            nxt = []
+            for node in frontier:
+                for succ in neighbours[offsets[node]:offsets[node + 1]]:
+                    succ = int(succ)
+                    if succ in allowed and succ not in hops:
+                        hops[succ] = hops[node] + 1
+                        nxt.append(succ)
+            frontier = nxt
+        return hops
+
+    def blast_radius(self, service: str, upstream: bool) -> List[Tuple[str, int]]:
+        """Services transitively calling (upstream) or called by (downstream) `service`, with hop counts."""
+        node = self.position[service]
+        reach = (self.upstream if upstream else self.downstream)[self.component[node]]
+        allowed = set(self._services_in(reach))
+        if upstream:
+            hops = self._hops(node, self.in_offsets, self.in_sources, allowed)
+        else:
+            hops = self._hops(node, self.out_offsets, self.out_targets, allowed)
+        return sorted(((self.names[n], h) for n, h in hops.items() if n != node), key=lambda item: (item[1], item[0]))
+
+    def can_reach(self, source: int, target: int) -> bool:
+        return bool(self.downstream[self.component[source]] >> int(self.component[target]) & 1)
+
+    def hot_paths(self, source: str, target: str, k: int) -> Tuple[List[Tuple[float, List[int]]], bool]:
+        """Top-k simple paths by summed edge latency, and whether the search was exhaustive.
+
+        The search only expands nodes that are reachable from `source` and can still
+        reach `target`, trying the slowest edges first so good paths are found early.
+        """
+        start, goal = self.position[source], self.position[target]
+        if not self.can_reach(start, goal):
+            return [], True
+        relevant = set(self._services_in(self.downstream[self.component[start]] & self.upstream[self.component[goal]]))
+
+        best: List[Tuple[float, int, List[int]]] = []
+        expansions = 0
+        counter = 0
+        stack: List[Tuple[int, float, List[int], List[int]]] = [(start, 0.0, [start], [])]
+        while stack:
+            node, latency, path, edges = stack.pop()
+            if node == goal:
+                counter += 1
+                item = (latency, counter, edges)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                else:
+                    heapq.heappushpop(best, item)
+                continue
+            expansions += 1
+            if expansions > MAX_PATH_EXPANSIONS:
+                break
+            lo, hi = self.out_offsets[node], self.out_offsets[node + 1]
+            candidates = [(int(self.out_targets[j]), int(self.out_edges[j])) for j in range(lo, hi)]
+            candidates.sort(key=lambda item: self.latency[item[1]])
+            for succ, edge in candidates:
+                if succ in relevant and succ not in path:
+                    stack.append((succ, latency + float(self.latency[edge]), path + [succ], edges + [edge]))
+        paths = [(latency, edges) for latency, _, edges in sorted(best, reverse=True)]
+        return paths, expansions <= MAX_PATH_EXPANSIONS
+
+
+class GraphIndexRegistry:
+    """Latest index per time range; rebuilt only when the edge set changes."""
+
+    def __init__(self):
+        self._indexes: Dict[str, GraphIndex] = {}
+        self._lock = threading.Lock()
+
+    def update(self, time_range: str, edges: Sequence[GraphEdge], services: Sequence[str] = ()) -> GraphIndex:
+        topology = frozenset((e.source, e.target) for e in edges)
+        with self._lock:
+            current = self._indexes.get(time_range)
+        if current is not None and current.topology == topology and set(services) <= current.position.keys():
+            current.set_weights(edges)
+            return current
+        index = GraphIndex(edges, services)
+        logger.info(f"Graph index rebuilt for {time_range}: {len(index.names)} services, {len(edges)} edges")
+        with self._lock:
+            self._indexes[time_range] = index
+        return index
+
+    def get(self, time_range: str) -> Optional[GraphIndex]:
+        with self._lock:
+            return self._indexes.get(time_range)
+
+
+graph_indexes = GraphIndexRegistry()
@@ -0,0 +1,131 @@
+"""Vectorized force-directed layout, computed once per graph topology and warm-started."""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from server.models.observability import DependencyGraph
+from server.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LINK_DISTANCE = 100.0
+GRAVITY = 0.1
+COLD_ITERATIONS = 300
+WARM_ITERATIONS = 60
+# Rows of the pairwise repulsion matrix computed at once, bounding memory on big graphs.
+REPULSION_CHUNK = 1024
+
+
+def topology_version(graph: DependencyGraph) -> str:
+    digest = hashlib.sha1()
+    for node_id in sorted(node.id for node in graph.nodes):
+        digest.update(node_id.encode())
+        digest.update(b"\0")
+    digest.update(b"\1")
+    for source, target in sorted((edge.source, edge.target) for edge in graph.edges):
+        digest.update(f"{source}\0{target}\0".encode())
+    return digest.hexdigest()[:16]
+
+
+def force_layout(
+    positions: np.ndarray, sources: np.ndarray, targets: np.ndarray, iterations: int, temperature: float
+) -> np.ndarray:
+    """Fruchterman-Reingold with linear cooling; all pairwise forces per step in NumPy.
+
+    Repulsion is k^2/d between every pair, attraction d^2/k along edges, and a pull
+    toward the origin that grows with the node count keeps disconnected components
+    on screen.
+    """
+    positions = positions.astype(np.float64, copy=True)
+    n = len(positions)
+    if n < 2:
+        return np.zeros_like(positions)
+    k = LINK_DISTANCE
+    for step in range(iterations):
+        displacement = np.zeros_like(positions)
+        x, y = positions[:, 0], positions[:, 1]
+        for lo in range(0, n, REPULSION_CHUNK):
+            dx = x[lo:lo + REPULSION_CHUNK, None] - x[None, :]
+            dy = y[lo:lo + REPULSION_CHUNK, None] - y[None, :]
+            force = k * k / np.maximum(dx * dx + dy * dy, 1e-2)
+            displacement[lo:lo + REPULSION_CHUNK, 0] += (dx * force).sum(axis=1)
+            displacement[lo:lo + REPULSION_CHUNK, 1] += (dy * force).sum(axis=1)
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            distance = np.maximum(np.linalg.norm(delta, axis=1, keepdims=True), 1e-2)
+            pull = delta * distance / k
+            np.add.at(displacement, sources, -pull)
+            np.add.at(displacement, targets, pull)
+        displacement -= GRAVITY * n * positions
+        length = np.maximum(np.linalg.norm(displacement, axis=1, keepdims=True), 1e-9)
+        limit = temperature * (1.0 - step / iterations)
+        positions += displacement / length * np.minimum(length, limit)
+    return positions - positions.mean(axis=0)
+
+
+class GraphLayoutEngine:
+    """Caches one layout per topology version and seeds new layouts from the last one."""
+
+    def __init__(self, cache_size: int = 32):
+        self._layouts: TTLCache[Dict[str, Tuple[float, float]]] = TTLCache(cache_size, ttl_seconds=24 * 3600)
+        self._last: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _initial_positions(self, graph: DependencyGraph, version: str) -> Tuple[np.ndarray, bool]:
+        names = [node.id for node in graph.nodes]
+        rng = np.random.default_rng(int(version, 16))
+        spread = LINK_DISTANCE * np.sqrt(len(names))
+        positions = rng.uniform(-spread / 2, spread / 2, size=(len(names), 2))
+        known = [i for i, name in enumerate(names) if name in self._last]
+        for i in known:
+            positions[i] = self._last[names[i]]
+
+        # New nodes start next to their already-placed neighbours instead of at random.
+        neighbours: Dict[str, List[str]] = {}
+        for edge in graph.edges:
+            neighbours.setdefault(edge.source, []).append(edge.target)
+            neighbours.setdefault(edge.target, []).append(edge.source)
+        for i, name in enumerate(names):
+            if name in self._last:
+                continue
+            placed = [self._last[other] for other in neighbours.get(name, []) if other in self._last]
+            if placed:
+                positions[i] = np.mean(placed, axis=0) + rng.normal(0, LINK_DISTANCE / 4, size=2)
+        return positions, len(known) > len(names) // 2
+
+    def apply(self, graph: DependencyGraph) -> DependencyGraph:
+        """Return the graph with x/y on every node, computing a layout only for a new topology."""
+        version = topology_version(graph)
+        layout = self._layouts.get(version)
+        if layout is None:
+            with self._lock:
+                layout = self._layouts.get(version)
+                if layout is None:
+                    layout = self._compute(graph, version)
+        nodes = [node.model_copy(update={"x": layout[node.id][0], "y": layout[node.id][1]}) for node in graph.nodes]
+        return graph.model_copy(update={"nodes": nodes, "layoutVersion": version})
+
+    def _compute(self, graph: DependencyGraph, version: str) -> Dict[str, Tuple[float, float]]:
+        names = [node.id for node in graph.nodes]
+        position = {name: i for i, name in enumerate(names)}
+        pairs = [(position[e.source], position[e.target]) for e in graph.edges if e.source != e.target]
+        sources = np.array([s for s, _ in pairs], dtype=np.int64)
+        targets = np.array([t for _, t in pairs], dtype=np.int64)
+
+        initial, warm = self._initial_positions(graph, version)
+        if warm:
+            result = force_layout(initial, sources, targets, WARM_ITERATIONS, temperature=LINK_DISTANCE / 2)
+        else:
+            result = force_layout(initial, sources, targets, COLD_ITERATIONS, temperature=LINK_DISTANCE * 2)
+        layout = {name: (round(float(x), 1), round(float(y), 1)) for name, (x, y) in zip(names, result)}
+        self._layouts.set(version, layout)
+        self._last.update(layout)
+        logger.info(f"Layout {version} computed for {len(names)} nodes ({'warm' if warm else 'cold'} start)")
+        return layout
+
+
+graph_layouts = GraphLayoutEngine()
@@ -0,0 +1,203 @@
+"""Reduce a dependency graph to a screen-sized one: group services, then prune edges."""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Set, Tuple
+
+from server.models.observability import DependencyGraph, GraphEdge, GraphNode
+
+GroupBy = Literal["none", "prefix", "community"]
+RankBy = Literal["traffic", "latency"]
+
+GROUP_PREFIX = "group:"
+NAMESPACE_SEPARATORS = re.compile(r"[-._/:]")
+HEALTH_SEVERITY = {"healthy": 0, "warning": 1, "critical": 2}
+
+
+def namespace_of(service_name: str) -> str:
+    return NAMESPACE_SEPARATORS.split(service_name, maxsplit=1)[0] or service_name
+
+
+def group_by_prefix(nodes: Sequence[GraphNode]) -> Dict[str, str]:
+    """Service -> namespace; namespaces with a single service are left ungrouped."""
+    namespaces = {node.id: namespace_of(node.id) for node in nodes}
+    sizes: Dict[str, int] = defaultdict(int)
+    for namespace in namespaces.values():
+        sizes[namespace] += 1
+    return {service: namespace for service, namespace in namespaces.items() if sizes[namespace] > 1}
+
+
+def group_by_community(nodes: Sequence[GraphNode], edges: Sequence[GraphEdge], iterations: int = 20) -> Dict[str, str]:
+    """Weighted label propagation over the undirected call graph.
+
+    Each service repeatedly adopts the label carrying the most call volume among
+    its neighbours; ties go to the smaller label so results are deterministic.
+    Communities are named after their busiest member.
+    """
+    neighbours: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for edge in edges:
+        if edge.source != edge.target:
+            neighbours[edge.source][edge.target] += edge.callCount
+            neighbours[edge.target][edge.source] += edge.callCount
+
+    order = sorted(node.id for node in nodes)
+    labels = {service: service for service in order}
+    for _ in range(iterations):
+        changed = False
+        for service in order:
+            weights: Dict[str, float] = defaultdict(float)
+            for other, weight in neighbours[service].items():
+                weights[labels[other]] += weight
+            if not weights:
+                continue
+            best = min(weights, key=lambda label: (-weights[label], label))
+            if best != labels[service] and weights[best] > weights.get(labels[service], 0.0):
+                labels[service] = best
+                changed = True
+        if not changed:
+            break
+
+    traffic = {node.id: node.requestCount for node in nodes}
+    members: Dict[str, List[str]] = defaultdict(list)
+    for service, label in labels.items():
+        members[label].append(service)
+    groups = {}
+    for group_members in members.values():
+        if len(group_members) < 2:
+            continue
+        name = max(group_members, key=lambda service: (traffic.get(service, 0), service))
+        for service in group_members:
+            groups[service] = name
+    return groups
+
+
+def _merge_nodes(group_id: str, members: List[GraphNode]) -> GraphNode:
+    requests = sum(node.requestCount for node in members)
+    errors = sum(node.errorRate * node.requestCount for node in members)
+    return GraphNode(
+        id=group_id,
+        health=max((node.health for node in members), key=HEALTH_SEVERITY.__getitem__),
+        errorRate=errors / requests if requests else 0.0,
+        requestCount=requests,
+        isGroup=True,
+        memberCount=len(members),
+    )
+
+
+def _merge_edges(source: str, target: str, members: List[GraphEdge]) -> GraphEdge:
+    calls = sum(edge.callCount for edge in members)
+
+    def weighted(attribute: str) -> float:
+        if not calls:
+            return 0.0
+        return sum(getattr(edge, attribute) * edge.callCount for edge in members) / calls
+
+    return GraphEdge(
+        source=source,
+        target=target,
+        callCount=calls,
+        callsPerSecond=sum(edge.callsPerSecond for edge in members),
+        errorRate=weighted("errorRate"),
+        avgLatency=weighted("avgLatency"),
+        latencyP50=weighted("latencyP50"),
+        # Tail percentiles do not average; the slowest member edge is the honest bound.
+        latencyP95=max(edge.latencyP95 for edge in members),
+        latencyP99=max(edge.latencyP99 for edge in members),
+    )
+
+
+def collapse(graph: DependencyGraph, groups: Dict[str, str], expand: Iterable[str] = ()) -> DependencyGraph:
+    """Replace grouped services with one node per group, except groups listed in `expand`."""
+    expanded = {group.removeprefix(GROUP_PREFIX) for group in expand}
+    target_of: Dict[str, str] = {}
+    members: Dict[str, List[GraphNode]] = defaultdict(list)
+    nodes: List[GraphNode] = []
+    for node in graph.nodes:
+        group = groups.get(node.id)
+        if group is None:
+            target_of[node.id] = node.id
+            nodes.append(node)
+        elif group in expanded:
+            target_of[node.id] = node.id
+            nodes.append(node.model_copy(update={"group": GROUP_PREFIX + group}))
+        else:
+            target_of[node.id] = GROUP_PREFIX + group
+            members[GROUP_PREFIX + group].append(node)
+    nodes.extend(_merge_nodes(group_id, group_members) for group_id, group_members in members.items())
+
+    buckets: Dict[Tuple[str, str], List[GraphEdge]] = defaultdict(list)
+    for edge in graph.edges:
+        source = target_of.get(edge.source, edge.source)
+        target = target_of.get(edge.target, edge.target)
+        if source != target:
+            buckets[(source, target)].append(edge)
+    edges = [
+        bucket[0].model_copy(update={"source": source, "target": target}) if len(bucket) == 1
+        else _merge_edges(source, target, bucket)
+        for (source, target), bucket in buckets.items()
+    ]
+    return DependencyGraph(nodes=nodes, edges=edges, healthAsOf=graph.healthAsOf)
+
+
+def prune(
+    graph: DependencyGraph, max_nodes: Optional[int], max_edges: Optional[int], rank_by: RankBy
+) -> DependencyGraph:
+    """Keep the busiest nodes and the top edges, unhealthy nodes always.
+
+    Critical and warning nodes (or groups) are never pruned, even when there are
+    more of them than `max_nodes`; healthy nodes fill what is left of the budget,
+    busiest first, and `hiddenNodes` counts the ones dropped. Each unhealthy node
+    keeps its strongest edge even when that edge falls outside the top-N.
+    """
+    unhealthy = {node.id for node in graph.nodes if node.health != "healthy"}
+    nodes = graph.nodes
+    if max_nodes is not None and len(nodes) > max_nodes:
+        healthy = sorted(
+            (node for node in nodes if node.id not in unhealthy), key=lambda node: (-node.requestCount, node.id)
+        )
+        keep = unhealthy | {node.id for node in healthy[:max(0, max_nodes - len(unhealthy))]}
+        nodes = [node for node in nodes if node.id in keep]
+    kept_nodes = {node.id for node in nodes}
+
+    def score(edge: GraphEdge) -> float:
+        if rank_by == "latency":
+            return edge.latencyP95 or edge.avgLatency
+        return edge.callCount
+
+    edges = sorted(
+        (edge for edge in graph.edges if edge.source in kept_nodes and edge.target in kept_nodes),
+        key=score, reverse=True,
+    )
+    if max_edges is not None and len(edges) > max_edges:
+        kept: List[GraphEdge] = edges[:max_edges]
+        covered: Set[str] = {service for edge in kept for service in (edge.source, edge.target)}
+        for edge in edges[max_edges:]:
+            for service in (edge.source, edge.target):
+                if service in unhealthy and service not in covered:
+                    kept.append(edge)
+                    covered.update((edge.source, edge.target))
+                    break
+        edges = kept
+
+    return DependencyGraph(
+        nodes=nodes,
+        edges=edges,
+        hiddenNodes=graph.hiddenNodes + len(graph.nodes) - len(nodes),
+        hiddenEdges=graph.hiddenEdges + len(graph.edges) - len(edges),
+        healthAsOf=graph.healthAsOf,
+    )
+
+
+def reduce_graph(
+    graph: DependencyGraph,
+    group_by: GroupBy = "none",
+    expand: Iterable[str] = (),
+    max_nodes: Optional[int] = None,
+    max_edges: Optional[int] = None,
+    rank_by: RankBy = "traffic",
+) -> DependencyGraph:
+    if group_by == "prefix":
+        graph = collapse(graph, group_by_prefix(graph.nodes), expand)
+    elif group_by == "community":
+        graph = collapse(graph, group_by_community(graph.nodes, graph.edges), expand)
+    return prune(graph, max_nodes, max_edges, rank_by)
@@ -0,0 +1,276 @@
+"""Service health from EWMA and hour-of-day baselines over the per-service rollups.
+
+Every complete minute updates, for all services at once, a fast EWMA of the
+current level and a slow EWMA of the mean and mean absolute deviation of three
+signals: log p95 latency, error rate and requests per minute. The same update
+runs into one of 24 hour-of-day slots, which take over as the baseline once
+they have seen enough minutes. Health is a robust z-score of the fast level
+against the baseline, so one refresh costs a few array operations per new minute
+and never re-reads an older window from the warehouse.
+
+Latency and error rate count only when they rise. Throughput counts only when it
+falls, and by at least MIN_THROUGHPUT_DROP of its baseline: more traffic, or a
+small dip in a steady service, is a normal change and not an incident.
+
+Health describes the latest scored minute (`scored_at`), whatever window a
+caller is looking at.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from server.models.observability import ServiceAnomaly
+from server.services.rollups import MinuteBlock, RollupStore, histogram_quantiles, minute_start
+from server.services.service_rollups import service_rollups
+from server.services.timestamps import format_timestamp
+from server.services.warehouse_manager import WarehouseManager
+from server.services.warm_start import from_json_array, json_array
+
+logger = logging.getLogger(__name__)
+
+LATENCY, ERROR_RATE, THROUGHPUT = range(3)
+SIGNALS = 3
+
+FAST_ALPHA = 2 / (5 + 1)
+SLOW_ALPHA = 2 / (60 + 1)
+SEASONAL_ALPHA = 0.1
+# Minutes an hour-of-day slot must have seen before it replaces the plain EWMA baseline.
+SEASONAL_MIN_MINUTES = 120
+WARMUP_MINUTES = 15
+# Mean absolute deviation * 1.2533 estimates the standard deviation of a normal signal.
+MAD_TO_SIGMA = 1.2533
+# Observations further than this many sigmas are clipped before entering a baseline, so
+# an ongoing incident shifts the baseline slowly instead of becoming the new normal.
+WINSORIZE_Z = 3.0
+# Smallest scale per signal, so a perfectly flat baseline does not turn noise into alerts.
+SCALE_FLOOR = np.array([0.1, 0.01, 1.0])
+MIN_ERROR_RATE = 0.01
+# Fraction of its baseline that traffic must lose before a throughput z-score counts.
+MIN_THROUGHPUT_DROP = 0.5
+WARNING_Z = 3.0
+CRITICAL_Z = 5.0
+
+
+def _scale(mean: np.ndarray, dev: np.ndarray) -> np.ndarray:
+    """Sigma estimate per signal, floored; counts are at least Poisson-noisy whatever the history says."""
+    scale = np.maximum(dev * MAD_TO_SIGMA, SCALE_FLOOR)
+    scale[..., THROUGHPUT] = np.maximum(scale[..., THROUGHPUT], np.sqrt(np.maximum(mean[..., THROUGHPUT], 1.0)))
+    return scale
+
+
+def _ewma(mean: np.ndarray, dev: np.ndarray, values: np.ndarray, valid: np.ndarray, fresh: np.ndarray, alpha: float) -> None:
+    """In-place EWMA of mean and absolute deviation where `valid`; `fresh` rows start from the value."""
+    scale = _scale(mean, dev)
+    clipped = np.clip(values, mean - WINSORIZE_Z * scale, mean + WINSORIZE_Z * scale)
+    clipped = np.where(fresh, values, clipped)
+    update = valid & ~fresh
+    new_mean = np.where(update, mean + alpha * (clipped - mean), np.where(fresh & valid, values, mean))
+    new_dev = np.where(update, dev + alpha * (np.abs(clipped - mean) - dev), np.where(fresh & valid, 0.0, dev))
+    mean[...] = new_mean
+    dev[...] = new_dev
+
+
+def _digest(snapshot: Dict[str, ServiceAnomaly]) -> str:
+    content = hashlib.blake2b(digest_size=16)
+    for name in sorted(snapshot):
+        content.update(snapshot[name].model_dump_json().encode() + b"\n")
+    return content.hexdigest()
+
+
+class HealthEngine:
+    """Baselines and z-scores for every service in the rollup store, updated minute by minute."""
+
+    def __init__(self, rollups: RollupStore):
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self._size = 0
+        self._fast = np.zeros((0, SIGNALS))
+        self._mean = np.zeros((0, SIGNALS))
+        self._dev = np.zeros((0, SIGNALS))
+        self._seen = np.zeros((0, SIGNALS), dtype=np.int64)
+        self._seasonal_mean = np.zeros((24, 0, SIGNALS))
+        self._seasonal_dev = np.zeros((24, 0, SIGNALS))
+        self._seasonal_seen = np.zeros((24, 0, SIGNALS), dtype=np.int64)
+        self._processed_until: Optional[int] = None
+        self._snapshot: Dict[str, ServiceAnomaly] = {}
+        self._scored_at: Optional[str] = None
+        # Bumped whenever the snapshot is replaced.
+        self.version = 0
+        # Hash of the snapshot's content: equal in every worker that scored the same data.
+        self.digest = _digest({})
+
+    def _grow(self, size: int) -> None:
+        extra = size - self._size
+        if extra <= 0:
+            return
+        self._fast = np.concatenate([self._fast, np.zeros((extra, SIGNALS))])
+        self._mean = np.concatenate([self._mean, np.zeros((extra, SIGNALS))])
+        self._dev = np.concatenate([self._dev, np.zeros((extra, SIGNALS))])
+        self._seen = np.concatenate([self._seen, np.zeros((extra, SIGNALS), dtype=np.int64)])
+        self._seasonal_mean = np.concatenate([self._seasonal_mean, np.zeros((24, extra, SIGNALS))], axis=1)
+        self._seasonal_dev = np.concatenate([self._seasonal_dev, np.zeros((24, extra, SIGNALS))], axis=1)
+        self._seasonal_seen = np.concatenate(
+            [self._seasonal_seen, np.zeros((24, extra, SIGNALS), dtype=np.int64)], axis=1
+        )
+        self._size = size
+
+    def _observe(self, block: Optional[MinuteBlock]) -> np.ndarray:
+        """One minute's signals per service; NaN where a signal is undefined.
+
+        Latency and error rate need traffic in that minute. Throughput is a real zero
+        for a known service that went quiet, but undefined before its first request.
+        """
+        values = np.full((self._size, SIGNALS), np.nan)
+        values[:, THROUGHPUT] = np.where(self._seen[:, THROUGHPUT] > 0, 0.0, np.nan)
+        if block is None or len(block.key_ids) == 0:
+            return values
+        ids = block.key_ids
+        p95 = histogram_quantiles(block.hist, (0.95,))[:, 0]
+        values[ids, LATENCY] = np.log(np.maximum(p95, 1e-3))
+        values[ids, ERROR_RATE] = block.errors / np.maximum(block.count, 1)
+        values[ids, THROUGHPUT] = block.count
+        return values
+
+    def _step(self, minute: int, values: np.ndarray) -> None:
+        valid = ~np.isnan(values)
+        fresh = valid & (self._seen == 0)
+        values = np.nan_to_num(values)
+        self._fast[...] = np.where(fresh, values, np.where(valid, self._fast + FAST_ALPHA * (values - self._fast), self._fast))
+        _ewma(self._mean, self._dev, values, valid, fresh, SLOW_ALPHA)
+        self._seen += valid
+
+        hour = (minute // 60) % 24
+        seasonal_fresh = valid & (self._seasonal_seen[hour] == 0)
+        _ewma(self._seasonal_mean[hour], self._seasonal_dev[hour], values, valid, seasonal_fresh, SEASONAL_ALPHA)
+        self._seasonal_seen[hour] += valid
+
+    def update(self) -> int:
+        """Consume every minute the rollups hold as final; returns the number of minutes stepped."""
+        watermark = self.rollups.watermark
+        if watermark is None:
+            return 0
+        final_until = watermark - self.rollups.lateness_minutes
+        oldest = watermark - self.rollups.retention_minutes
+        with self._lock:
+            start = oldest if self._processed_until is None else max(self._processed_until, oldest)
+            if start >= final_until:
+                return 0
+            self._grow(len(self.rollups.keys))
+            blocks = dict(self.rollups.blocks(start, final_until))
+            for minute in range(start, final_until):
+                self._step(minute, self._observe(blocks.get(minute)))
+            self._processed_until = final_until
+            self._snapshot = self._score(final_until)
+            self._scored_at = format_timestamp(minute_start(final_until))
+            self.digest = _digest(self._snapshot)
+            self.version += 1
+        logger.info(f"Health baselines advanced {final_until - start} minutes for {self._size} services")
+        return final_until - start
+
+    def _score(self, minute: int) -> Dict[str, ServiceAnomaly]:
+        hour = (minute // 60) % 24
+        seasonal = self._seasonal_seen[hour] >= SEASONAL_MIN_MINUTES
+        expected = np.where(seasonal, self._seasonal_mean[hour], self._mean)
+        dev = np.where(seasonal, self._seasonal_dev[hour], self._dev)
+        z = (self._fast - expected) / _scale(expected, dev)
+        z[self._seen < WARMUP_MINUTES] = 0.0
+
+        errors_matter = self._fast[:, ERROR_RATE] >= MIN_ERROR_RATE
+        traffic_lost = self._fast[:, THROUGHPUT] <= (1 - MIN_THROUGHPUT_DROP) * expected[:, THROUGHPUT]
+        critical = (z[:, LATENCY] >= CRITICAL_Z) | ((z[:, ERROR_RATE] >= CRITICAL_Z) & errors_matter)
+        warning = (
+            (z[:, LATENCY] >= WARNING_Z)
+            | ((z[:, ERROR_RATE] >= WARNING_Z) & errors_matter)
+            | ((z[:, THROUGHPUT] <= -WARNING_Z) & traffic_lost)
+        )
+        status = np.where(critical, "critical", np.where(warning, "warning", "healthy"))
+
+        updated_at = format_timestamp(minute_start(minute))
+        keys: List[str] = self.rollups.keys
+        snapshot = {}
+        for i in range(self._size):
+            if self._seen[i, THROUGHPUT] == 0:
+                continue
+            snapshot[keys[i]] = ServiceAnomaly(
+                service_name=keys[i],
+                health_status=str(status[i]),
+                latency_z=float(z[i, LATENCY]),
+                error_rate_z=float(z[i, ERROR_RATE]),
+                throughput_z=float(z[i, THROUGHPUT]),
+                latency_p95_ms=float(np.exp(self._fast[i, LATENCY])) if self._seen[i, LATENCY] else 0.0,
+                baseline_latency_p95_ms=float(np.exp(expected[i, LATENCY])) if self._seen[i, LATENCY] else 0.0,
+                error_rate=float(self._fast[i, ERROR_RATE]),
+                baseline_error_rate=float(expected[i, ERROR_RATE]),
+                requests_per_minute=float(self._fast[i, THROUGHPUT]),
+                baseline_requests_per_minute=float(expected[i, THROUGHPUT]),
+                seasonal=bool(seasonal[i].any()),
+                updated_at=updated_at,
+            )
+        return snapshot
+
+    def export_state(self) -> Optional[Dict[str, np.ndarray]]:
+        """Baselines and the minute they reach, for a warm-start snapshot."""
+        with self._lock:
+            if self._processed_until is None:
+                return None
+            return {
+                "processed_until": np.array([self._processed_until], dtype=np.int64),
+                "keys": json_array(self.rollups.keys[:self._size]),
+                "fast": self._fast.copy(),
+                "mean": self._mean.copy(),
+                "dev": self._dev.copy(),
+                "seen": self._seen.copy(),
+                "seasonal_mean": self._seasonal_mean.copy(),
+                "seasonal_dev": self._seasonal_dev.copy(),
+                "seasonal_seen": self._seasonal_seen.copy(),
+            }
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> bool:
+        """Load baselines saved with the same service order as the (already restored) rollups."""
+        keys = from_json_array(state["keys"])
+        if keys != self.rollups.keys[:len(keys)]:
+            logger.info("Health snapshot does not match the rollup keys; rebuilding baselines")
+            return False
+        with self._lock:
+            if self._processed_until is not None:
+                return False
+            self._size = len(keys)
+            self._fast = state["fast"]
+            self._mean = state["mean"]
+            self._dev = state["dev"]
+            self._seen = state["seen"]
+            self._seasonal_mean = state["seasonal_mean"]
+            self._seasonal_dev = state["seasonal_dev"]
+            self._seasonal_seen = state["seasonal_seen"]
+            self._processed_until = int(state["processed_until"][0])
+            self._snapshot = self._score(self._processed_until)
+            self._scored_at = format_timestamp(minute_start(self._processed_until))
+            self.digest = _digest(self._snapshot)
+            self.version += 1
+        return True
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> None:
+        """Background job: load new rollup minutes, then advance the baselines over them."""
+        self.rollups.refresh(warehouse_manager)
+        self.update()
+
+    @property
+    def snapshot(self) -> Dict[str, ServiceAnomaly]:
+        return self._snapshot
+
+    @property
+    def scored_at(self) -> Optional[str]:
+        """Start of the minute the current health statuses describe, or None before the first score."""
+        return self._scored_at
+
+    def health_of(self, service_name: str, default: str = "healthy") -> str:
+        """Latest health status of a service; it is not specific to any requested time range."""
+        anomaly = self._snapshot.get(service_name)
+        return anomaly.health_status if anomaly is not None else default
+
+
+health_engine = HealthEngine(service_rollups)
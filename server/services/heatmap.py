@@ -0,0 +1,109 @@
+"""Latency heatmaps: one log-bucketed histogram per time step, as a dense matrix."""
+
+import logging
+from typing import Optional
+
+import numpy as np
+
+from server.config import OBSERVABILITY_TABLE_PREFIX
+from server.models.observability import LatencyHeatmap
+from server.services.rollups import (
+    BUCKET_COUNT,
+    BUCKET_LOWER,
+    BUCKET_UPPER,
+    HISTOGRAM_DTYPE,
+    bucket_sql,
+    minute_of,
+    minute_start,
+)
+from server.services.service_rollups import service_rollups
+from server.services.timestamps import format_timestamp, utcnow
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+# Default number of time steps a heatmap is split into.
+TARGET_STEPS = 120
+
+
+def default_step_minutes(minutes: int) -> int:
+    return max(1, -(-minutes // TARGET_STEPS))
+
+
+def _matrix_from_rollups(service_name: str, start: int, steps: int, step_minutes: int) -> np.ndarray:
+    matrix = np.zeros((steps, BUCKET_COUNT), dtype=np.int64)
+    key_id = service_rollups.find(service_name)
+    if key_id is None:
+        return matrix
+    for minute, block in service_rollups.blocks(start, start + steps * step_minutes):
+        rows = np.flatnonzero(block.key_ids == key_id)
+        if rows.size:
+            matrix[(minute - start) // step_minutes] += block.hist[rows[0]]
+    return matrix
+
+
+def _heatmap_query(step_minutes: int) -> str:
+    return f"""
+    SELECT
+      CAST(FLOOR((unix_timestamp(start_time) - unix_timestamp(CAST(:since AS TIMESTAMP))) / {step_minutes * 60}) AS INT) as step,
+      {bucket_sql("duration_ms")} as bucket,
+      COUNT(*) as count
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver
+    WHERE service_name = :service_name
+      AND start_time >= CAST(:since AS TIMESTAMP)
+      AND start_time < CAST(:until AS TIMESTAMP)
+    GROUP BY 1, 2
+    """
+
+
+def _matrix_from_warehouse(
+    warehouse_manager: WarehouseManager, service_name: str, start: int, steps: int, step_minutes: int
+) -> np.ndarray:
+    matrix = np.zeros((steps, BUCKET_COUNT), dtype=np.int64)
+    parameters = {
+        "service_name": service_name,
+        "since": format_timestamp(minute_start(start)),
+        "until": format_timestamp(minute_start(start + steps * step_minutes)),
+    }
+    for row in warehouse_manager.iter_query(_heatmap_query(step_minutes), parameters):
+        step = int(row["step"])
+        if 0 <= step < steps:
+            matrix[step, int(row["bucket"])] += int(row["count"])
+    return matrix
+
+
+def latency_heatmap(
+    warehouse_manager: WarehouseManager, service_name: str, seconds: int, step_minutes: Optional[int] = None
+) -> LatencyHeatmap:
+    """Heatmap over the trailing `seconds`, from rollups when they cover it.
+
+    Only the latency buckets between the first and last non-empty one are returned,
+    so `counts[t][j]` is the number of spans in time step t with a duration in
+    [bucket_lower_ms[j], bucket_upper_ms[j]).
+    """
+    minutes = max(seconds // 60, 1)
+    step_minutes = step_minutes or default_step_minutes(minutes)
+    steps = -(-minutes // step_minutes)
+    if service_rollups.covers_seconds(seconds):
+        end = service_rollups.watermark
+        start = end - steps * step_minutes
+        matrix = _matrix_from_rollups(service_name, start, steps, step_minutes)
+    else:
+        end = minute_of(utcnow())
+        start = end - steps * step_minutes
+        matrix = _matrix_from_warehouse(warehouse_manager, service_name, start, steps, step_minutes)
+
+    # Counters stay fixed-width unsigned ints, as in the rollups, for a compact payload.
+    matrix = np.minimum(matrix, np.iinfo(HISTOGRAM_DTYPE).max).astype(HISTOGRAM_DTYPE)
+    occupied = np.flatnonzero(matrix.sum(axis=0))
+    low, high = (int(occupied[0]), int(occupied[-1]) + 1) if occupied.size else (0, 0)
+    return LatencyHeatmap(
+        service_name=service_name,
+        start=format_timestamp(minute_start(start)),
+        step_seconds=step_minutes * 60,
+        timestamps=[format_timestamp(minute_start(start + i * step_minutes)) for i in range(steps)],
+        bucket_lower_ms=BUCKET_LOWER[low:high].tolist(),
+        bucket_upper_ms=BUCKET_UPPER[low:high].tolist(),
+        counts=matrix[:, low:high].tolist(),
+        max_count=int(matrix.max()) if matrix.size else 0,
+    )
@@ -0,0 +1,162 @@
+"""Conditional GET and compression for JSON API responses.
+
+The middleware buffers each JSON response to a GET under /api/, then:
+- Tags it with a strong ETag. The endpoint can set one itself from a digest of
+  the snapshot it serves (see `snapshot_etag`); otherwise the ETag is a hash of
+  the body. Either way the tag depends only on content, so every worker gives
+  the same response the same tag.
+- Answers `304 Not Modified` when the ETag matches the request's `If-None-Match`.
+  Clients that poll on a timer then skip both the download and the parsing.
+- Compresses bodies of at least `minimum_size` bytes when `Accept-Encoding`
+  allows it.
+
+Compressed bodies are cached by ETag and coding, so a snapshot served to many
+clients is compressed once. A compressed representation gets its own ETag,
+the base tag plus the coding, and matching ignores that suffix. Streaming
+(NDJSON) responses and responses that are already encoded pass through unchanged.
+"""
+
+import gzip
+import hashlib
+from typing import Any, Callable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from server.config import API_COMPRESSED_CACHE_SIZE, API_COMPRESSION_MIN_BYTES
+from server.services.cache import TTLCache
+from server.services.static_assets import accepted_encodings
+
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+# (base ETag, coding) -> compressed body
+compressed_bodies: TTLCache[bytes] = TTLCache(API_COMPRESSED_CACHE_SIZE, ttl_seconds=600)
+
+
+def _compressors() -> List[Tuple[str, Callable[[bytes], bytes]]]:
+    """Available codings, best first; brotli only when the optional package is installed."""
+    compressors: List[Tuple[str, Callable[[bytes], bytes]]] = []
+    try:
+        import brotli
+
+        compressors.append(("br", lambda body: brotli.compress(body, quality=5)))
+    except ImportError:
+        pass
+    compressors.append(("gzip", lambda body: gzip.compress(body, compresslevel=6, mtime=0)))
+    return compressors
+
+
+COMPRESSORS = dict(_compressors())
+
+
+def snapshot_etag(*parts: Any) -> str:
+    """Strong ETag for a response determined by `parts` (endpoint, parameters, snapshot digest).
+
+    The parts must identify the content the same way in every worker: a content
+    digest or a data watermark, never a per-process counter, or polls that land
+    on another worker never revalidate.
+    """
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+
+def _base_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for coding in COMPRESSORS:
+        suffix = f'-{coding}"'
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of `If-None-Match` against an ETag, ignoring coding suffixes."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    base = _base_tag(etag)
+    return any(_base_tag(tag) == base for tag in if_none_match.split(","))
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """The 304 to return early when the client already holds `etag`, else None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL})
+    return None
+
+
+class ConditionalCompressionMiddleware:
+    def __init__(self, app: ASGIApp, prefix: str = "/api/", minimum_size: int = API_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.prefix = prefix
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def buffered_send(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith("application/json")
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                await self._finish(start, b"".join(chunks), request_headers, send)
+
+        await self.app(scope, receive, buffered_send)
+
+    async def _finish(self, start: Message, body: bytes, request_headers: Headers, send: Send) -> None:
+        headers = MutableHeaders(raw=list(start["headers"]))
+        etag = headers.get("etag") or '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        headers["ETag"] = etag
+        if "cache-control" not in headers:
+            headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        if len(body) >= self.minimum_size:
+            headers["Vary"] = "Accept-Encoding"
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            for name in ("content-length", "content-type"):
+                if name in headers:
+                    del headers[name]
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if len(body) >= self.minimum_size:
+            coding = next(
+                (c for c in accepted_encodings(request_headers.get("accept-encoding", "")) if c in COMPRESSORS), None
+            )
+            if coding is not None:
+                compressed = compressed_bodies.get((etag, coding))
+                if compressed is None:
+                    compressed = COMPRESSORS[coding](body)
+                    compressed_bodies.set((etag, coding), compressed)
+                body = compressed
+                headers["Content-Encoding"] = coding
+                headers["ETag"] = etag[:-1] + f'-{coding}"'
+        headers["Content-Length"] = str(len(body))
+        await send({"type": "http.response.start", "status": 200, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
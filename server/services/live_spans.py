@@ -0,0 +1,463 @@
+"""Recent spans received over OTLP/HTTP, held in memory for seconds-fresh live views.
+
+Export requests are decoded a whole batch at a time into column arrays, split by
+start minute and appended to a bounded, minute-indexed buffer: the oldest minutes
+are dropped first when either the span budget or the retention is exceeded. The
+warehouse lags the exporters by minutes, so live-window endpoints merge the
+buffered spans of traces newer than what the warehouse has already assembled.
+"""
+
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from server.config import LIVE_SPAN_BUFFER_MAX_SPANS, LIVE_SPAN_BUFFER_SECONDS, OTLP_MAX_DECODED_BYTES
+from server.models.observability import MetricsSnapshot, MetricsTimeSeries, ServiceHealth
+from server.services.health import health_engine
+from server.services.rollups import (
+    BUCKET_COUNT,
+    BUCKET_OFFSET,
+    BUCKETS_PER_OCTAVE,
+    histogram_quantiles,
+    minute_of,
+    minute_start,
+)
+from server.services.service_rollups import service_rollups
+from server.services.timestamps import utcnow
+from server.services.trace_index import trace_index
+
+logger = logging.getLogger(__name__)
+
+PROTOBUF_MEDIA_TYPE = "application/x-protobuf"
+JSON_MEDIA_TYPE = "application/json"
+# OTLP status code of a failed span (STATUS_CODE_ERROR).
+STATUS_ERROR = 2
+NANOS_PER_MINUTE = 60 * 10**9
+
+
+class UnsupportedEncoding(Exception):
+    """The request body is in an encoding this receiver cannot decode."""
+
+
+class ExportTooLarge(Exception):
+    """The request body decompresses to more than the receiver accepts."""
+
+
+def gunzip(body: bytes, max_bytes: int) -> bytes:
+    """Decompress a (possibly multi-member) gzip body, refusing to produce more than `max_bytes`."""
+    output = bytearray()
+    while body:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        output += decompressor.decompress(body, max_bytes + 1 - len(output))
+        if len(output) > max_bytes or decompressor.unconsumed_tail:
+            raise ExportTooLarge(f"Export decompresses to more than {max_bytes} bytes")
+        if not decompressor.eof:
+            raise ValueError("Truncated gzip body")
+        body = decompressor.unused_data
+    return bytes(output)
+
+
+@dataclass
+class SpanBatch:
+    """Spans as parallel columns; ids are lowercase hex as in the warehouse."""
+
+    trace_id: np.ndarray
+    span_id: np.ndarray
+    parent_span_id: np.ndarray
+    service_name: np.ndarray
+    name: np.ndarray
+    start_ns: np.ndarray
+    end_ns: np.ndarray
+    is_error: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.start_ns)
+
+    @property
+    def duration_ms(self) -> np.ndarray:
+        return np.maximum(self.end_ns - self.start_ns, 0) / 1e6
+
+    def take(self, rows: np.ndarray) -> "SpanBatch":
+        return SpanBatch(**{column: getattr(self, column)[rows] for column in self.__dataclass_fields__})
+
+    @staticmethod
+    def concat(batches: List["SpanBatch"]) -> "SpanBatch":
+        if not batches:
+            return SpanBatch.from_columns({})
+        return SpanBatch(**{
+            column: np.concatenate([getattr(batch, column) for batch in batches])
+            for column in SpanBatch.__dataclass_fields__
+        })
+
+    @staticmethod
+    def from_columns(columns: Dict[str, list]) -> "SpanBatch":
+        def strings(column: str) -> np.ndarray:
+            return np.array(columns.get(column, []), dtype=object)
+
+        return SpanBatch(
+            trace_id=strings("trace_id"),
+            span_id=strings("span_id"),
+            parent_span_id=strings("parent_span_id"),
+            service_name=strings("service_name"),
+            name=strings("name"),
+            start_ns=np.array(columns.get("start_ns", []), dtype=np.int64),
+            end_ns=np.array(columns.get("end_ns", []), dtype=np.int64),
+            is_error=np.array(columns.get("is_error", []), dtype=bool),
+        )
+
+
+def _empty_columns() -> Dict[str, list]:
+    return {column: [] for column in SpanBatch.__dataclass_fields__}
+
+
+def _json_id(value: Optional[str]) -> str:
+    return (value or "").lower()
+
+
+def _json_attribute(attributes: List[Dict[str, Any]], key: str) -> Optional[str]:
+    for attribute in attributes or []:
+        if attribute.get("key") == key:
+            return (attribute.get("value") or {}).get("stringValue")
+    return None
+
+
+def _json_status_error(status: Optional[Dict[str, Any]]) -> bool:
+    code = (status or {}).get("code")
+    return code == STATUS_ERROR or code == "STATUS_CODE_ERROR"
+
+
+def decode_json(body: bytes) -> SpanBatch:
+    """Decode an OTLP/JSON ExportTraceServiceRequest (hex ids, nanosecond strings)."""
+    columns = _empty_columns()
+    for resource_spans in json.loads(body).get("resourceSpans", []):
+        attributes = (resource_spans.get("resource") or {}).get("attributes", [])
+        service = _json_attribute(attributes, "service.name") or "unknown_service"
+        for scope_spans in resource_spans.get("scopeSpans", []) or resource_spans.get("instrumentationLibrarySpans", []):
+            for span in scope_spans.get("spans", []):
+                columns["trace_id"].append(_json_id(span.get("traceId")))
+                columns["span_id"].append(_json_id(span.get("spanId")))
+                columns["parent_span_id"].append(_json_id(span.get("parentSpanId")))
+                columns["service_name"].append(service)
+                columns["name"].append(span.get("name", ""))
+                columns["start_ns"].append(int(span.get("startTimeUnixNano") or 0))
+                columns["end_ns"].append(int(span.get("endTimeUnixNano") or 0))
+                columns["is_error"].append(_json_status_error(span.get("status")))
+    return SpanBatch.from_columns(columns)
+
+
+def decode_protobuf(body: bytes) -> SpanBatch:
+    """Decode an OTLP/protobuf ExportTraceServiceRequest; needs the optional opentelemetry-proto package."""
+    try:
+        from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+    except ImportError:
+        raise UnsupportedEncoding("Protobuf export needs the opentelemetry-proto package; send JSON instead")
+
+    columns = _empty_columns()
+    request = ExportTraceServiceRequest.FromString(body)
+    for resource_spans in request.resource_spans:
+        service = "unknown_service"
+        for attribute in resource_spans.resource.attributes:
+            if attribute.key == "service.name":
+                service = attribute.value.string_value
+                break
+        for scope_spans in resource_spans.scope_spans:
+            for span in scope_spans.spans:
+                columns["trace_id"].append(span.trace_id.hex())
+                columns["span_id"].append(span.span_id.hex())
+                columns["parent_span_id"].append(span.parent_span_id.hex())
+                columns["service_name"].append(service)
+                columns["name"].append(span.name)
+                columns["start_ns"].append(span.start_time_unix_nano)
+                columns["end_ns"].append(span.end_time_unix_nano)
+                columns["is_error"].append(span.status.code == STATUS_ERROR)
+    return SpanBatch.from_columns(columns)
+
+
+def decode_export(
+    body: bytes, content_type: str, content_encoding: Optional[str] = None, max_bytes: int = OTLP_MAX_DECODED_BYTES
+) -> SpanBatch:
+    if (content_encoding or "").lower() == "gzip":
+        body = gunzip(body, max_bytes)
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type == PROTOBUF_MEDIA_TYPE:
+        return decode_protobuf(body)
+    if media_type == JSON_MEDIA_TYPE:
+        return decode_json(body)
+    raise UnsupportedEncoding(f"Unsupported content type: {content_type or 'none'}")
+
+
+def _histogram(duration_ms: np.ndarray) -> np.ndarray:
+    """Vectorized `bucket_index` over many durations, counted into one histogram."""
+    index = np.floor(np.log2(np.maximum(duration_ms, 1e-6)) * BUCKETS_PER_OCTAVE).astype(np.int64) + BUCKET_OFFSET
+    index = np.where(duration_ms <= 0, 0, np.clip(index, 0, BUCKET_COUNT - 1))
+    return np.bincount(index, minlength=BUCKET_COUNT)
+
+
+@dataclass
+class LiveTotals:
+    """One service's buffered spans over a window, mergeable with warehouse aggregates."""
+
+    count: int
+    errors: int
+    duration_sum: float
+    duration_max: float
+    hist: np.ndarray
+
+
+SpanListener = Callable[[SpanBatch], None]
+
+
+class LiveSpanBuffer:
+    def __init__(self, retention_seconds: int, max_spans: int):
+        self.retention_seconds = retention_seconds
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        # minute -> batches of spans starting in that minute, oldest minute first
+        self._minutes: "OrderedDict[int, List[SpanBatch]]" = OrderedDict()
+        self._size = 0
+        self.received = 0
+        self.dropped = 0
+        self._listeners: List[SpanListener] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def subscribe(self, listener: SpanListener) -> None:
+        """Call `listener` with every accepted batch, in arrival order."""
+        self._listeners.append(listener)
+
+    def add(self, batch: SpanBatch) -> int:
+        """Index a decoded batch by start minute; returns how many spans were kept."""
+        self.received += len(batch)
+        now = minute_of(utcnow())
+        minutes = batch.start_ns // NANOS_PER_MINUTE
+        keep = (minutes > now - self.retention_seconds // 60) & (minutes <= now + 1) & (batch.trace_id != "")
+        batch = batch.take(np.flatnonzero(keep))
+        minutes = minutes[keep]
+        self.dropped += int((~keep).sum())
+        if len(batch) == 0:
+            return 0
+
+        order = np.argsort(minutes, kind="stable")
+        bounds = np.flatnonzero(np.diff(minutes[order])) + 1
+        with self._lock:
+            newest = next(reversed(self._minutes), None)
+            for rows in np.split(order, bounds):
+                minute = int(minutes[rows[0]])
+                self._minutes.setdefault(minute, []).append(batch.take(rows))
+                self._size += len(rows)
+            if newest is not None and int(minutes[order[0]]) < newest:
+                # A late batch opened a minute older than the newest one: restore minute order.
+                self._minutes = OrderedDict(sorted(self._minutes.items()))
+            self._evict(now)
+        for listener in self._listeners:
+            listener(batch)
+        return len(batch)
+
+    def _evict(self, now: int) -> None:
+        oldest = now - self.retention_seconds // 60
+        while self._minutes:
+            minute, batches = next(iter(self._minutes.items()))
+            if minute > oldest and self._size <= self.max_spans:
+                break
+            del self._minutes[minute]
+            evicted = sum(len(batch) for batch in batches)
+            self._size -= evicted
+            if minute > oldest:
+                self.dropped += evicted
+
+    def spans(self, since: datetime, until: Optional[datetime] = None) -> SpanBatch:
+        """All buffered spans starting in [since, until)."""
+        since_ns = int(since.timestamp() * 1e9)
+        until_ns = int(until.timestamp() * 1e9) if until is not None else None
+        first, last = since_ns // NANOS_PER_MINUTE, (until_ns // NANOS_PER_MINUTE if until_ns is not None else None)
+        with self._lock:
+            batches = [
+                batch for minute, minute_batches in self._minutes.items()
+                if minute >= first and (last is None or minute <= last)
+                for batch in minute_batches
+            ]
+        spans = SpanBatch.concat(batches)
+        keep = spans.start_ns >= since_ns
+        if until_ns is not None:
+            keep &= spans.start_ns < until_ns
+        return spans.take(np.flatnonzero(keep))
+
+    def spans_after_warehouse(self, seconds: int) -> SpanBatch:
+        """Buffered spans of the trailing window whose trace the warehouse has not assembled yet.
+
+        The warehouse filters traces by their start. Traces that start before the
+        cutoff have settled there, so their spans are left out; past it traces are
+        still landing, and those the trace index has already read are left out by id.
+        """
+        spans = self.spans(utcnow() - timedelta(seconds=seconds))
+        cutoff = warehouse_cutoff()
+        if cutoff is None or len(spans) == 0:
+            return spans
+        traces, inverse = np.unique(spans.trace_id, return_inverse=True)
+        trace_start = np.full(len(traces), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(trace_start, inverse, spans.start_ns)
+        live = trace_start > int(cutoff.timestamp() * 1e9)
+        live[live] = ~np.isin(traces[live], list(trace_index.known(traces[live].tolist())))
+        return spans.take(np.flatnonzero(live[inverse]))
+
+    def service_totals(self, spans: SpanBatch) -> Dict[str, LiveTotals]:
+        totals = {}
+        durations = spans.duration_ms
+        for service in np.unique(spans.service_name):
+            rows = spans.service_name == service
+            service_durations = durations[rows]
+            totals[str(service)] = LiveTotals(
+                count=int(rows.sum()),
+                errors=int(spans.is_error[rows].sum()),
+                duration_sum=float(service_durations.sum()),
+                duration_max=float(service_durations.max()),
+                hist=_histogram(service_durations),
+            )
+        return totals
+
+
+live_spans = LiveSpanBuffer(retention_seconds=LIVE_SPAN_BUFFER_SECONDS, max_spans=LIVE_SPAN_BUFFER_MAX_SPANS)
+
+
+def warehouse_cutoff() -> Optional[datetime]:
+    """Trace start before which the warehouse holds every trace, or None if unknown."""
+    settled = trace_index.settled_until()
+    if settled is not None:
+        return settled
+    if service_rollups.watermark is not None:
+        return minute_start(service_rollups.watermark - service_rollups.lateness_minutes)
+    return None
+
+
+# Warehouse aggregates `_merge` combines with live spans. A query trimmed by `fields=`
+# must still fetch them, or derived values such as error_rate are recomputed from placeholders.
+MERGE_INPUTS = frozenset({"request_count", "error_count", "avg_duration_ms", "max_duration_ms"})
+
+
+def with_merge_inputs(fields: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """A field selection widened to what merging live spans needs; None still means every field."""
+    return None if fields is None else fields | MERGE_INPUTS
+
+
+def _merge(
+    warehouse: Optional[Tuple[int, int, float, float, Tuple[float, float, float]]],
+    live: LiveTotals,
+    service_name: str,
+    seconds: int,
+) -> Tuple[int, int, float, float, Tuple[float, float, float]]:
+    """Combined (count, errors, avg, max, (p50, p95, p99)) of warehouse aggregates and live spans.
+
+    Percentiles are exact only for the live part: the warehouse part is represented by
+    the service's rollup histogram over the window when the rollups cover it, and
+    otherwise the warehouse percentiles are kept as they are.
+    """
+    if warehouse is None:
+        p50, p95, p99 = histogram_quantiles(live.hist, (0.5, 0.95, 0.99))
+        return live.count, live.errors, live.duration_sum / live.count, live.duration_max, (float(p50), float(p95), float(p99))
+
+    count, errors, avg, maximum, percentiles = warehouse
+    merged_count = count + live.count
+    merged_avg = (avg * count + live.duration_sum) / merged_count
+    key_id = service_rollups.find(service_name)
+    if key_id is not None and service_rollups.covers_seconds(seconds):
+        rollup_hist = service_rollups.window_seconds(seconds).hist[key_id].astype(np.float64)
+        if rollup_hist.sum() > 0:
+            mixture = rollup_hist * (count / rollup_hist.sum()) + live.hist
+            percentiles = tuple(float(p) for p in histogram_quantiles(mixture, (0.5, 0.95, 0.99)))
+    return merged_count, errors + live.errors, merged_avg, max(maximum, live.duration_max), percentiles
+
+
+def merge_service_health(services: List[ServiceHealth], seconds: int) -> List[ServiceHealth]:
+    """Fold live spans into the service list; services seen only live are appended."""
+    totals = live_spans.service_totals(live_spans.spans_after_warehouse(seconds))
+    if not totals:
+        return services
+    merged = []
+    for service in services:
+        live = totals.pop(service.service_name, None)
+        if live is None:
+            merged.append(service)
+            continue
+        warehouse = (
+            service.request_count, service.error_count, service.avg_duration_ms, service.max_duration_ms,
+            (service.current_latency_p50, service.current_latency_p95, service.current_latency_p99),
+        )
+        merged.append(_service_health(service.service_name, _merge(warehouse, live, service.service_name, seconds), seconds, service.health_status))
+    for name, live in totals.items():
+        merged.append(_service_health(name, _merge(None, live, name, seconds), seconds, health_engine.health_of(name)))
+    return sorted(merged, key=lambda s: -s.request_count)
+
+
+def _service_health(name: str, merged: Tuple, seconds: int, health_status: str) -> ServiceHealth:
+    count, errors, avg, maximum, (p50, p95, p99) = merged
+    return ServiceHealth(
+        service_name=name,
+        health_status=health_status,
+        health_as_of=health_engine.scored_at,
+        current_latency_p50=p50,
+        current_latency_p95=p95,
+        current_latency_p99=p99,
+        avg_duration_ms=avg,
+        max_duration_ms=maximum,
+        error_count=errors,
+        error_rate=errors / count if count else 0.0,
+        request_count=count,
+        requests_per_second=count / seconds,
+    )
+
+
+def merge_service_metrics(
+    service_name: str, current: Optional[MetricsSnapshot], trends: List[MetricsTimeSeries], seconds: int
+) -> Tuple[Optional[MetricsSnapshot], List[MetricsTimeSeries]]:
+    """Fold one service's live spans into its current snapshot and per-minute trend."""
+    spans = live_spans.spans_after_warehouse(seconds)
+    spans = spans.take(np.flatnonzero(spans.service_name == service_name))
+    live = live_spans.service_totals(spans).get(service_name)
+    if live is None:
+        return current, trends
+
+    warehouse = None
+    if current is not None and current.request_count:
+        warehouse = (
+            current.request_count, current.error_count, current.avg_duration_ms, current.max_duration_ms,
+            (current.latency_p50, current.latency_p95, current.latency_p99),
+        )
+    count, errors, avg, maximum, (p50, p95, p99) = _merge(warehouse, live, service_name, seconds)
+    current = MetricsSnapshot(
+        latency_p50=p50,
+        latency_p95=p95,
+        latency_p99=p99,
+        avg_duration_ms=avg,
+        max_duration_ms=maximum,
+        error_count=errors,
+        error_rate=errors / count if count else 0.0,
+        request_count=count,
+        requests_per_second=count / seconds,
+    )
+
+    # Live minutes the warehouse trend has not reached yet become extra points.
+    last = max((minute_of(point.timestamp) for point in trends), default=None)
+    minutes = spans.start_ns // NANOS_PER_MINUTE
+    durations = spans.duration_ms
+    extra = []
+    for minute in np.unique(minutes):
+        if last is not None and minute <= last:
+            continue
+        rows = minutes == minute
+        minute_durations = durations[rows]
+        extra.append(MetricsTimeSeries(
+            timestamp=minute_start(int(minute)),
+            latency_p95=float(histogram_quantiles(_histogram(minute_durations), (0.95,))[0]),
+            avg_duration_ms=float(minute_durations.mean()),
+            error_count=int(spans.is_error[rows].sum()),
+            request_count=int(rows.sum()),
+        ))
+    return current, trends + extra
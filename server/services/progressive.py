@@ -0,0 +1,88 @@
+"""Coarse-then-exact delivery of one result over a single NDJSON stream.
+
+The first line carries a provisional result computed without waiting on the
+warehouse (in-memory rollups, the last exact result, or a sampled query); the
+second carries the exact result once its query finishes and replaces the first.
+Each line is `{"provisional": bool, "source": str, "data": ...}`, plus
+`"age_seconds"` when a provisional source knows how old its data is; a failed
+exact query ends the stream with `{"provisional": false, "error": str}` instead.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Hashable, Optional, Sequence, Tuple, Union
+
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from server.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# (source name, result[, age in seconds]) or None when nothing cheap is available.
+Coarse = Optional[Union[Tuple[str, Any], Tuple[str, Any, float]]]
+
+# Last exact result per endpoint, caller and parameters, served as a provisional first answer.
+# Callers put the warehouse manager's identity in the key so no one sees another's rows.
+last_exact: TTLCache[Any] = TTLCache(256, ttl_seconds=24 * 3600)
+
+
+def _line(payload: dict) -> bytes:
+    return json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode() + b"\n"
+
+
+def _discard(task: "asyncio.Future[Any]") -> None:
+    """Done callback of an abandoned provisional source: retrieve its outcome so it is not logged."""
+    if not task.cancelled():
+        task.exception()
+
+
+def cached_result(cache_key: Hashable) -> Callable[[], Coarse]:
+    """Provisional source: the last exact result for the same endpoint and parameters."""
+    def source() -> Coarse:
+        cached = last_exact.get(cache_key)
+        return ("cache", cached) if cached is not None else None
+    return source
+
+
+async def progressive_ndjson(
+    provisional: Sequence[Callable[[], Coarse]], exact: Callable[[], Any], cache_key: Hashable
+) -> AsyncIterator[bytes]:
+    """Yield the first provisional source that has an answer, then the exact result.
+
+    The exact query starts first and runs concurrently; sources are tried in order,
+    cheapest first, each raced against the exact query. A source still running when
+    the exact result arrives is dropped, and so are the ones after it. All callables
+    run off the event loop.
+    """
+    pending = asyncio.ensure_future(run_in_threadpool(exact))
+    for source in provisional:
+        if pending.done():
+            break
+        attempt = asyncio.ensure_future(run_in_threadpool(source))
+        await asyncio.wait({attempt, pending}, return_when=asyncio.FIRST_COMPLETED)
+        if pending.done():
+            attempt.add_done_callback(_discard)
+            attempt.cancel()
+            break
+        try:
+            first = attempt.result()
+        except Exception as e:
+            logger.warning(f"Provisional source failed, trying the next one: {str(e)}")
+            continue
+        if first is not None:
+            line = {"provisional": True, "source": first[0], "data": first[1]}
+            if len(first) > 2:
+                line["age_seconds"] = round(first[2])
+            yield _line(line)
+            break
+
+    try:
+        result = await pending
+    except Exception as e:
+        logger.error(f"Exact result failed: {str(e)}", exc_info=True)
+        yield _line({"provisional": False, "error": f"Query failed: {str(e)}"})
+        return
+    last_exact.set(cache_key, result)
+    yield _line({"provisional": False, "source": "warehouse", "data": result})
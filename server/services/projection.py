@@ -0,0 +1,65 @@
+"""Sparse responses: a `fields=` parameter picks which fields of a model an endpoint returns.
+
+Endpoints describe the SQL behind each selectable field, so aggregates nobody
+asked for are never computed, the exact percentiles above all. Rows are still
+validated into the full model. Fields that were not selected get zero
+placeholders, and those are dropped again on output.
+"""
+
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Type, get_origin
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# None means every field.
+Fields = Optional[FrozenSet[str]]
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel], required: Iterable[str] = ()) -> Fields:
+    """Validate a comma-separated field list against `model`; `required` fields are always kept."""
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(model.model_fields)}",
+        )
+    return frozenset(names | set(required))
+
+
+def wants(fields: Fields, name: str) -> bool:
+    return fields is None or name in fields
+
+
+def select_columns(columns: Mapping[str, str], fields: Fields) -> str:
+    """SQL select list of `expression as field` for the requested fields, in `columns` order."""
+    return ",\n      ".join(f"{expression} as {name}" for name, expression in columns.items() if wants(fields, name))
+
+
+def placeholders(model: Type[BaseModel], fields: Fields) -> Dict[str, Any]:
+    """Zero values for the required fields of `model` that were not selected."""
+    if fields is None:
+        return {}
+    values: Dict[str, Any] = {}
+    for name, info in model.model_fields.items():
+        if name not in fields and info.is_required():
+            values[name] = [] if get_origin(info.annotation) in (list, List) else 0
+    return values
+
+
+def project(item: BaseModel, fields: Fields) -> Any:
+    """The item itself, or a dict of just the selected fields."""
+    return item if fields is None else item.model_dump(include=set(fields))
+
+
+def project_all(items: Iterable[BaseModel], fields: Fields) -> List[Any]:
+    return [project(item, fields) for item in items]
+
+
+def sparse_response(content: Any, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """Send projected content as-is; the endpoint's full response model would reject it."""
+    return JSONResponse(jsonable_encoder(content), headers=headers)
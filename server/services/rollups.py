@@ -0,0 +1,427 @@
+"""Per-minute rollups with mergeable log-bucketed latency histograms.
+
+A rollup cell holds, for one key (a service, an edge, ...) and one minute, the
+request count, error count, duration sum and max, and a fixed-width histogram
+of durations. Cells from any set of minutes can be merged by plain addition,
+so arbitrary windows are answered without going back to the warehouse. When
+the rollup query also returns exemplar columns, each cell keeps a few trace ids
+sampled toward its slow and failed requests.
+"""
+
+import heapq
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from server.config import BACKGROUND_REFRESH_SECONDS
+from server.services.shared_cache import shared_rows
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.warehouse_manager import WarehouseManager
+from server.services.warm_start import from_json_array, json_array
+
+logger = logging.getLogger(__name__)
+
+# Three buckets per power of two (~26% wide) from 2^-3 ms up to ~2^18 ms; bucket 0
+# also absorbs anything faster and the last bucket anything slower.
+BUCKETS_PER_OCTAVE = 3
+BUCKET_OFFSET = 9
+BUCKET_COUNT = 64
+HISTOGRAM_DTYPE = np.uint32
+
+EXEMPLARS_PER_CELL = 4
+# An erroring request is as likely to be kept as one this many times slower.
+ERROR_EXEMPLAR_WEIGHT = 10.0
+
+# (trace id, duration ms, is error)
+Exemplar = Tuple[str, float, bool]
+
+
+def bucket_sql(duration_expr: str) -> str:
+    """SQL expression mapping a duration in ms to its histogram bucket."""
+    return (
+        f"LEAST(GREATEST(CAST(FLOOR(LOG2(GREATEST({duration_expr}, 1e-6)) * {BUCKETS_PER_OCTAVE}) AS INT)"
+        f" + {BUCKET_OFFSET}, 0), {BUCKET_COUNT - 1})"
+    )
+
+
+def bucket_index(duration_ms: float) -> int:
+    if duration_ms <= 0:
+        return 0
+    index = math.floor(math.log2(max(duration_ms, 1e-6)) * BUCKETS_PER_OCTAVE) + BUCKET_OFFSET
+    return min(max(index, 0), BUCKET_COUNT - 1)
+
+
+def bucket_bounds() -> Tuple[np.ndarray, np.ndarray]:
+    """Lower and upper edge (ms) of every bucket."""
+    exponents = (np.arange(BUCKET_COUNT) - BUCKET_OFFSET) / BUCKETS_PER_OCTAVE
+    lower = np.power(2.0, exponents)
+    upper = np.power(2.0, exponents + 1.0 / BUCKETS_PER_OCTAVE)
+    lower[0] = 0.0
+    return lower, upper
+
+
+BUCKET_LOWER, BUCKET_UPPER = bucket_bounds()
+
+
+def histogram_quantiles(hist: np.ndarray, quantiles: Sequence[float]) -> np.ndarray:
+    """Quantiles of one or many histograms (last axis = buckets), interpolating inside a bucket.
+
+    Returns an array shaped `hist.shape[:-1] + (len(quantiles),)`; empty histograms give 0.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    cumulative = np.cumsum(hist, axis=-1)
+    total = cumulative[..., -1:]
+    out = []
+    for q in quantiles:
+        target = q * total
+        index = np.minimum((cumulative < target).sum(axis=-1, keepdims=True), BUCKET_COUNT - 1)
+        before = np.where(index > 0, np.take_along_axis(cumulative, np.maximum(index - 1, 0), axis=-1), 0.0)
+        in_bucket = np.take_along_axis(hist, index, axis=-1)
+        fraction = np.divide(target - before, in_bucket, out=np.zeros_like(target), where=in_bucket > 0)
+        value = BUCKET_LOWER[index] + np.clip(fraction, 0.0, 1.0) * (BUCKET_UPPER[index] - BUCKET_LOWER[index])
+        out.append(np.where(total > 0, value, 0.0)[..., 0])
+    return np.stack(out, axis=-1)
+
+
+def exemplar_sql(trace_id_expr: str, duration_expr: str, is_error_expr: str) -> str:
+    """Exemplar columns for a rollup query: the slowest request and the slowest failed one per row."""
+    return (
+        f"MAX_BY({trace_id_expr}, {duration_expr}) as exemplar_trace_id,\n"
+        f"      MAX_BY({trace_id_expr}, CASE WHEN {is_error_expr} THEN {duration_expr} END) as error_trace_id,\n"
+        f"      MAX(CASE WHEN {is_error_expr} THEN {duration_expr} END) as error_duration_max"
+    )
+
+
+class ExemplarReservoir:
+    """Weighted reservoir sample (Efraimidis-Spirakis) of a cell's exemplar candidates.
+
+    Each candidate gets the key log(u) / weight with weight growing with its
+    duration and boosted for errors; the highest keys are kept, so slow and failed
+    requests dominate without fast ones being excluded outright.
+    """
+
+    __slots__ = ("_heap",)
+
+    def __init__(self):
+        self._heap: List[Tuple[float, Exemplar]] = []
+
+    def offer(self, trace_id: str, duration_ms: float, is_error: bool) -> None:
+        if any(item[1][0] == trace_id for item in self._heap):
+            return
+        weight = max(duration_ms, 1e-3) * (ERROR_EXEMPLAR_WEIGHT if is_error else 1.0)
+        key = math.log(random.random() or 1e-12) / weight
+        item = (key, (trace_id, duration_ms, is_error))
+        if len(self._heap) < EXEMPLARS_PER_CELL:
+            heapq.heappush(self._heap, item)
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def exemplars(self) -> List[Exemplar]:
+        """Sampled exemplars, slowest first."""
+        return sorted((item[1] for item in self._heap), key=lambda e: -e[1])
+
+
+def minute_of(value: datetime) -> int:
+    """Epoch minute containing `value`; naive values are taken to be UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() // 60)
+
+
+def minute_start(minute: int) -> datetime:
+    return datetime.fromtimestamp(minute * 60, tz=timezone.utc)
+
+
+@dataclass
+class MinuteBlock:
+    """All cells for one minute: one row per key active in that minute."""
+
+    key_ids: np.ndarray
+    count: np.ndarray
+    errors: np.ndarray
+    duration_sum: np.ndarray
+    duration_max: np.ndarray
+    hist: np.ndarray
+    # Per row, when the rollup query provides exemplar columns.
+    exemplars: Optional[List[List[Exemplar]]] = None
+
+
+@dataclass
+class WindowTotals:
+    """Rollup cells merged over a window, densely indexed by key id."""
+
+    keys: List[Hashable]
+    count: np.ndarray
+    errors: np.ndarray
+    duration_sum: np.ndarray
+    duration_max: np.ndarray
+    hist: np.ndarray
+    minutes: int
+
+    def rows(self) -> Iterable[Tuple[int, Hashable]]:
+        """(key id, key) for every key with traffic in the window."""
+        for key_id in np.flatnonzero(self.count):
+            yield int(key_id), self.keys[key_id]
+
+
+class RollupStore:
+    """Sparse per-minute rollups for a family of keys, refreshed past a watermark.
+
+    Each refresh re-reads the minutes from `watermark - lateness` up to the last
+    complete minute and replaces those blocks wholesale, so late rows are folded
+    in without double counting. Minutes older than `retention_minutes` are dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        query: Callable[[], str],
+        key_of: Callable[[Dict[str, Any]], Hashable],
+        retention_minutes: int,
+        lateness_minutes: int,
+    ):
+        self.name = name
+        self._query = query
+        self._key_of = key_of
+        self.retention_minutes = retention_minutes
+        self.lateness_minutes = lateness_minutes
+        self._lock = threading.Lock()
+        self._blocks: Dict[int, MinuteBlock] = {}
+        self._keys: List[Hashable] = []
+        self._key_ids: Dict[Hashable, int] = {}
+        self._watermark: Optional[int] = None
+        self._covered_since: Optional[int] = None
+        # Wall-clock time of the last refresh, so it survives a warm-start restore.
+        self._refreshed_at: Optional[float] = None
+        self.version = 0
+
+    @property
+    def keys(self) -> List[Hashable]:
+        return self._keys
+
+    @property
+    def watermark(self) -> Optional[int]:
+        """First minute not yet loaded (all earlier retained minutes are complete)."""
+        return self._watermark
+
+    def find(self, key: Hashable) -> Optional[int]:
+        """Id of an already known key, without registering it."""
+        return self._key_ids.get(key)
+
+    def key_id(self, key: Hashable) -> int:
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = self._key_ids[key] = len(self._keys)
+            self._keys.append(key)
+        return key_id
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> int:
+        """Load complete minutes past the watermark; returns the number of minutes replaced."""
+        until = minute_of(utcnow())
+        oldest = until - self.retention_minutes
+        since = oldest if self._watermark is None else max(oldest, self._watermark - self.lateness_minutes)
+        if since >= until:
+            return 0
+
+        parameters = {
+            "since": format_timestamp(minute_start(since)),
+            "until": format_timestamp(minute_start(until)),
+        }
+        cells: Dict[int, Dict[int, List[Any]]] = {}
+        # Minute-aligned bounds make every worker's query identical, so one of them runs it.
+        for row in shared_rows(warehouse_manager, self._query(), parameters):
+            minute = minute_of(parse_timestamp(row["minute"]))
+            with self._lock:
+                key_id = self.key_id(self._key_of(row))
+            cell = cells.setdefault(minute, {}).get(key_id)
+            if cell is None:
+                cell = cells[minute][key_id] = [0, 0, 0.0, 0.0, np.zeros(BUCKET_COUNT, dtype=HISTOGRAM_DTYPE), None]
+            count = int(row["count"])
+            cell[0] += count
+            cell[1] += int(row["errors"] or 0)
+            cell[2] += float(row["duration_sum"] or 0.0)
+            cell[3] = max(cell[3], float(row["duration_max"] or 0.0))
+            cell[4][int(row["bucket"])] += count
+            if row.get("exemplar_trace_id"):
+                if cell[5] is None:
+                    cell[5] = ExemplarReservoir()
+                cell[5].offer(row["exemplar_trace_id"], float(row["duration_max"] or 0.0), False)
+                if row.get("error_trace_id"):
+                    cell[5].offer(row["error_trace_id"], float(row["error_duration_max"] or 0.0), True)
+
+        blocks = {minute: self._to_block(minute_cells) for minute, minute_cells in cells.items()}
+        self.replace(since, until, blocks)
+        logger.info(f"Rollups {self.name} refreshed: minutes {since}..{until}, {len(blocks)} non-empty")
+        return until - since
+
+    @staticmethod
+    def _to_block(cells: Dict[int, List[Any]]) -> MinuteBlock:
+        key_ids = np.fromiter(cells.keys(), dtype=np.int32, count=len(cells))
+        values = list(cells.values())
+        return MinuteBlock(
+            key_ids=key_ids,
+            count=np.array([v[0] for v in values], dtype=np.int64),
+            errors=np.array([v[1] for v in values], dtype=np.int64),
+            duration_sum=np.array([v[2] for v in values], dtype=np.float64),
+            duration_max=np.array([v[3] for v in values], dtype=np.float64),
+            hist=np.stack([v[4] for v in values]),
+            exemplars=(
+                [v[5].exemplars() if v[5] is not None else [] for v in values]
+                if any(v[5] is not None for v in values) else None
+            ),
+        )
+
+    def replace(self, since: int, until: int, blocks: Dict[int, MinuteBlock]) -> None:
+        """Swap in the blocks for minutes [since, until), then trim retention."""
+        with self._lock:
+            for minute in range(since, until):
+                self._blocks.pop(minute, None)
+            self._blocks.update(blocks)
+            oldest = until - self.retention_minutes
+            for minute in [m for m in self._blocks if m < oldest]:
+                del self._blocks[minute]
+            self._watermark = until
+            self._covered_since = since if self._covered_since is None else max(self._covered_since, oldest)
+            self._refreshed_at = time.time()
+            self.version += 1
+
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the data was last refreshed from the warehouse, or None if never loaded."""
+        return None if self._refreshed_at is None else max(time.time() - self._refreshed_at, 0.0)
+
+    def covers(self, start_minute: int, max_age_seconds: Optional[float] = None) -> bool:
+        """Whether the store is fresh and complete from `start_minute` to its watermark.
+
+        Fresh means refreshed within `max_age_seconds`, by default three refresh ticks.
+        """
+        age = self.age_seconds()
+        if self._covered_since is None or age is None:
+            return False
+        if age > (3 * BACKGROUND_REFRESH_SECONDS if max_age_seconds is None else max_age_seconds):
+            return False
+        return self._covered_since <= start_minute
+
+    def covers_seconds(self, seconds: int, max_age_seconds: Optional[float] = None) -> bool:
+        if self._watermark is None:
+            return False
+        return self.covers(self._watermark - max(seconds // 60, 1), max_age_seconds)
+
+    def export_state(self) -> Optional[Dict[str, np.ndarray]]:
+        """The retained minutes as flat arrays (one row per cell) for a warm-start snapshot."""
+        if self._watermark is None:
+            return None
+        with self._lock:
+            minutes = sorted(self._blocks)
+            blocks = [self._blocks[m] for m in minutes]
+            keys = list(self._keys)
+            meta = [self._watermark, self._covered_since, self._refreshed_at]
+        rows = [len(b.key_ids) for b in blocks]
+        return {
+            "meta": np.array([np.nan if v is None else v for v in meta], dtype=np.float64),
+            "keys": json_array(keys),
+            "minute": np.repeat(np.array(minutes, dtype=np.int64), rows),
+            "key_id": np.concatenate([b.key_ids for b in blocks] or [np.zeros(0, np.int32)]),
+            "count": np.concatenate([b.count for b in blocks] or [np.zeros(0, np.int64)]),
+            "errors": np.concatenate([b.errors for b in blocks] or [np.zeros(0, np.int64)]),
+            "duration_sum": np.concatenate([b.duration_sum for b in blocks] or [np.zeros(0)]),
+            "duration_max": np.concatenate([b.duration_max for b in blocks] or [np.zeros(0)]),
+            "hist": np.concatenate([b.hist for b in blocks] or [np.zeros((0, BUCKET_COUNT), HISTOGRAM_DTYPE)]),
+            "exemplars": json_array([b.exemplars for b in blocks]),
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray]) -> bool:
+        """Load a snapshot from `export_state` into a store that has not refreshed yet.
+
+        The restored data keeps its original refresh time, so `covers` treats it as
+        stale until the next refresh, which only re-reads minutes past its watermark.
+        """
+        watermark, covered_since, refreshed_at = (None if np.isnan(v) else v for v in state["meta"].tolist())
+        if watermark is None:
+            return False
+        oldest = minute_of(utcnow()) - self.retention_minutes
+        exemplars = from_json_array(state["exemplars"])
+        minutes = state["minute"]
+        bounds = np.flatnonzero(np.diff(minutes)) + 1
+        blocks = {}
+        for rows, block_exemplars in zip(np.split(np.arange(len(minutes)), bounds) if len(minutes) else [], exemplars):
+            minute = int(minutes[rows[0]])
+            if minute < oldest:
+                continue
+            blocks[minute] = MinuteBlock(
+                key_ids=state["key_id"][rows],
+                count=state["count"][rows],
+                errors=state["errors"][rows],
+                duration_sum=state["duration_sum"][rows],
+                duration_max=state["duration_max"][rows],
+                hist=state["hist"][rows],
+                exemplars=None if block_exemplars is None else [[tuple(e) for e in cell] for cell in block_exemplars],
+            )
+        keys = [tuple(key) if isinstance(key, list) else key for key in from_json_array(state["keys"])]
+        with self._lock:
+            if self._watermark is not None:
+                return False
+            self._keys = keys
+            self._key_ids = {key: i for i, key in enumerate(keys)}
+            self._blocks = blocks
+            self._watermark = int(watermark)
+            self._covered_since = max(int(covered_since), oldest) if covered_since is not None else None
+            self._refreshed_at = refreshed_at
+            self.version += 1
+        return True
+
+    def blocks(self, start_minute: int, end_minute: int) -> List[Tuple[int, MinuteBlock]]:
+        """(minute, block) for every non-empty minute in [start_minute, end_minute), in order."""
+        with self._lock:
+            return [(m, self._blocks[m]) for m in range(start_minute, end_minute) if m in self._blocks]
+
+    def exemplars(self, key: Hashable, start_minute: int, end_minute: int) -> Dict[int, List[Exemplar]]:
+        """Exemplars per minute for one key over [start_minute, end_minute)."""
+        key_id = self.find(key)
+        if key_id is None:
+            return {}
+        found = {}
+        for minute, block in self.blocks(start_minute, end_minute):
+            if block.exemplars is None:
+                continue
+            rows = np.flatnonzero(block.key_ids == key_id)
+            if rows.size and block.exemplars[rows[0]]:
+                found[minute] = block.exemplars[rows[0]]
+        return found
+
+    def window(self, start_minute: int, end_minute: Optional[int] = None) -> WindowTotals:
+        """Merge every key's cells over minutes [start_minute, end_minute)."""
+        with self._lock:
+            end_minute = self._watermark if end_minute is None else end_minute
+            blocks = [self._blocks[m] for m in range(start_minute, end_minute or start_minute) if m in self._blocks]
+            keys = list(self._keys)
+        size = len(keys)
+        totals = WindowTotals(
+            keys=keys,
+            count=np.zeros(size, dtype=np.int64),
+            errors=np.zeros(size, dtype=np.int64),
+            duration_sum=np.zeros(size, dtype=np.float64),
+            duration_max=np.zeros(size, dtype=np.float64),
+            hist=np.zeros((size, BUCKET_COUNT), dtype=np.int64),
+            minutes=max((end_minute or start_minute) - start_minute, 0),
+        )
+        if not blocks:
+            return totals
+        key_ids = np.concatenate([b.key_ids for b in blocks])
+        np.add.at(totals.count, key_ids, np.concatenate([b.count for b in blocks]))
+        np.add.at(totals.errors, key_ids, np.concatenate([b.errors for b in blocks]))
+        np.add.at(totals.duration_sum, key_ids, np.concatenate([b.duration_sum for b in blocks]))
+        np.maximum.at(totals.duration_max, key_ids, np.concatenate([b.duration_max for b in blocks]))
+        np.add.at(totals.hist, key_ids, np.concatenate([b.hist for b in blocks]))
+        return totals
+
+    def window_seconds(self, seconds: int) -> WindowTotals:
+        """Totals over the trailing `seconds`, ending at the watermark."""
+        end = self._watermark if self._watermark is not None else minute_of(utcnow())
+        return self.window(end - max(seconds // 60, 1), end)
@@ -0,0 +1,107 @@
+"""Per-service, per-minute span rollups: request and error counts plus latency histograms."""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from server.config import OBSERVABILITY_TABLE_PREFIX, ROLLUP_LATENESS_MINUTES, ROLLUP_RETENTION_MINUTES
+from server.models.observability import Exemplar, MetricsSnapshot
+from server.services.rollups import RollupStore, WindowTotals, bucket_sql, exemplar_sql, histogram_quantiles
+
+logger = logging.getLogger(__name__)
+
+
+def _service_rollup_query() -> str:
+    return f"""
+    SELECT
+      date_trunc('minute', start_time) as minute,
+      service_name,
+      {bucket_sql("duration_ms")} as bucket,
+      COUNT(*) as count,
+      SUM(CASE WHEN is_error THEN 1 ELSE 0 END) as errors,
+      SUM(duration_ms) as duration_sum,
+      MAX(duration_ms) as duration_max,
+      {exemplar_sql("trace_id", "duration_ms", "is_error")}
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver
+    WHERE start_time >= CAST(:since AS TIMESTAMP)
+      AND start_time < CAST(:until AS TIMESTAMP)
+    GROUP BY 1, 2, 3
+    """
+
+
+def _service_key(row: Dict[str, Any]) -> str:
+    return row["service_name"]
+
+
+service_rollups = RollupStore(
+    name="services",
+    query=_service_rollup_query,
+    key_of=_service_key,
+    retention_minutes=ROLLUP_RETENTION_MINUTES,
+    lateness_minutes=ROLLUP_LATENESS_MINUTES,
+)
+
+
+def snapshot_from_totals(totals: WindowTotals, service_name: str, seconds: int) -> Optional[MetricsSnapshot]:
+    """One service's merged rollups as a metrics snapshot, or None if it had no traffic."""
+    try:
+        key_id = totals.keys.index(service_name)
+    except ValueError:
+        return None
+    count = int(totals.count[key_id])
+    if count == 0:
+        return None
+    p50, p95, p99 = histogram_quantiles(totals.hist[key_id], (0.5, 0.95, 0.99))
+    errors = int(totals.errors[key_id])
+    return MetricsSnapshot(
+        latency_p50=float(p50),
+        latency_p95=float(p95),
+        latency_p99=float(p99),
+        avg_duration_ms=float(totals.duration_sum[key_id]) / count,
+        max_duration_ms=float(totals.duration_max[key_id]),
+        error_count=errors,
+        error_rate=errors / count,
+        request_count=count,
+        requests_per_second=count / seconds,
+    )
+
+
+def previous_window_snapshot(service_name: str, seconds: int) -> Optional[MetricsSnapshot]:
+    """The service's metrics over the window just before the trailing `seconds`, from rollups.
+
+    Returns None when the rollups do not cover both windows, so callers can fall back
+    to the warehouse.
+    """
+    if not service_rollups.covers_seconds(2 * seconds):
+        return None
+    end = service_rollups.watermark - max(seconds // 60, 1)
+    totals = service_rollups.window(end - max(seconds // 60, 1), end)
+    return snapshot_from_totals(totals, service_name, seconds)
+
+
+def service_exemplars(service_name: str, seconds: int) -> Dict[int, List[Exemplar]]:
+    """Exemplar traces per epoch minute for the service over the trailing `seconds`."""
+    if service_rollups.watermark is None:
+        return {}
+    end = service_rollups.watermark
+    found = service_rollups.exemplars(service_name, end - max(seconds // 60, 1), end)
+    return {
+        minute: [Exemplar(trace_id=trace_id, duration_ms=duration, is_error=error) for trace_id, duration, error in items]
+        for minute, items in found.items()
+    }
+
+
+def window_service_metrics(
+    seconds: int, max_age_seconds: Optional[float] = None
+) -> Optional[Dict[str, MetricsSnapshot]]:
+    """Every active service's metrics over the trailing `seconds`, or None if the rollups lag.
+
+    `max_age_seconds` admits older data, e.g. rollups restored from a warm-start snapshot.
+    """
+    if not service_rollups.covers_seconds(seconds, max_age_seconds):
+        return None
+    totals = service_rollups.window_seconds(seconds)
+    return {
+        key: snapshot
+        for _, key in totals.rows()
+        if (snapshot := snapshot_from_totals(totals, key, seconds)) is not None
+    }
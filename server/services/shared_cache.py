@@ -0,0 +1,291 @@
+"""Cache shared by every worker process on the host, in one SQLite file.
+
+Uvicorn workers do not share memory, so without this each one sends the same
+warehouse queries. Entries are published atomically (one transaction replaces
+a key's value, so readers see either the old or the new value, never a torn
+one). A per-key lease lets exactly one worker compute a missing value while the
+others wait for it to appear; within a worker, concurrent callers share one
+computation. When the stored values exceed `max_bytes`, the least recently
+read entries are evicted. Values are JSON and zlib-compressed, so reading the
+file never runs code, and the directory holding it must belong to this user
+and be closed to others.
+
+The cache is an optimisation only: any SQLite error is logged and the caller
+computes the value itself. Waiting on another worker blocks, so async callers
+run lookups in a thread.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from server.config import (
+    SHARED_CACHE_ENABLED,
+    SHARED_CACHE_MAX_BYTES,
+    SHARED_CACHE_PATH,
+    SHARED_QUERY_TTL_SECONDS,
+)
+from server.services.warehouse_manager import APP_IDENTITY, WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+# Warehouse statements wait up to 50s, so a lease outlives the slowest query.
+LEASE_SECONDS = 90.0
+POLL_SECONDS = 0.1
+# A read refreshes an entry's recency at most this often, to keep reads write-free.
+TOUCH_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+  key TEXT PRIMARY KEY,
+  value BLOB NOT NULL,
+  size INTEGER NOT NULL,
+  expires REAL NOT NULL,
+  accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS leases (
+  key TEXT PRIMARY KEY,
+  owner TEXT NOT NULL,
+  expires REAL NOT NULL
+);
+"""
+
+
+def private_directory(directory: str) -> None:
+    """Create `directory` for this user only, refusing one that another user owns or can write to."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is owned by uid {info.st_uid}, not by this user")
+    if info.st_mode & 0o022:
+        raise PermissionError(f"{directory} is writable by other users")
+
+
+class SharedCache:
+    def __init__(self, path: str, max_bytes: int, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        # One value may take at most this share of the cache, or it is not stored.
+        self.max_entry_bytes = max_bytes // 8
+        self.enabled = enabled
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        # key -> computation in progress in this process, shared by its threads
+        self._flights: Dict[str, Future] = {}
+        self._flights_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                try:
+                    private_directory(directory)
+                except PermissionError as e:
+                    logger.error(f"Shared cache disabled: {e}")
+                    self.enabled = False
+                    raise
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            connection = self._connection()
+            now = time.time()
+            row = connection.execute(
+                "SELECT value, accessed FROM entries WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] > TOUCH_SECONDS:
+                connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(zlib.decompress(row[0]))
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        """Publish a value atomically; returns False if it was too large or the write failed."""
+        return self.set_many({key: value}, ttl_seconds) == 1
+
+    def set_many(self, values: Dict[str, Any], ttl_seconds: float) -> int:
+        """Publish several values in one transaction; returns how many were stored."""
+        if not self.enabled or not values:
+            return 0
+        try:
+            now = time.time()
+            rows = []
+            for key, value in values.items():
+                blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 1)
+                if len(blob) > self.max_entry_bytes:
+                    logger.info(f"Not sharing {key}: {len(blob)} bytes exceeds the per-entry limit")
+                    continue
+                rows.append((key, blob, len(blob), now + ttl_seconds, now))
+            if not rows:
+                return 0
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict(connection, now)
+            return len(rows)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {len(values)} keys: {e}")
+            return 0
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        evicted = 0
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if evicted >= excess:
+                break
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            evicted += size
+
+    def acquire(self, key: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Take the refresh lease on a key unless another live worker holds it."""
+        if not self.enabled:
+            return True
+        try:
+            now = time.time()
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                cursor = connection.execute(
+                    "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires"
+                    " WHERE leases.expires <= ? OR leases.owner = excluded.owner",
+                    (key, self.owner, now + lease_seconds, now),
+                )
+                return cursor.rowcount == 1
+        except Exception as e:
+            logger.warning(f"Shared cache lease failed for {key}: {e}")
+            return True
+
+    def release(self, key: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+        except Exception as e:
+            logger.warning(f"Shared cache lease release failed for {key}: {e}")
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], V], ttl_seconds: float, lease_seconds: float = LEASE_SECONDS
+    ) -> V:
+        """The shared value for `key`, computing it here only if no other worker or thread is already doing so."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            try:
+                return flight.result(timeout=lease_seconds)
+            except TimeoutError:
+                logger.warning(f"Gave up waiting for this worker's computation of {key}")
+                return compute()
+        try:
+            value = self._compute_once(key, compute, ttl_seconds, lease_seconds)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+
+    def _compute_once(self, key: str, compute: Callable[[], V], ttl_seconds: float, lease_seconds: float) -> V:
+        """Leader side of `get_or_compute`: take the cross-process lease, or wait for its holder's value."""
+        deadline = time.monotonic() + lease_seconds
+        while not self.acquire(key, lease_seconds):
+            if time.monotonic() > deadline:
+                logger.warning(f"Gave up waiting for the shared value of {key}")
+                return compute()
+            time.sleep(POLL_SECONDS)
+            value = self.get(key)
+            if value is not None:
+                return value
+        try:
+            # Another worker may have published between our miss and the lease.
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                self.set(key, value, ttl_seconds)
+            return value
+        finally:
+            self.release(key)
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
+        if self.enabled:
+            try:
+                count, size = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                stats.update(entries=count, bytes=size, max_bytes=self.max_bytes)
+            except Exception as e:
+                stats["error"] = str(e)
+        return stats
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_MAX_BYTES, enabled=SHARED_CACHE_ENABLED)
+
+
+def query_key(query: str, parameters: Optional[Dict[str, Any]], identity: str = APP_IDENTITY) -> str:
+    digest = hashlib.sha1(identity.encode())
+    digest.update(b"\0" + query.encode())
+    for name, value in sorted((parameters or {}).items()):
+        digest.update(f"\0{name}={value}".encode())
+    return f"query:{digest.hexdigest()}"
+
+
+def shared_rows(
+    warehouse_manager: WarehouseManager,
+    query: str,
+    parameters: Optional[Dict[str, Any]] = None,
+    ttl_seconds: float = SHARED_QUERY_TTL_SECONDS,
+) -> List[Dict[str, Any]]:
+    """Result rows of a query, run once per `ttl_seconds` per caller across all workers on the host.
+
+    Rows are keyed by the manager's identity as well as the query, so a caller
+    is only ever served rows fetched with its own credentials.
+    """
+    identity = getattr(warehouse_manager, "identity", APP_IDENTITY)
+    return shared_cache.get_or_compute(
+        query_key(query, parameters, identity),
+        lambda: warehouse_manager.execute_query(query, parameters),
+        ttl_seconds,
+    )
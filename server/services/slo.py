@@ -0,0 +1,212 @@
+"""SLO error budgets and multi-window burn rates from cumulative per-minute counters.
+
+For every SLO the ledger keeps, in a ring of `history_minutes + 1` slots, the
+running totals of good and all events through each minute. The count over any
+window is then a difference of two slots, so evaluating every SLO on every
+window is a handful of array gathers no matter how many minutes the window spans.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from server.config import SLO_HISTORY_MINUTES
+from server.models.observability import BurnRate, SloDefinition, SloStatus
+from server.services.rollups import BUCKET_COUNT, BUCKET_LOWER, BUCKET_UPPER, MinuteBlock, RollupStore, minute_start
+from server.services.service_rollups import service_rollups
+from server.services.timestamps import format_timestamp
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+WINDOWS: Dict[str, int] = {"5m": 5, "1h": 60, "6h": 6 * 60, "3d": 3 * 24 * 60}
+# The error budget is measured over the longest window.
+BUDGET_WINDOW = "3d"
+# (severity, long window, short window, burn-rate threshold): a policy fires when both
+# windows burn faster than the threshold, so it reacts quickly and resets quickly.
+BURN_RATE_POLICIES: List[Tuple[str, str, str, float]] = [
+    ("critical", "1h", "5m", 14.4),
+    ("critical", "6h", "1h", 6.0),
+    ("warning", "3d", "6h", 1.0),
+]
+
+
+def load_slo_definitions(path: str) -> List[SloDefinition]:
+    """SLOs from a JSON list; invalid entries are logged and skipped.
+
+    Each entry follows `SloDefinition`, e.g.
+    `{"name": "checkout-fast", "service_name": "checkout", "kind": "latency",
+    "objective": 0.99, "latency_threshold_ms": 300}`.
+    """
+    file = Path(path)
+    if not file.exists():
+        logger.info(f"No SLO definitions at {path}")
+        return []
+    definitions = []
+    names = set()
+    for entry in json.loads(file.read_text()):
+        try:
+            slo = SloDefinition(**entry)
+        except Exception as e:
+            logger.warning(f"Skipping invalid SLO definition {entry!r}: {e}")
+            continue
+        if slo.kind == "latency" and not slo.latency_threshold_ms:
+            logger.warning(f"Skipping latency SLO {slo.name} without latency_threshold_ms")
+            continue
+        if slo.name in names:
+            logger.warning(f"Skipping duplicate SLO {slo.name}")
+            continue
+        names.add(slo.name)
+        definitions.append(slo)
+    logger.info(f"Loaded {len(definitions)} SLOs from {path}")
+    return definitions
+
+
+def good_weights(slo: SloDefinition) -> np.ndarray:
+    """Per-bucket share of a rollup histogram that counts as good for a latency SLO.
+
+    Buckets entirely under the threshold count fully; the bucket containing it counts
+    the fraction below it, assuming durations are spread evenly inside the bucket.
+    """
+    threshold = slo.latency_threshold_ms or 0.0
+    width = BUCKET_UPPER - BUCKET_LOWER
+    return np.clip((threshold - BUCKET_LOWER) / width, 0.0, 1.0)
+
+
+class SloLedger:
+    """Cumulative good/total counters for a set of SLOs, advanced from the service rollups."""
+
+    def __init__(self, rollups: RollupStore, history_minutes: int):
+        self.rollups = rollups
+        self.capacity = max(history_minutes, max(WINDOWS.values())) + 1
+        self._lock = threading.Lock()
+        self.load([])
+
+    def load(self, definitions: Sequence[SloDefinition]) -> None:
+        """Replace the SLO set; counters restart and are backfilled from the retained rollups."""
+        with self._lock:
+            self.definitions = list(definitions)
+            self.position = {slo.name: i for i, slo in enumerate(self.definitions)}
+            n = len(self.definitions)
+            self._objective = np.array([slo.objective for slo in self.definitions])
+            self._latency = np.array([slo.kind == "latency" for slo in self.definitions], dtype=bool)
+            self._weights = np.stack([good_weights(slo) for slo in self.definitions]) if n else np.zeros((0, BUCKET_COUNT))
+            self._good = np.zeros((n, self.capacity), dtype=np.int64)
+            self._total = np.zeros((n, self.capacity), dtype=np.int64)
+            self._first: Optional[int] = None
+            self._processed_until: Optional[int] = None
+
+    def _minute_counts(self, block: Optional[MinuteBlock], service_ids: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(self.definitions)
+        if block is None or n == 0:
+            return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+        row_of = np.full(size, -1, dtype=np.int64)
+        row_of[block.key_ids] = np.arange(len(block.key_ids))
+        rows = np.where(service_ids >= 0, row_of[np.maximum(service_ids, 0)], -1)
+        present = rows >= 0
+        rows = np.maximum(rows, 0)
+        total = np.where(present, block.count[rows], 0)
+        available = total - np.where(present, block.errors[rows], 0)
+        under_threshold = np.rint((block.hist[rows] * self._weights).sum(axis=1)).astype(np.int64)
+        good = np.where(self._latency, np.where(present, under_threshold, 0), available)
+        return good, total
+
+    def update(self) -> int:
+        """Fold every minute the rollups hold as final into the counters."""
+        watermark = self.rollups.watermark
+        if watermark is None:
+            return 0
+        final_until = watermark - self.rollups.lateness_minutes
+        with self._lock:
+            oldest = max(watermark - self.rollups.retention_minutes, final_until - self.capacity + 1)
+            start = oldest if self._processed_until is None else max(self._processed_until, oldest)
+            if start >= final_until:
+                return 0
+            keys = list(self.rollups.keys)
+            key_ids = {key: i for i, key in enumerate(keys)}
+            service_ids = np.array([key_ids.get(slo.service_name, -1) for slo in self.definitions], dtype=np.int64)
+            if self._first is None or start != self._processed_until:
+                self._first = start
+            blocks = dict(self.rollups.blocks(start, final_until))
+            for minute in range(start, final_until):
+                good, total = self._minute_counts(blocks.get(minute), service_ids, len(keys))
+                slot, previous = minute % self.capacity, (minute - 1) % self.capacity
+                if minute == self._first:
+                    self._good[:, slot], self._total[:, slot] = good, total
+                else:
+                    self._good[:, slot] = self._good[:, previous] + good
+                    self._total[:, slot] = self._total[:, previous] + total
+            self._processed_until = final_until
+        return final_until - start
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> None:
+        """Background job; the service rollups themselves are refreshed by the health job."""
+        self.update()
+
+    def _window(self, minutes: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Good and total per SLO over the trailing `minutes`, and how many minutes had data."""
+        last = self._processed_until - 1
+        covered = min(minutes, self._processed_until - self._first, self.capacity - 1)
+        good = self._good[:, last % self.capacity].copy()
+        total = self._total[:, last % self.capacity].copy()
+        if last - covered >= self._first:
+            good -= self._good[:, (last - covered) % self.capacity]
+            total -= self._total[:, (last - covered) % self.capacity]
+        return good, total, covered
+
+    def evaluate(self) -> List[SloStatus]:
+        with self._lock:
+            n = len(self.definitions)
+            if n == 0:
+                return []
+            if self._processed_until is None:
+                return [
+                    SloStatus(slo=slo, status="ok", budget_remaining=1.0, burn_rates=[], alerts=[])
+                    for slo in self.definitions
+                ]
+            allowed = 1.0 - self._objective
+            burn: Dict[str, np.ndarray] = {}
+            rates: List[List[BurnRate]] = [[] for _ in range(n)]
+            budget = np.ones(n)
+            for window, minutes in WINDOWS.items():
+                good, total, covered = self._window(minutes)
+                bad = total - good
+                burn[window] = np.divide(bad, total * allowed, out=np.zeros(n), where=total > 0)
+                for i in range(n):
+                    rates[i].append(BurnRate(
+                        window=window,
+                        minutes_covered=covered,
+                        total_count=int(total[i]),
+                        bad_count=int(bad[i]),
+                        burn_rate=float(burn[window][i]),
+                    ))
+                if window == BUDGET_WINDOW:
+                    budget = 1.0 - burn[window]
+            updated_at = format_timestamp(minute_start(self._processed_until))
+
+        firing: List[List[str]] = [[] for _ in range(n)]
+        severity = np.zeros(n, dtype=np.int64)
+        for level, long_window, short_window, threshold in BURN_RATE_POLICIES:
+            fires = (burn[long_window] > threshold) & (burn[short_window] > threshold)
+            for i in np.flatnonzero(fires):
+                firing[i].append(f"{level}: burn rate above {threshold:g}x over {long_window} and {short_window}")
+            severity = np.maximum(severity, np.where(fires, 2 if level == "critical" else 1, 0))
+        status = ["ok", "warning", "critical"]
+        return [
+            SloStatus(
+                slo=slo,
+                status=status[severity[i]],
+                budget_remaining=float(budget[i]),
+                burn_rates=rates[i],
+                alerts=firing[i],
+                updated_at=updated_at,
+            )
+            for i, slo in enumerate(self.definitions)
+        ]
+
+
+slo_ledger = SloLedger(service_rollups, history_minutes=SLO_HISTORY_MINUTES)
@@ -0,0 +1,143 @@
+"""Static serving of the client build with precompressed variants and long-lived caching.
+
+`scripts/precompress_static.py` writes `<file>.br` and `<file>.gz` next to each
+compressible asset at build time. A request gets the best variant its
+`Accept-Encoding` allows, with `Vary: Accept-Encoding`. Each variant has its own
+ETag, because FileResponse derives it from the served file. Vite puts
+content-hashed bundles under `assets/`, and those are cached as immutable for a
+year. Everything else, index.html included, must be revalidated, which costs only
+a 304. Starlette's FileResponse already hands the file to the server via the
+`http.response.pathsend` extension when the server offers it, so the body never
+passes through Python there. Paths that are not files fall back to index.html,
+so client-side routes survive a reload.
+"""
+
+import mimetypes
+import os
+import re
+import stat
+import threading
+from typing import Dict, List, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Server preference when the client accepts several encodings equally.
+ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Vite's default `build.assetsDir` and `[name]-[hash].[ext]` file names.
+HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+Variant = Tuple[str, os.stat_result]
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Content codings from an Accept-Encoding header the client accepts, best first."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    wildcard = weights.get("*")
+    ranked = []
+    for preference, (coding, _) in enumerate(ENCODINGS):
+        q = weights.get(coding, wildcard if wildcard is not None else 0.0)
+        if q > 0:
+            ranked.append((-q, preference, coding))
+    return [coding for _, _, coding in sorted(ranked)]
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def __init__(self, *args, spa_fallback: bool = True, no_fallback_prefixes: Tuple[str, ...] = ("/api/",), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spa_fallback = spa_fallback
+        self.no_fallback_prefixes = no_fallback_prefixes
+        # full path -> (mtime of the original, {coding: variant}); files change only on deploy
+        self._variants: Dict[str, Tuple[float, Dict[str, Variant]]] = {}
+        self._variants_lock = threading.Lock()
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            # Client-side routes have no file extension; missing assets and API paths still 404.
+            if (
+                e.status_code != 404
+                or not self.spa_fallback
+                or os.path.splitext(path)[1]
+                or scope["path"].startswith(self.no_fallback_prefixes)
+            ):
+                raise
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, "index.html")
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        return self.file_response(full_path, stat_result, scope)
+
+    def _variants_of(self, full_path: str, stat_result: os.stat_result) -> Dict[str, Variant]:
+        with self._variants_lock:
+            cached = self._variants.get(full_path)
+        if cached is not None and cached[0] == stat_result.st_mtime:
+            return cached[1]
+        variants = {}
+        for coding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # A variant older than its original is left over from a previous build.
+            if stat.S_ISREG(variant_stat.st_mode) and variant_stat.st_mtime >= stat_result.st_mtime:
+                variants[coding] = (full_path + suffix, variant_stat)
+        with self._variants_lock:
+            self._variants[full_path] = (stat_result.st_mtime, variants)
+        return variants
+
+    def _cache_control(self, full_path: str) -> str:
+        for directory in self.all_directories:
+            relative = os.path.relpath(full_path, directory).replace(os.sep, "/")
+            if not relative.startswith("../") and HASHED_ASSET.match(relative):
+                return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    def file_response(
+        self,
+        full_path: "os.PathLike[str] | str",
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = str(full_path)
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": self._cache_control(full_path)}
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        served_path, served_stat = full_path, stat_result
+        variants = self._variants_of(full_path, stat_result)
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+            for coding in accepted_encodings(request_headers.get("accept-encoding", "")):
+                if coding in variants:
+                    served_path, served_stat = variants[coding]
+                    headers["Content-Encoding"] = coding
+                    break
+
+        response = FileResponse(
+            served_path, status_code=status_code, headers=headers, media_type=media_type, stat_result=served_stat
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,289 @@
+"""Rolling per-service top-K slowest and most recent erroring traces, kept in memory.
+
+Slowest traces are tracked in time slots: one-minute slots for the last hour and
+fifteen-minute slots for the last day, each holding a min-heap of at most K
+traces per service. The K slowest of a window are exactly the K slowest of the
+union of its slots' heaps, so a query merges at most a few dozen small heaps.
+Erroring traces need no slots: the K most recent per service, filtered to the
+window, are the K most recent in any window.
+
+A trace can be added more than once: the assembler re-publishes it when late
+spans amend it, and the warehouse copy arrives later still. A newer copy
+replaces the older one wherever it is held, even when its start moved it to
+another slot, and an assembled copy never replaces the warehouse's.
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.config import OBSERVABILITY_TABLE_PREFIX, TOP_TRACES_K
+from server.models.observability import TraceInfo
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.trace_assembler import trace_assembler
+from server.services.trace_index import trace_index
+from server.services.trace_pages import to_trace_info
+from server.services.trace_analysis import as_bool
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+# (slot width in seconds, how long slots of that width are kept)
+SLOT_LEVELS: Tuple[Tuple[int, int], ...] = ((60, 3600), (900, 86400))
+
+# (duration, trace_id, trace); a min-heap on duration keeps the K slowest.
+SlowEntry = Tuple[float, str, TraceInfo]
+# (trace_start, trace_id, trace); a min-heap on start keeps the K most recent.
+ErrorEntry = Tuple[datetime, str, TraceInfo]
+
+
+def _push(heap: list, entry: tuple, k: int) -> None:
+    for i, existing in enumerate(heap):
+        if existing[1] == entry[1]:
+            if existing == entry:
+                return
+            heap[i] = heap[-1]
+            heap.pop()
+            heapq.heapify(heap)
+            break
+    if len(heap) < k:
+        heapq.heappush(heap, entry)
+    elif entry[:2] > heap[0][:2]:
+        heapq.heapreplace(heap, entry)
+
+
+def _remove(heap: list, trace_id: str) -> None:
+    kept = [entry for entry in heap if entry[1] != trace_id]
+    if len(kept) < len(heap):
+        heapq.heapify(kept)
+        heap[:] = kept
+
+
+class TopTraceTracker:
+    def __init__(self, k: int):
+        self.k = k
+        self._lock = threading.Lock()
+        # level -> slot number -> service -> heap
+        self._slow: List[Dict[int, Dict[str, List[SlowEntry]]]] = [{} for _ in SLOT_LEVELS]
+        self._errors: Dict[str, List[ErrorEntry]] = {}
+        # trace_id -> (copy held, has_error, from the warehouse) for every trace a heap accepted.
+        self._held: Dict[str, Tuple[TraceInfo, bool, bool]] = {}
+        self._backfilled_until: Optional[datetime] = None
+
+    def add(self, trace: TraceInfo, has_error: bool, from_warehouse: bool = True) -> None:
+        start = parse_timestamp(trace.trace_start)
+        epoch = int(start.timestamp())
+        with self._lock:
+            held = self._held.get(trace.trace_id)
+            if held is not None:
+                if held[2] and not from_warehouse:
+                    return
+                if held[:2] == (trace, has_error):
+                    self._held[trace.trace_id] = (trace, has_error, from_warehouse)
+                    return
+                self._forget(held[0])
+            kept = False
+            for level, (width, _) in enumerate(SLOT_LEVELS):
+                slot = self._slow[level].setdefault(epoch // width, {})
+                for service in set(trace.services_involved):
+                    heap = slot.setdefault(service, [])
+                    _push(heap, (trace.total_duration_ms, trace.trace_id, trace), self.k)
+                    kept = kept or any(entry[1] == trace.trace_id for entry in heap)
+            if has_error:
+                for service in set(trace.services_involved):
+                    heap = self._errors.setdefault(service, [])
+                    _push(heap, (start, trace.trace_id, trace), self.k)
+                    kept = kept or any(entry[1] == trace.trace_id for entry in heap)
+            if kept:
+                self._held[trace.trace_id] = (trace, has_error, from_warehouse)
+
+    def add_assembled(self, trace: TraceInfo, has_error: bool) -> None:
+        """Trace assembler listener: a live copy, replaced by the warehouse copy when that lands."""
+        self.add(trace, has_error, from_warehouse=False)
+
+    def _forget(self, trace: TraceInfo) -> None:
+        """Drop every entry of a trace's held copy, from the slots its start put it in."""
+        epoch = int(parse_timestamp(trace.trace_start).timestamp())
+        services = set(trace.services_involved)
+        for level, (width, _) in enumerate(SLOT_LEVELS):
+            slot = self._slow[level].get(epoch // width, {})
+            for service in services & slot.keys():
+                _remove(slot[service], trace.trace_id)
+        for service in services & self._errors.keys():
+            _remove(self._errors[service], trace.trace_id)
+        del self._held[trace.trace_id]
+
+    def on_trace(self, trace: TraceInfo, row: Dict[str, Any]) -> None:
+        """Trace index listener: every trace the index ingests past its watermark."""
+        self.add(trace, as_bool(row.get("has_error")))
+
+    def evict(self) -> None:
+        now = int(utcnow().timestamp())
+        with self._lock:
+            for level, (width, retention) in enumerate(SLOT_LEVELS):
+                oldest = (now - retention) // width
+                for slot in [s for s in self._slow[level] if s < oldest]:
+                    del self._slow[level][slot]
+            horizon = utcnow() - timedelta(seconds=SLOT_LEVELS[-1][1])
+            expired = [t for t, held in self._held.items() if parse_timestamp(held[0].trace_start) < horizon]
+            for trace_id in expired:
+                del self._held[trace_id]
+            for service in list(self._errors):
+                heap = [entry for entry in self._errors[service] if entry[0] >= horizon]
+                if heap:
+                    heapq.heapify(heap)
+                    self._errors[service] = heap
+                else:
+                    del self._errors[service]
+
+    def _level_for(self, seconds: int) -> int:
+        for level, (_, retention) in enumerate(SLOT_LEVELS):
+            if seconds <= retention:
+                return level
+        return len(SLOT_LEVELS) - 1
+
+    def slowest(self, service_name: str, seconds: int, k: int) -> List[TraceInfo]:
+        """The k slowest traces involving the service in about the last `seconds`.
+
+        The window is rounded out to whole slots, so it may start up to one slot early.
+        """
+        level = self._level_for(seconds)
+        width = SLOT_LEVELS[level][0]
+        first = (int(utcnow().timestamp()) - seconds) // width
+        with self._lock:
+            heaps = [
+                services[service_name] for slot, services in self._slow[level].items()
+                if slot >= first and service_name in services
+            ]
+            entries = sorted((entry for heap in heaps for entry in heap), key=lambda e: e[:2], reverse=True)
+        # A trace is held once, but a reader must never see it twice even if that slips.
+        unique = {}
+        for entry in entries:
+            unique.setdefault(entry[1], entry[2])
+            if len(unique) == k:
+                break
+        return list(unique.values())
+
+    def recent_errors(self, service_name: str, seconds: int, k: int) -> List[TraceInfo]:
+        since = utcnow() - timedelta(seconds=seconds)
+        with self._lock:
+            entries = [entry for entry in self._errors.get(service_name, []) if entry[0] >= since]
+        return [entry[2] for entry in sorted(entries, key=lambda e: e[:2], reverse=True)[:k]]
+
+    def ready(self) -> bool:
+        """Whether the day has been backfilled and the live trace feed is current."""
+        return self._backfilled_until is not None and trace_index.covered_since() is not None
+
+    def _backfill_query(self) -> str:
+        """The K slowest per service in every slot of every level, plus the K most recent errors.
+
+        Each level is ranked in its own slot width over its own retention (`since_<level>`),
+        so the last hour's one-minute slots hold as many traces as live ones would.
+        """
+        slots = ",\n            ".join(
+            f"FLOOR(unix_timestamp(trace_start) / {width}) as slot_{level}"
+            for level, (width, _) in enumerate(SLOT_LEVELS)
+        )
+        ranks = ",\n            ".join(
+            f"ROW_NUMBER() OVER (PARTITION BY service_name, slot_{level} ORDER BY total_duration_ms DESC) as slow_rank_{level}"
+            for level in range(len(SLOT_LEVELS))
+        )
+        slowest = " OR ".join(
+            f"(trace_start >= CAST(:since_{level} AS TIMESTAMP) AND slow_rank_{level} <= {self.k})"
+            for level in range(len(SLOT_LEVELS))
+        )
+        return f"""
+        WITH traces AS (
+          SELECT
+            trace_id,
+            trace_start,
+            services_involved,
+            total_trace_duration_ms as total_duration_ms,
+            span_count,
+            exists(span_details, s -> s.is_error) as has_error,
+            service_name,
+            {slots}
+          FROM {OBSERVABILITY_TABLE_PREFIX}.traces_assembled_silver
+          LATERAL VIEW explode(services_involved) AS service_name
+          WHERE trace_start >= CAST(:since AS TIMESTAMP)
+            AND trace_start <= CAST(:until AS TIMESTAMP)
+        ),
+        ranked AS (
+          SELECT *,
+            {ranks},
+            ROW_NUMBER() OVER (PARTITION BY service_name, has_error ORDER BY trace_start DESC) as recent_rank
+          FROM traces
+        )
+        SELECT trace_id, trace_start, services_involved, total_duration_ms, span_count, has_error
+        FROM ranked
+        WHERE {slowest} OR (has_error AND recent_rank <= {self.k})
+        """
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> None:
+        """Background job: one ranked backfill of the last day on first run, then eviction only.
+
+        After the backfill, new traces arrive through the trace index listener.
+        """
+        if self._backfilled_until is None:
+            until = trace_index.watermark or utcnow()
+            now = utcnow()
+            parameters = {
+                "since": format_timestamp(now - timedelta(seconds=SLOT_LEVELS[-1][1])),
+                "until": format_timestamp(until),
+                **{
+                    f"since_{level}": format_timestamp(now - timedelta(seconds=retention))
+                    for level, (_, retention) in enumerate(SLOT_LEVELS)
+                },
+            }
+            rows = 0
+            for row in warehouse_manager.iter_query(self._backfill_query(), parameters):
+                self.add(to_trace_info(row), as_bool(row.get("has_error")))
+                rows += 1
+            self._backfilled_until = until
+            logger.info(f"Top traces backfilled from {rows} ranked rows")
+        self.evict()
+
+
+top_traces = TopTraceTracker(TOP_TRACES_K)
+trace_index.subscribe(top_traces.on_trace)
+# Live traces assembled from OTLP spans; the warehouse copy replaces them by trace id when it lands.
+trace_assembler.subscribe(top_traces.add_assembled)
+
+
+def _ranked_query(order: str, errors_only: bool, k: int) -> str:
+    return f"""
+    SELECT trace_id, trace_start, services_involved, total_trace_duration_ms as total_duration_ms, span_count
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_assembled_silver
+    WHERE trace_start >= CAST(:since AS TIMESTAMP)
+      AND array_contains(services_involved, :service_name)
+      {"AND exists(span_details, s -> s.is_error)" if errors_only else ""}
+    ORDER BY {order} DESC
+    LIMIT {k}
+    """
+
+
+def _query_ranked(
+    warehouse_manager: WarehouseManager, service_name: str, seconds: int, k: int, order: str, errors_only: bool
+) -> List[TraceInfo]:
+    parameters = {
+        "service_name": service_name,
+        "since": format_timestamp(utcnow() - timedelta(seconds=seconds)),
+    }
+    query = _ranked_query(order, errors_only, k)
+    return [to_trace_info(row) for row in warehouse_manager.iter_query(query, parameters)]
+
+
+def slowest_traces(warehouse_manager: WarehouseManager, service_name: str, seconds: int, k: int) -> List[TraceInfo]:
+    """The k slowest traces of the service, from memory once the tracker is warm."""
+    if top_traces.ready():
+        return top_traces.slowest(service_name, seconds, k)
+    return _query_ranked(warehouse_manager, service_name, seconds, k, "total_trace_duration_ms", errors_only=False)
+
+
+def error_traces(warehouse_manager: WarehouseManager, service_name: str, seconds: int, k: int) -> List[TraceInfo]:
+    """The k most recent erroring traces of the service, from memory once the tracker is warm."""
+    if top_traces.ready():
+        return top_traces.recent_errors(service_name, seconds, k)
+    return _query_ranked(warehouse_manager, service_name, seconds, k, "trace_start", errors_only=True)
@@ -0,0 +1,247 @@
+"""Span-tree reconstruction, self-time and critical-path analysis for a single trace."""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.config import (
+    OBSERVABILITY_TABLE_PREFIX,
+    TRACE_ANALYSIS_MAX_SPANS,
+    TRACE_DETAIL_CACHE_SIZE,
+    TRACE_DETAIL_TTL_SECONDS,
+)
+from server.models.observability import (
+    CriticalPathSegment,
+    ServiceTimeBreakdown,
+    TraceAnalysis,
+    TraceWaterfall,
+)
+from server.services.cache import TTLCache
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+trace_analysis_cache: TTLCache[TraceAnalysis] = TTLCache(TRACE_DETAIL_CACHE_SIZE, TRACE_DETAIL_TTL_SECONDS)
+
+
+@dataclass
+class Span:
+    span_id: str
+    parent_span_id: Optional[str]
+    name: str
+    service_name: str
+    start_ms: float
+    duration_ms: float
+    is_error: bool
+
+    @property
+    def end_ms(self) -> float:
+        return self.start_ms + self.duration_ms
+
+
+def as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
+def span_from_row(row: Dict[str, Any]) -> Span:
+    return Span(
+        span_id=row["span_id"],
+        parent_span_id=row.get("parent_span_id") or None,
+        name=row.get("span_name") or "",
+        service_name=row["service_name"],
+        start_ms=float(row["start_ms"]),
+        duration_ms=max(float(row["duration_ms"] or 0.0), 0.0),
+        is_error=as_bool(row.get("is_error")),
+    )
+
+
+def _link(spans: List[Span]) -> Tuple[List[int], List[List[int]], List[int], List[int]]:
+    """Resolve parents, children (in start order), BFS order and depth in linear time.
+
+    Spans whose parent is missing become roots, and so does the span that closes a
+    parent cycle, so every span is reached exactly once.
+    """
+    position = {span.span_id: i for i, span in enumerate(spans)}
+    parent = [position.get(span.parent_span_id, -1) if span.parent_span_id else -1 for span in spans]
+
+    # Walk each unvisited parent chain once; meeting the current chain again means a cycle.
+    UNSEEN, ON_CHAIN, DONE = 0, 1, 2
+    state = [UNSEEN] * len(spans)
+    for i in range(len(spans)):
+        chain = []
+        node = i
+        while node >= 0 and state[node] == UNSEEN:
+            state[node] = ON_CHAIN
+            chain.append(node)
+            node = parent[node]
+        if node >= 0 and state[node] == ON_CHAIN:
+            parent[node] = -1
+        for node in chain:
+            state[node] = DONE
+
+    children: List[List[int]] = [[] for _ in spans]
+    for i, p in enumerate(parent):
+        if p >= 0:
+            children[p].append(i)
+
+    depth = [0] * len(spans)
+    order = [i for i, p in enumerate(parent) if p < 0]
+    for node in order:
+        for child in children[node]:
+            depth[child] = depth[node] + 1
+            order.append(child)
+    return parent, children, order, depth
+
+
+def _self_times(spans: List[Span], children: List[List[int]]) -> List[float]:
+    """Span duration not covered by any child, merging children in start order."""
+    self_times = []
+    for i, span in enumerate(spans):
+        covered = 0.0
+        run_start = run_end = None
+        for c in children[i]:
+            start = max(spans[c].start_ms, span.start_ms)
+            end = min(spans[c].end_ms, span.end_ms)
+            if end <= start:
+                continue
+            if run_end is None or start > run_end:
+                if run_end is not None:
+                    covered += run_end - run_start
+                run_start, run_end = start, end
+            else:
+                run_end = max(run_end, end)
+        if run_end is not None:
+            covered += run_end - run_start
+        self_times.append(max(span.duration_ms - covered, 0.0))
+    return self_times
+
+
+def _critical_path(
+    spans: List[Span], children: List[List[int]], roots: List[int]
+) -> List[CriticalPathSegment]:
+    """Walk back from the last-finishing work, attributing each instant to one span.
+
+    Starting at the end of the trace, the child that finished last (and before the
+    cursor) is on the critical path; the cursor then jumps to that child's start and
+    any gap is the parent's own time. Each span is expanded once.
+    """
+    segments: List[CriticalPathSegment] = []
+    if not spans:
+        return segments
+    trace_start = min(span.start_ms for span in spans)
+    stack: List[Tuple[int, float]] = [(-1, max(span.end_ms for span in spans))]
+    while stack:
+        node, bound = stack.pop()
+        if node < 0:
+            kids, low, cursor = roots, trace_start, bound
+        else:
+            kids, low, cursor = children[node], spans[node].start_ms, min(spans[node].end_ms, bound)
+        for child in sorted(kids, key=lambda c: spans[c].end_ms, reverse=True):
+            if cursor <= low:
+                break
+            if spans[child].start_ms >= cursor:
+                continue
+            child_end = min(spans[child].end_ms, cursor)
+            if node >= 0 and child_end < cursor:
+                segments.append(CriticalPathSegment(span=node, start_ms=child_end, end_ms=cursor))
+            stack.append((child, child_end))
+            cursor = max(spans[child].start_ms, low)
+        if node >= 0 and cursor > low:
+            segments.append(CriticalPathSegment(span=node, start_ms=low, end_ms=cursor))
+    segments.sort(key=lambda segment: segment.start_ms)
+    return segments
+
+
+def analyze_spans(trace_id: str, spans: List[Span], max_spans: int = TRACE_ANALYSIS_MAX_SPANS) -> TraceAnalysis:
+    """Build the waterfall, per-span self time and the critical path for one trace."""
+    spans = sorted(spans, key=lambda span: span.start_ms)
+    truncated = len(spans) > max_spans
+    spans = spans[:max_spans]
+
+    parent, children, _order, depth = _link(spans)
+    roots = [i for i, p in enumerate(parent) if p < 0]
+    self_times = _self_times(spans, children)
+    critical_path = _critical_path(spans, children, roots)
+
+    critical = [0.0] * len(spans)
+    for segment in critical_path:
+        critical[segment.span] += segment.end_ms - segment.start_ms
+
+    trace_start = spans[0].start_ms if spans else 0.0
+    trace_end = max((span.end_ms for span in spans), default=trace_start)
+
+    services: Dict[str, int] = {}
+    names: Dict[str, int] = {}
+    breakdown: Dict[str, ServiceTimeBreakdown] = {}
+    for i, span in enumerate(spans):
+        services.setdefault(span.service_name, len(services))
+        names.setdefault(span.name, len(names))
+        entry = breakdown.setdefault(
+            span.service_name,
+            ServiceTimeBreakdown(
+                service_name=span.service_name, span_count=0, error_count=0,
+                self_time_ms=0.0, critical_path_ms=0.0,
+            ),
+        )
+        entry.span_count += 1
+        entry.error_count += int(span.is_error)
+        entry.self_time_ms += self_times[i]
+        entry.critical_path_ms += critical[i]
+
+    for segment in critical_path:
+        segment.start_ms -= trace_start
+        segment.end_ms -= trace_start
+
+    waterfall = TraceWaterfall(
+        services=list(services),
+        names=list(names),
+        span_id=[span.span_id for span in spans],
+        parent=parent,
+        depth=depth,
+        service=[services[span.service_name] for span in spans],
+        name=[names[span.name] for span in spans],
+        start_ms=[span.start_ms - trace_start for span in spans],
+        duration_ms=[span.duration_ms for span in spans],
+        self_time_ms=self_times,
+        critical_path_ms=critical,
+        error=[span.is_error for span in spans],
+    )
+    return TraceAnalysis(
+        trace_id=trace_id,
+        duration_ms=trace_end - trace_start,
+        span_count=len(spans),
+        truncated=truncated,
+        services=sorted(breakdown.values(), key=lambda entry: entry.critical_path_ms, reverse=True),
+        critical_path=critical_path,
+        waterfall=waterfall,
+    )
+
+
+def fetch_trace_analysis(warehouse_manager: WarehouseManager, trace_id: str) -> Optional[TraceAnalysis]:
+    """Analyze a trace from `traces_silver`, caching the result like trace details."""
+    analysis = trace_analysis_cache.get(trace_id)
+    if analysis is not None:
+        return analysis
+
+    query = f"""
+    SELECT
+      span_id,
+      parent_span_id,
+      span_name,
+      service_name,
+      CAST(unix_micros(start_time) AS DOUBLE) / 1000 as start_ms,
+      duration_ms,
+      is_error
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver
+    WHERE trace_id = :trace_id
+    ORDER BY start_time
+    LIMIT {TRACE_ANALYSIS_MAX_SPANS + 1}
+    """
+    spans = [span_from_row(row) for row in warehouse_manager.iter_query(query, {"trace_id": trace_id})]
+    if not spans:
+        return None
+    analysis = analyze_spans(trace_id, spans)
+    trace_analysis_cache.set(trace_id, analysis)
+    return analysis
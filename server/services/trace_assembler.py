@@ -0,0 +1,222 @@
+"""Assemble traces from the live span stream, closing them on inactivity or the watermark.
+
+Spans are grouped by trace id into open traces. A trace closes when no span has
+arrived for it for `inactivity_seconds` of wall-clock time, or earlier when the
+event-time watermark (the newest span end seen, minus `lateness_seconds`) passes
+its last span end by `inactivity_seconds`, so a steady stream closes traces
+promptly and a stalled one still flushes them. Span ends count toward the
+watermark only up to the wall clock, so one span from a skewed clock cannot push
+it ahead and drop every trace after it as late. Closed traces are kept, newest
+last, up to `max_closed`; a late span of one of them reopens nothing but amends
+the closed trace in place. Spans older than the watermark for traces no longer
+held are dropped and counted. Open traces are capped too: past `max_open`, the
+least recently active ones are closed early.
+
+A trace is summarised the way `traces_assembled_silver` does it: start is the
+earliest span start, duration runs from there to the latest span end, the
+services are the distinct service names (sorted) and the span count counts
+distinct span ids, so re-sent spans are not counted twice.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from server.config import (
+    TRACE_ASSEMBLER_INACTIVITY_SECONDS,
+    TRACE_ASSEMBLER_LATENESS_SECONDS,
+    TRACE_ASSEMBLER_MAX_CLOSED_TRACES,
+    TRACE_ASSEMBLER_MAX_OPEN_TRACES,
+)
+from server.models.observability import TraceInfo
+from server.services.live_spans import SpanBatch, live_spans
+from server.services.timestamps import format_timestamp
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+NANOS_PER_SECOND = 10**9
+
+TraceListener = Callable[[TraceInfo, bool], None]
+
+
+@dataclass
+class _Trace:
+    start_ns: int
+    end_ns: int
+    has_error: bool
+    services: Set[str] = field(default_factory=set)
+    span_ids: Set[str] = field(default_factory=set)
+    last_seen: float = 0.0
+
+    def info(self, trace_id: str) -> TraceInfo:
+        return TraceInfo(
+            trace_id=trace_id,
+            trace_start=format_timestamp(datetime.fromtimestamp(self.start_ns / NANOS_PER_SECOND, tz=timezone.utc)),
+            services_involved=sorted(self.services),
+            total_duration_ms=max(self.end_ns - self.start_ns, 0) / 1e6,
+            span_count=len(self.span_ids),
+        )
+
+
+class TraceAssembler:
+    def __init__(self, inactivity_seconds: int, lateness_seconds: int, max_open: int, max_closed: int):
+        self.inactivity_seconds = inactivity_seconds
+        self.lateness_ns = lateness_seconds * NANOS_PER_SECOND
+        self.max_open = max_open
+        self.max_closed = max_closed
+        self._lock = threading.Lock()
+        # trace id -> trace, least recently active first
+        self._open: "OrderedDict[str, _Trace]" = OrderedDict()
+        # (last span end, trace id); entries go stale when a trace grows and are skipped
+        self._by_end: List[Tuple[int, str]] = []
+        # trace id -> trace, oldest closed first
+        self._closed: "OrderedDict[str, _Trace]" = OrderedDict()
+        self._max_event_ns: Optional[int] = None
+        self.late_dropped = 0
+        self.amended = 0
+        self._listeners: List[TraceListener] = []
+
+    @property
+    def watermark_ns(self) -> Optional[int]:
+        return None if self._max_event_ns is None else self._max_event_ns - self.lateness_ns
+
+    def subscribe(self, listener: TraceListener) -> None:
+        """Call `listener(trace, has_error)` whenever a trace closes or a closed trace is amended."""
+        self._listeners.append(listener)
+
+    def add(self, batch: SpanBatch) -> None:
+        """Fold a batch of spans into open traces; spans of one trace are aggregated together first."""
+        if len(batch) == 0:
+            return
+        trace_ids, inverse = np.unique(batch.trace_id, return_inverse=True)
+        starts = np.full(len(trace_ids), np.iinfo(np.int64).max, dtype=np.int64)
+        ends = np.zeros(len(trace_ids), dtype=np.int64)
+        errors = np.zeros(len(trace_ids), dtype=bool)
+        np.minimum.at(starts, inverse, batch.start_ns)
+        np.maximum.at(ends, inverse, batch.end_ns)
+        np.logical_or.at(errors, inverse, batch.is_error)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.flatnonzero(np.diff(inverse[order])) + 1
+
+        now = time.monotonic()
+        emitted: List[_Trace] = []
+        emitted_ids: List[str] = []
+        with self._lock:
+            watermark = self.watermark_ns
+            for i, rows in enumerate(np.split(order, bounds)):
+                trace_id = str(trace_ids[i])
+                start, end = int(starts[i]), int(ends[i])
+                trace = self._open.get(trace_id)
+                if trace is None and trace_id in self._closed:
+                    trace = self._closed[trace_id]
+                    self.amended += 1
+                    self._merge(trace, batch, rows, start, end, bool(errors[i]))
+                    emitted.append(trace)
+                    emitted_ids.append(trace_id)
+                    continue
+                if trace is None:
+                    if watermark is not None and end < watermark:
+                        self.late_dropped += len(rows)
+                        continue
+                    trace = self._open[trace_id] = _Trace(start_ns=start, end_ns=end, has_error=False)
+                    heapq.heappush(self._by_end, (end, trace_id))
+                else:
+                    self._open.move_to_end(trace_id)
+                    if end > trace.end_ns:
+                        heapq.heappush(self._by_end, (end, trace_id))
+                self._merge(trace, batch, rows, start, end, bool(errors[i]))
+                trace.last_seen = now
+            newest = min(int(ends.max()), time.time_ns())
+            if self._max_event_ns is None or newest > self._max_event_ns:
+                self._max_event_ns = newest
+            closed = self._close_ready(now)
+        self._notify(emitted_ids + [trace_id for trace_id, _ in closed], emitted + [trace for _, trace in closed])
+
+    @staticmethod
+    def _merge(trace: _Trace, batch: SpanBatch, rows: np.ndarray, start: int, end: int, has_error: bool) -> None:
+        trace.start_ns = min(trace.start_ns, start)
+        trace.end_ns = max(trace.end_ns, end)
+        trace.has_error = trace.has_error or has_error
+        trace.services.update(batch.service_name[rows].tolist())
+        trace.span_ids.update(batch.span_id[rows].tolist())
+
+    def _close_ready(self, now: float) -> List[Tuple[str, _Trace]]:
+        """Close traces past the watermark, idle ones, and the least active beyond `max_open`."""
+        ready: List[str] = []
+        watermark = self.watermark_ns
+        if watermark is not None:
+            gap = self.inactivity_seconds * NANOS_PER_SECOND
+            while self._by_end and self._by_end[0][0] + gap < watermark:
+                end, trace_id = heapq.heappop(self._by_end)
+                trace = self._open.get(trace_id)
+                if trace is not None and trace.end_ns == end:
+                    ready.append(trace_id)
+        for trace_id, trace in self._open.items():
+            if now - trace.last_seen <= self.inactivity_seconds and len(self._open) - len(ready) <= self.max_open:
+                break
+            ready.append(trace_id)
+
+        closed = []
+        for trace_id in dict.fromkeys(ready):
+            trace = self._open.pop(trace_id, None)
+            if trace is None:
+                continue
+            self._closed[trace_id] = trace
+            closed.append((trace_id, trace))
+        while len(self._closed) > self.max_closed:
+            self._closed.popitem(last=False)
+        if len(self._by_end) > 4 * max(len(self._open), 1024):
+            self._by_end = [(trace.end_ns, trace_id) for trace_id, trace in self._open.items()]
+            heapq.heapify(self._by_end)
+        return closed
+
+    def _notify(self, trace_ids: List[str], traces: List[_Trace]) -> None:
+        if not self._listeners:
+            return
+        for trace_id, trace in zip(trace_ids, traces):
+            info = trace.info(trace_id)
+            for listener in self._listeners:
+                listener(info, trace.has_error)
+
+    def flush(self) -> int:
+        """Close whatever is idle; needed when no spans arrive to drive the watermark."""
+        with self._lock:
+            closed = self._close_ready(time.monotonic())
+        self._notify([trace_id for trace_id, _ in closed], [trace for _, trace in closed])
+        return len(closed)
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> None:
+        """Background job: flush idle traces on the refresh cadence."""
+        closed = self.flush()
+        if closed:
+            logger.info(f"Trace assembler closed {closed} idle traces ({len(self._open)} open)")
+
+    def recent(self, service_name: Optional[str] = None, limit: int = 100) -> List[TraceInfo]:
+        """Most recently closed traces, newest first."""
+        with self._lock:
+            items = list(self._closed.items())
+        traces = []
+        for trace_id, trace in reversed(items):
+            if service_name is not None and service_name not in trace.services:
+                continue
+            traces.append(trace.info(trace_id))
+            if len(traces) >= limit:
+                break
+        return traces
+
+
+trace_assembler = TraceAssembler(
+    inactivity_seconds=TRACE_ASSEMBLER_INACTIVITY_SECONDS,
+    lateness_seconds=TRACE_ASSEMBLER_LATENESS_SECONDS,
+    max_open=TRACE_ASSEMBLER_MAX_OPEN_TRACES,
+    max_closed=TRACE_ASSEMBLER_MAX_CLOSED_TRACES,
+)
+live_spans.subscribe(trace_assembler.add)
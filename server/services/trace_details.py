@@ -0,0 +1,164 @@
+"""Cached, batch-fetched trace details.
+
+The in-process cache is backed by the host-wide shared cache, so a trace one
+worker fetched is not fetched again by the others. Both tiers are keyed by the
+caller's identity as well as the trace id: a detail fetched with one caller's
+credentials is never served to another.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from server.config import (
+    OBSERVABILITY_TABLE_PREFIX,
+    TRACE_DETAIL_CACHE_SIZE,
+    TRACE_DETAIL_PREFETCH_BATCH,
+    TRACE_DETAIL_TTL_SECONDS,
+)
+from server.models.observability import SpanDetail, TraceDetail
+from server.services.cache import TTLCache
+from server.services.shared_cache import shared_cache
+from server.services.warehouse_manager import APP_IDENTITY, WarehouseManager
+from server.services.warm_start import from_json_array, json_array
+
+logger = logging.getLogger(__name__)
+
+# An assembled trace does not change, so entries only leave by size or a long TTL.
+trace_detail_cache: TTLCache[TraceDetail] = TTLCache(TRACE_DETAIL_CACHE_SIZE, TRACE_DETAIL_TTL_SECONDS)
+
+_in_flight: set = set()
+_in_flight_lock = threading.Lock()
+
+
+def _identity(warehouse_manager: WarehouseManager) -> str:
+    return getattr(warehouse_manager, "identity", APP_IDENTITY)
+
+
+def _shared_key(identity: str, trace_id: str) -> str:
+    return f"trace_detail:{identity}:{trace_id}"
+
+
+def _from_shared(identity: str, trace_ids: List[str]) -> List[str]:
+    """Copy details other workers already fetched into the local cache; returns the ids still missing."""
+    missing = []
+    for trace_id in trace_ids:
+        detail = shared_cache.get(_shared_key(identity, trace_id))
+        if detail is None:
+            missing.append(trace_id)
+        else:
+            trace_detail_cache.set((identity, trace_id), TraceDetail.model_validate(detail))
+    return missing
+
+
+def _in_list(trace_ids: List[str]) -> Tuple[str, Dict[str, str]]:
+    names = [f"trace_id_{i}" for i in range(len(trace_ids))]
+    return ", ".join(f":{name}" for name in names), dict(zip(names, trace_ids))
+
+
+def fetch_trace_details(
+    warehouse_manager: WarehouseManager, trace_ids: List[str]
+) -> Dict[str, TraceDetail]:
+    """Fetch details for many traces with one query per table, and cache them."""
+    if not trace_ids:
+        return {}
+    placeholders, parameters = _in_list(trace_ids)
+
+    trace_query = f"""
+    SELECT
+      trace_id,
+      trace_start
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_assembled_silver
+    WHERE trace_id IN ({placeholders})
+    """
+
+    spans_query = f"""
+    SELECT
+      trace_id,
+      service_name,
+      SUM(duration_ms) as total_duration_ms
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_silver
+    WHERE trace_id IN ({placeholders})
+    GROUP BY trace_id, service_name
+    ORDER BY trace_id, total_duration_ms DESC
+    """
+
+    starts = {row["trace_id"]: row["trace_start"] for row in warehouse_manager.iter_query(trace_query, parameters)}
+    if not starts:
+        return {}
+
+    spans: Dict[str, List[SpanDetail]] = {trace_id: [] for trace_id in starts}
+    for row in warehouse_manager.iter_query(spans_query, parameters):
+        if row["trace_id"] in spans:
+            spans[row["trace_id"]].append(
+                SpanDetail(service_name=row["service_name"], total_duration_ms=row["total_duration_ms"])
+            )
+
+    identity = _identity(warehouse_manager)
+    details = {}
+    for trace_id, trace_start in starts.items():
+        detail = TraceDetail(trace_id=trace_id, trace_start=trace_start, spans=spans[trace_id])
+        trace_detail_cache.set((identity, trace_id), detail)
+        details[trace_id] = detail
+    shared_cache.set_many(
+        {_shared_key(identity, t): detail.model_dump() for t, detail in details.items()}, TRACE_DETAIL_TTL_SECONDS
+    )
+    return details
+
+
+def get_trace_detail(warehouse_manager: WarehouseManager, trace_id: str) -> Optional[TraceDetail]:
+    key = (_identity(warehouse_manager), trace_id)
+    detail = trace_detail_cache.get(key)
+    if detail is None:
+        _from_shared(key[0], [trace_id])
+        detail = trace_detail_cache.get(key)
+    if detail is None:
+        detail = fetch_trace_details(warehouse_manager, [trace_id]).get(trace_id)
+    return detail
+
+
+def prefetch_trace_details(warehouse_manager: WarehouseManager, trace_ids: Iterable[str]) -> None:
+    """Warm the caller's cache for traces just shown in a list, in batches, skipping cached or in-flight ids."""
+    identity = _identity(warehouse_manager)
+    with _in_flight_lock:
+        pending = [
+            key for key in ((identity, t) for t in dict.fromkeys(trace_ids))
+            if key not in _in_flight and key not in trace_detail_cache
+        ]
+        _in_flight.update(pending)
+    if not pending:
+        return
+    try:
+        missing = _from_shared(identity, [trace_id for _, trace_id in pending])
+        if len(missing) < len(pending):
+            logger.info(f"Prefetch found {len(pending) - len(missing)} trace details in the shared cache")
+        for i in range(0, len(missing), TRACE_DETAIL_PREFETCH_BATCH):
+            batch = missing[i:i + TRACE_DETAIL_PREFETCH_BATCH]
+            fetched = fetch_trace_details(warehouse_manager, batch)
+            logger.info(f"Prefetched {len(fetched)}/{len(batch)} trace details")
+    except Exception as e:
+        logger.warning(f"Trace detail prefetch failed: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.difference_update(pending)
+
+
+def export_trace_details() -> Optional[Dict[str, np.ndarray]]:
+    """The local detail cache, for a warm-start snapshot."""
+    items = trace_detail_cache.items()
+    if not items:
+        return None
+    return {"details": json_array([[identity, detail.model_dump()] for (identity, _), detail in items])}
+
+
+def restore_trace_details(state: Dict[str, np.ndarray]) -> bool:
+    for entry in from_json_array(state["details"]):
+        # Snapshots from before details were scoped by caller carry no identity; drop them.
+        if not isinstance(entry, list):
+            continue
+        identity, fields = entry
+        detail = TraceDetail(**fields)
+        trace_detail_cache.set((identity, detail.trace_id), detail)
+    return True
@@ -0,0 +1,232 @@
+"""In-process inverted index from service to its recent traces."""
+
+import bisect
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from server.config import (
+    BACKGROUND_REFRESH_SECONDS,
+    OBSERVABILITY_TABLE_PREFIX,
+    TRACE_INDEX_LATENESS_SECONDS,
+    TRACE_INDEX_MAX_TRACES,
+    TRACE_INDEX_WINDOW_SECONDS,
+)
+from server.models.observability import TraceInfo
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.trace_pages import decode_cursor, encode_cursor, fetch_trace_page, to_trace_info
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+SortKey = Tuple[datetime, str]
+TraceListener = Callable[[TraceInfo, Dict[str, Any]], None]
+
+
+class RecentTraceIndex:
+    """Service -> recent trace summaries, fed incrementally past a `trace_start` watermark.
+
+    Every posting list is kept sorted by (trace_start, trace_id), the same key the
+    keyset pagination uses, so pages are served by bisecting straight to the cursor.
+    Traces older than `window_seconds` are trimmed on every refresh, and the oldest
+    traces are evicted first once `max_traces` is reached.
+
+    The table is fed by trace_start, but traces land in it late, after assembly.
+    Each refresh therefore re-reads `lateness_seconds` behind the watermark, and
+    the index is treated as complete only up to that point (`settled_until`).
+    """
+
+    def __init__(self, window_seconds: int, max_traces: int, lateness_seconds: int):
+        self.window_seconds = window_seconds
+        self.max_traces = max_traces
+        self.lateness_seconds = lateness_seconds
+        self._lock = threading.Lock()
+        self._traces: Dict[str, Tuple[SortKey, TraceInfo]] = {}
+        self._order: List[SortKey] = []
+        self._by_service: Dict[str, List[SortKey]] = {}
+        self._watermark: Optional[datetime] = None
+        self._covered_since: Optional[datetime] = None
+        self._last_refresh: Optional[float] = None
+        self._listeners: List[TraceListener] = []
+
+    def __len__(self) -> int:
+        return len(self._traces)
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        return self._watermark
+
+    def subscribe(self, listener: TraceListener) -> None:
+        """Call `listener` with every trace (and its raw row) the feed reads, re-reads included."""
+        self._listeners.append(listener)
+
+    def _feed_query(self) -> str:
+        return f"""
+        SELECT
+          trace_id,
+          trace_start,
+          services_involved,
+          total_trace_duration_ms as total_duration_ms,
+          span_count,
+          exists(span_details, s -> s.is_error) as has_error
+        FROM {OBSERVABILITY_TABLE_PREFIX}.traces_assembled_silver
+        WHERE trace_start > CAST(:since AS TIMESTAMP)
+        ORDER BY trace_start
+        """
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> int:
+        """Pull traces newer than the watermark (minus the lateness allowance)."""
+        now = utcnow()
+        window_start = now - timedelta(seconds=self.window_seconds)
+        if self._watermark is None:
+            since = window_start
+        else:
+            since = max(window_start, self._watermark - timedelta(seconds=self.lateness_seconds))
+
+        added = 0
+        for row in warehouse_manager.iter_query(self._feed_query(), {"since": format_timestamp(since)}):
+            trace = to_trace_info(row)
+            added += self.add(trace)
+            for listener in self._listeners:
+                listener(trace, row)
+
+        with self._lock:
+            if self._covered_since is None:
+                self._covered_since = window_start
+            self._evict(window_start)
+            self._last_refresh = time.monotonic()
+        logger.info(f"Trace index refreshed: {added} new traces, {len(self._traces)} indexed")
+        return added
+
+    def add(self, trace: TraceInfo) -> int:
+        """Insert or replace one trace summary; returns 1 if it was new."""
+        key = (parse_timestamp(trace.trace_start), trace.trace_id)
+        with self._lock:
+            existing = self._traces.get(trace.trace_id)
+            if existing is not None:
+                if existing[0] == key:
+                    self._traces[trace.trace_id] = (key, trace)
+                    return 0
+                self._remove(trace.trace_id)
+            self._traces[trace.trace_id] = (key, trace)
+            bisect.insort(self._order, key)
+            for service in set(trace.services_involved):
+                bisect.insort(self._by_service.setdefault(service, []), key)
+            if self._watermark is None or key[0] > self._watermark:
+                self._watermark = key[0]
+            return 0 if existing is not None else 1
+
+    def _remove(self, trace_id: str) -> None:
+        key, trace = self._traces.pop(trace_id)
+        self._order.pop(bisect.bisect_left(self._order, key))
+        for service in set(trace.services_involved):
+            postings = self._by_service[service]
+            postings.pop(bisect.bisect_left(postings, key))
+
+    def _evict(self, window_start: datetime) -> None:
+        cutoff = bisect.bisect_left(self._order, (window_start, ""))
+        overflow = len(self._order) - self.max_traces
+        cutoff = max(cutoff, overflow)
+        if cutoff <= 0:
+            return
+        cutoff_key = self._order[cutoff] if cutoff < len(self._order) else None
+        for key in self._order[:cutoff]:
+            del self._traces[key[1]]
+        del self._order[:cutoff]
+        for service in list(self._by_service):
+            postings = self._by_service[service]
+            drop = len(postings) if cutoff_key is None else bisect.bisect_left(postings, cutoff_key)
+            del postings[:drop]
+            if not postings:
+                del self._by_service[service]
+        if cutoff_key is not None:
+            self._covered_since = max(self._covered_since or cutoff_key[0], cutoff_key[0])
+        else:
+            self._covered_since = window_start
+
+    def covered_since(self) -> Optional[datetime]:
+        """Oldest trace_start the index is complete from, or None while it is cold or stale."""
+        if self._last_refresh is None:
+            return None
+        if time.monotonic() - self._last_refresh > 3 * BACKGROUND_REFRESH_SECONDS:
+            return None
+        return self._covered_since
+
+    def settled_until(self) -> Optional[datetime]:
+        """trace_start before which no more traces are expected to land; newer ones may still arrive."""
+        if self._watermark is None:
+            return None
+        return self._watermark - timedelta(seconds=self.lateness_seconds)
+
+    def known(self, trace_ids: Iterable[str]) -> Set[str]:
+        """The given trace ids the index holds, i.e. that the warehouse has assembled."""
+        with self._lock:
+            return {trace_id for trace_id in trace_ids if trace_id in self._traces}
+
+    def page_service(
+        self, service_name: str, since: datetime, count: int, cursor: Optional[str] = None
+    ) -> List[TraceInfo]:
+        """Up to `count` of a service's traces newest first, after `cursor` and not before `since`."""
+        cursor_key = None
+        if cursor is not None:
+            cursor_start, cursor_id = decode_cursor(cursor)
+            cursor_key = (parse_timestamp(cursor_start), cursor_id)
+        with self._lock:
+            postings = self._by_service.get(service_name, [])
+            end = len(postings) if cursor_key is None else bisect.bisect_left(postings, cursor_key)
+            start = max(bisect.bisect_left(postings, (since, ""), 0, end), end - count)
+            return [self._traces[key[1]][1] for key in reversed(postings[start:end])]
+
+
+trace_index = RecentTraceIndex(
+    window_seconds=TRACE_INDEX_WINDOW_SECONDS,
+    max_traces=TRACE_INDEX_MAX_TRACES,
+    lateness_seconds=TRACE_INDEX_LATENESS_SECONDS,
+)
+
+
+def provisional_since() -> Optional[datetime]:
+    """trace_start from which index-served listings may still gain traces, or None when the index is not serving."""
+    if trace_index.covered_since() is None:
+        return None
+    return trace_index.settled_until()
+
+
+def service_trace_rows(
+    warehouse_manager: WarehouseManager,
+    service_name: str,
+    interval: str,
+    seconds: int,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Iterator[TraceInfo]:
+    """One page (plus look-ahead row) of a service's traces, from memory where the index covers it.
+
+    Rows inside the live window come from the index; when the page runs past it,
+    the remainder is read from the warehouse with a cursor just below the last
+    row served, so the warehouse only ever scans the part the index cannot answer.
+    Rows newer than `provisional_since()` are served as the index has them and
+    may still gain late-landing traces; callers mark that part provisional.
+    """
+    covered = trace_index.covered_since()
+    if covered is None:
+        return fetch_trace_page(warehouse_manager, interval, limit, cursor, service_name=service_name)
+
+    since = utcnow() - timedelta(seconds=seconds)
+    rows = trace_index.page_service(service_name, since, limit + 1, cursor)
+    if len(rows) > limit or since >= covered:
+        return iter(rows)
+
+    if rows:
+        resume = encode_cursor(rows[-1].trace_start, rows[-1].trace_id)
+    elif cursor is None or parse_timestamp(decode_cursor(cursor)[0]) >= covered:
+        resume = encode_cursor(format_timestamp(covered), "")
+    else:
+        resume = cursor
+    older = fetch_trace_page(
+        warehouse_manager, interval, limit - len(rows), resume, service_name=service_name
+    )
+    return itertools.chain(rows, older)
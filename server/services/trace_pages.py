@@ -0,0 +1,156 @@
+"""Keyset pagination and NDJSON streaming for trace listings."""
+
+import base64
+import itertools
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from server.config import OBSERVABILITY_TABLE_PREFIX
+from server.models.observability import TraceInfo
+from server.services.projection import Fields, placeholders, select_columns
+from server.services.warehouse_manager import WarehouseManager
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Set when a listing came from the in-memory index: traces that started at or
+# after this instant may still land, so that part of the listing is provisional.
+SETTLED_UNTIL_HEADER = "X-Settled-Until"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# SQL per selectable TraceInfo field; trace_id and trace_start are always read for the cursor.
+TRACE_COLUMNS = {
+    "services_involved": "services_involved",
+    "total_duration_ms": "total_trace_duration_ms",
+    "span_count": "span_count",
+}
+TRACE_REQUIRED = ("trace_id", "trace_start")
+
+
+def encode_cursor(trace_start: str, trace_id: str) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    raw = json.dumps([trace_start, trace_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by `encode_cursor`, rejecting malformed input with a 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        trace_start, trace_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(trace_start, str) or not isinstance(trace_id, str):
+            raise ValueError("cursor fields must be strings")
+        return trace_start, trace_id
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
+def to_trace_info(row: Dict[str, Any]) -> TraceInfo:
+    """Build a TraceInfo from a warehouse row, decoding JSON-encoded arrays."""
+    services = row.get("services_involved")
+    if isinstance(services, str):
+        services = json.loads(services)
+    return TraceInfo(**{**row, "services_involved": services or []})
+
+
+def build_trace_page_query(
+    interval: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    service_name: Optional[str] = None,
+    fields: Fields = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Build a keyset query ordered by (trace_start, trace_id) descending.
+
+    One extra row is requested so callers can tell whether another page exists
+    without a separate COUNT query.
+    """
+    conditions = [f"trace_start >= NOW() - INTERVAL {interval}"]
+    parameters: Dict[str, Any] = {}
+
+    if service_name is not None:
+        conditions.append("array_contains(services_involved, :service_name)")
+        parameters["service_name"] = service_name
+
+    if cursor is not None:
+        cursor_start, cursor_id = decode_cursor(cursor)
+        conditions.append(
+            "(trace_start < CAST(:cursor_start AS TIMESTAMP)"
+            " OR (trace_start = CAST(:cursor_start AS TIMESTAMP) AND trace_id < :cursor_id))"
+        )
+        parameters["cursor_start"] = cursor_start
+        parameters["cursor_id"] = cursor_id
+
+    where = "\n      AND ".join(conditions)
+    selected = select_columns(TRACE_COLUMNS, fields)
+    columns = "trace_id,\n      trace_start" + (f",\n      {selected}" if selected else "")
+    query = f"""
+    SELECT
+      {columns}
+    FROM {OBSERVABILITY_TABLE_PREFIX}.traces_assembled_silver
+    WHERE {where}
+    ORDER BY trace_start DESC, trace_id DESC
+    LIMIT {limit + 1}
+    """
+    return query, parameters
+
+
+def paginate(rows: Iterable[TraceInfo], limit: int) -> Tuple[List[TraceInfo], Optional[str]]:
+    """Split a limit+1 row result into the page and the cursor for the next one."""
+    page: List[TraceInfo] = []
+    for trace in rows:
+        if len(page) == limit:
+            last = page[-1]
+            return page, encode_cursor(last.trace_start, last.trace_id)
+        page.append(trace)
+    return page, None
+
+
+def tee_trace_ids(rows: Iterable[TraceInfo], trace_ids: List[str], limit: int) -> Iterator[TraceInfo]:
+    """Pass rows through while recording their ids, e.g. for prefetching once a response is sent.
+
+    Only the first `limit` rows are recorded: the look-ahead row beyond them only
+    decides the next cursor and is not part of the page.
+    """
+    for trace in rows:
+        if len(trace_ids) < limit:
+            trace_ids.append(trace.trace_id)
+        yield trace
+
+
+def iter_ndjson(rows: Iterable[TraceInfo], limit: int, fields: Fields = None) -> Iterator[bytes]:
+    """Stream a page as NDJSON, ending with a `{"next_cursor": ...}` trailer line."""
+    include = set(fields) if fields is not None else None
+    emitted = 0
+    last: Optional[TraceInfo] = None
+    next_cursor = None
+    for trace in rows:
+        if emitted == limit:
+            next_cursor = encode_cursor(last.trace_start, last.trace_id)
+            break
+        yield trace.model_dump_json(include=include).encode() + b"\n"
+        emitted += 1
+        last = trace
+    yield json.dumps({"next_cursor": next_cursor}).encode() + b"\n"
+
+
+def fetch_trace_page(
+    warehouse_manager: WarehouseManager,
+    interval: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    service_name: Optional[str] = None,
+    fields: Fields = None,
+) -> Iterator[TraceInfo]:
+    """Iterate one page (plus the look-ahead row) from the warehouse.
+
+    The statement is executed and the first row pulled eagerly, so cursor and
+    query errors surface before a streaming response has started; the rest of
+    the rows are read chunk by chunk as the caller consumes them.
+    """
+    query, parameters = build_trace_page_query(interval, limit, cursor, service_name, fields)
+    defaults = placeholders(TraceInfo, fields)
+    rows = (to_trace_info({**defaults, **row}) for row in warehouse_manager.iter_query(query, parameters))
+    first = next(rows, None)
+    return iter(()) if first is None else itertools.chain([first], rows)
@@ -1,7 +1,9 @@
 """User service for Databricks user operations."""
 
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.iam import User
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from databricks.sdk.service.iam import User
 
 
 class UserService:
@@ -9,9 +11,11 @@ class UserService:
 
   def __init__(self):
     """Initialize the user service with Databricks workspace client."""
+    from databricks.sdk import WorkspaceClient
+
     self.client = WorkspaceClient()
 
-  def get_current_user(self) -> User:
+  def get_current_user(self) -> 'User':
     """Get the current authenticated user."""
     return self.client.current_user.me()
 
@@ -1,15 +1,39 @@
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
-from databricks.sdk.core import Config
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional
+import hashlib
 import os
 import logging
+import threading
+import time
+
+from server.services.cache import TTLCache
+
+# The SDK takes about a second to import, so it is loaded on first use (see warm_up).
+if TYPE_CHECKING:
+    from databricks.sdk.service.sql import StatementParameterListItem
 
 logger = logging.getLogger(__name__)
 
+# Warehouse chosen by auto-detection, per caller identity: which warehouses are
+# visible and running depends on who asks, so one caller's choice is not reused for another.
+_detected_warehouse_ids: TTLCache[str] = TTLCache(1024, ttl_seconds=3600)
+
+# Identity of managers built without a caller token (background jobs, the app itself).
+APP_IDENTITY = "app"
+
+
+def identity_of(user_token: Optional[str]) -> str:
+    """Stable, non-secret name of the caller behind a token, for scoping cached results."""
+    if not user_token:
+        return APP_IDENTITY
+    return "user:" + hashlib.sha256(user_token.encode()).hexdigest()[:32]
+
 
 class WarehouseManager:
     def __init__(self, user_token: Optional[str] = None):
+        from databricks.sdk import WorkspaceClient
+        from databricks.sdk.core import Config
+
+        self.identity = identity_of(user_token)
         try:
             client_id = os.getenv("DATABRICKS_CLIENT_ID")
             client_secret = os.getenv("DATABRICKS_CLIENT_SECRET")
@@ -51,7 +75,11 @@ class WarehouseManager:
 
     def get_warehouse_id(self) -> str:
         if self._warehouse_id is None:
-            self._warehouse_id = self._auto_detect_warehouse()
+            detected = _detected_warehouse_ids.get(self.identity)
+            if detected is None:
+                detected = self._auto_detect_warehouse()
+                _detected_warehouse_ids.set(self.identity, detected)
+            self._warehouse_id = detected
         return self._warehouse_id
 
     def get_warehouse_info(self) -> Dict[str, Any]:
@@ -63,35 +91,89 @@ class WarehouseManager:
             "status": warehouse.state.value if warehouse.state else "UNKNOWN",
         }
 
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    def _to_parameters(
+        self, parameters: Optional[Dict[str, Any]]
+    ) -> Optional[List["StatementParameterListItem"]]:
+        from databricks.sdk.service.sql import StatementParameterListItem
+
+        if not parameters:
+            return None
+        return [
+            StatementParameterListItem(name=name, value=None if value is None else str(value))
+            for name, value in parameters.items()
+        ]
+
+    def _execute_statement(self, query: str, parameters: Optional[Dict[str, Any]] = None):
+        from databricks.sdk.service.sql import StatementState
+
+        warehouse_id = self.get_warehouse_id()
+        logger.info(f"Executing query on warehouse: {warehouse_id}")
+
+        statement = self.client.statement_execution.execute_statement(
+            warehouse_id=warehouse_id,
+            statement=query,
+            parameters=self._to_parameters(parameters),
+            wait_timeout="50s"
+        )
+
+        if statement.status.state != StatementState.SUCCEEDED:
+            error_message = statement.status.error.message if statement.status.error else "Unknown error"
+            logger.error(f"Query failed: {error_message}")
+            raise RuntimeError(f"Query failed: {error_message}")
+
+        return statement
+
+    def iter_query(
+        self, query: str, parameters: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield result rows chunk by chunk, fetching the next chunk only when needed."""
         try:
-            warehouse_id = self.get_warehouse_id()
-            logger.info(f"Executing query on warehouse: {warehouse_id}")
-            
-            statement = self.client.statement_execution.execute_statement(
-                warehouse_id=warehouse_id,
-                statement=query,
-                wait_timeout="50s"
-            )
-            
-            if statement.status.state != StatementState.SUCCEEDED:
-                error_message = statement.status.error.message if statement.status.error else "Unknown error"
-                logger.error(f"Query failed: {error_message}")
-                raise RuntimeError(f"Query failed: {error_message}")
-            
+            statement = self._execute_statement(query, parameters)
             if not statement.result or not statement.result.data_array:
                 logger.info("Query returned no results")
-                return []
-            
+                return
+
             columns = [col.name for col in statement.manifest.schema.columns]
-            
-            results = []
-            for row in statement.result.data_array:
-                row_dict = dict(zip(columns, row))
-                results.append(row_dict)
-            
-            logger.info(f"Query returned {len(results)} rows")
-            return results
+            chunk = statement.result
+            while chunk is not None:
+                for row in chunk.data_array or []:
+                    yield dict(zip(columns, row))
+                if chunk.next_chunk_index is None:
+                    break
+                chunk = self.client.statement_execution.get_statement_result_chunk_n(
+                    statement.statement_id, chunk.next_chunk_index
+                )
         except Exception as e:
             logger.error(f"Query execution error: {e}", exc_info=True)
             raise
+
+    def execute_query(
+        self, query: str, parameters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        results = list(self.iter_query(query, parameters))
+        if results:
+            logger.info(f"Query returned {len(results)} rows")
+        return results
+
+
+_shared_warehouse_manager: Optional[WarehouseManager] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_warehouse_manager() -> WarehouseManager:
+    """Return the process-wide manager used by background jobs (app service principal)."""
+    global _shared_warehouse_manager
+    with _shared_lock:
+        if _shared_warehouse_manager is None:
+            _shared_warehouse_manager = WarehouseManager()
+    return _shared_warehouse_manager
+
+
+def warm_up() -> None:
+    """Import the SDK, build the shared client and pick the warehouse ahead of the first request."""
+    started = time.monotonic()
+    try:
+        get_shared_warehouse_manager().get_warehouse_id()
+        logger.info(f"Warehouse client warmed up in {time.monotonic() - started:.2f}s")
+    except Exception as e:
+        logger.warning(f"Warehouse warm-up failed, will retry on first use: {e}")
@@ -0,0 +1,142 @@
+"""Warm-start snapshots: in-memory state written to local disk and restored after a restart.
+
+Each registered source exports its state as a dict of numpy arrays, saved as one
+compressed `.npz` file per source (anything that is not an array is stored as
+JSON bytes, so loading never unpickles). Files are replaced atomically, so
+several workers can save over one another safely. The first background tick
+after startup restores every snapshot younger than `max_age_seconds`, before
+the refresh jobs run. Sources keep the original refresh time of the data, so it
+is reported with its true age and refreshed incrementally from where it stopped.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from server.config import WARM_START_DIR, WARM_START_ENABLED, WARM_START_MAX_AGE_SECONDS, WARM_START_SAVE_SECONDS
+from server.services.warehouse_manager import WarehouseManager
+
+logger = logging.getLogger(__name__)
+
+Exporter = Callable[[], Optional[Dict[str, np.ndarray]]]
+Restorer = Callable[[Dict[str, np.ndarray]], bool]
+
+SAVED_AT = "_saved_at"
+
+
+def json_array(value: Any) -> np.ndarray:
+    """A JSON-serialisable value as a byte array that fits in an `.npz` snapshot."""
+    return np.frombuffer(json.dumps(value, separators=(",", ":")).encode(), dtype=np.uint8)
+
+
+def from_json_array(array: np.ndarray) -> Any:
+    return json.loads(array.tobytes())
+
+
+class WarmStart:
+    def __init__(self, directory: str, save_seconds: int, max_age_seconds: int, enabled: bool = True):
+        self.directory = directory
+        self.save_seconds = save_seconds
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self._sources: List[Tuple[str, Exporter, Restorer]] = []
+        self._lock = threading.Lock()
+        self._restored = False
+        self._last_save: Optional[float] = None
+        # source name -> wall-clock time its restored snapshot was saved
+        self.restored_from: Dict[str, float] = {}
+
+    def register(self, name: str, export: Exporter, restore: Restorer) -> None:
+        """Add a source; sources are restored in registration order."""
+        self._sources = [source for source in self._sources if source[0] != name]
+        self._sources.append((name, export, restore))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.npz")
+
+    def restore(self) -> int:
+        """Load every fresh enough snapshot once; returns the number of sources restored."""
+        with self._lock:
+            if self._restored or not self.enabled:
+                return 0
+            self._restored = True
+        restored = 0
+        for name, _, restore in self._sources:
+            path = self._path(name)
+            if not os.path.exists(path):
+                continue
+            try:
+                with np.load(path, allow_pickle=False) as archive:
+                    state = {key: archive[key] for key in archive.files}
+                saved_at = float(state.pop(SAVED_AT)[0])
+                age = time.time() - saved_at
+                if age > self.max_age_seconds:
+                    logger.info(f"Skipping warm-start snapshot {name}: {age:.0f}s old")
+                    continue
+                if restore(state):
+                    self.restored_from[name] = saved_at
+                    restored += 1
+                    logger.info(f"Restored warm-start snapshot {name} ({age:.0f}s old)")
+            except Exception as e:
+                logger.warning(f"Could not restore warm-start snapshot {name}: {e}")
+        return restored
+
+    def save(self) -> int:
+        """Write every source that has state; returns the number of snapshots written."""
+        if not self.enabled:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        saved = 0
+        for name, export, _ in self._sources:
+            try:
+                state = export()
+                if state is None:
+                    continue
+                state[SAVED_AT] = np.array([time.time()])
+                descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=f".{name}.", suffix=".npz")
+                try:
+                    with os.fdopen(descriptor, "wb") as f:
+                        np.savez_compressed(f, **state)
+                    os.replace(temporary, self._path(name))
+                except BaseException:
+                    os.unlink(temporary)
+                    raise
+                saved += 1
+            except Exception as e:
+                logger.warning(f"Could not save warm-start snapshot {name}: {e}")
+        self._last_save = time.monotonic()
+        return saved
+
+    def refresh(self, warehouse_manager: WarehouseManager) -> None:
+        """Background job: restore on the first tick, then save every `save_seconds`."""
+        if not self._restored:
+            self.restore()
+            self._last_save = time.monotonic()
+            return
+        if time.monotonic() - (self._last_save or 0.0) >= self.save_seconds:
+            saved = self.save()
+            logger.info(f"Saved {saved} warm-start snapshots")
+
+    def shutdown(self) -> None:
+        """Save once more on the way out, unless nothing was restored or refreshed yet."""
+        if self._restored:
+            self.save()
+
+    def ages(self) -> Dict[str, float]:
+        """Age in seconds of each snapshot restored at startup."""
+        now = time.time()
+        return {name: now - saved_at for name, saved_at in self.restored_from.items()}
+
+
+warm_start = WarmStart(
+    WARM_START_DIR,
+    save_seconds=WARM_START_SAVE_SECONDS,
+    max_age_seconds=WARM_START_MAX_AGE_SECONDS,
+    enabled=WARM_START_ENABLED,
+)
@@ -0,0 +1,19 @@
+import re
+
+from server.services.approximate import approximate_service_query, approximate_trends_query, new_sample_seed
+
+
+def sampled_spans(query: str) -> str:
+    return re.search(r"sampled_spans AS \((.*?)\n    \)", query, re.S).group(1)
+
+
+def test_snapshot_and_trend_read_the_same_sample():
+    seed = new_sample_seed()
+    current = approximate_service_query("1 HOUR", 10, seed=seed)
+    trends = approximate_trends_query("1 HOUR", 10, seed=seed)
+    assert f"TABLESAMPLE (10 PERCENT) REPEATABLE ({seed})" in current
+    assert sampled_spans(current) == sampled_spans(trends)
+
+
+def test_unseeded_sample_is_not_repeatable():
+    assert "REPEATABLE" not in approximate_service_query("1 HOUR")
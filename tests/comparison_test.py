@@ -0,0 +1,43 @@
+import math
+
+import numpy as np
+import pytest
+
+from server.services.comparison import _kolmogorov_p_value, distribution_shift
+from server.services.rollups import BUCKET_COUNT
+
+
+def kolmogorov_sf(lam: float) -> float:
+    """Kolmogorov survival function from the series that converges fast for small lambda."""
+    if lam < 1.0:
+        total = sum(math.exp(-((2 * k - 1) ** 2) * math.pi**2 / (8 * lam * lam)) for k in range(1, 50))
+        return 1.0 - math.sqrt(2 * math.pi) / lam * total
+    return sum(2 * (-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 50))
+
+
+def p_value_at(lam: float) -> float:
+    # Equal sample sizes large enough that Stephens' correction is negligible.
+    n = 10**12
+    effective = math.sqrt(n / 2)
+    return _kolmogorov_p_value(lam / (effective + 0.12 + 0.11 / effective), n, n)
+
+
+@pytest.mark.parametrize("lam", [1e-4, 0.01, 0.1, 0.2, 0.3, 0.5, 0.8, 1.0, 1.36, 2.0])
+def test_p_value_matches_the_kolmogorov_distribution(lam):
+    assert p_value_at(lam) == pytest.approx(kolmogorov_sf(lam), abs=1e-4)
+
+
+@pytest.mark.parametrize("lam", [1e-4, 0.05, 0.3, 0.7, 1.36, 2.5])
+def test_p_value_matches_scipy(lam):
+    stats = pytest.importorskip("scipy.stats")
+    assert p_value_at(lam) == pytest.approx(stats.kstwobign.sf(lam), abs=1e-4)
+
+
+def test_identical_windows_are_not_a_shift():
+    histogram = np.zeros(BUCKET_COUNT)
+    histogram[40:60] = 1000
+    nearly = histogram.copy()
+    nearly[40] += 3
+    shift = distribution_shift(histogram, nearly)
+    assert 0 < shift.ks_statistic < 1e-3
+    assert shift.p_value == 1.0
@@ -0,0 +1,70 @@
+from server.models.observability import GraphEdge
+from server.services.graph_index import GraphIndex, GraphIndexRegistry
+
+LATENCY = {
+    ("gateway", "api"): 10.0,
+    ("api", "db"): 5.0,
+    ("api", "cache"): 1.0,
+    ("cache", "api"): 1.0,
+    ("api", "queue"): 50.0,
+    ("queue", "worker"): 100.0,
+    ("worker", "db"): 20.0,
+}
+
+
+def edges(latency=LATENCY) -> list:
+    return [GraphEdge(source=s, target=t, callCount=10, latencyP95=ms) for (s, t), ms in latency.items()]
+
+
+def path_keys(index: GraphIndex, paths) -> list:
+    return [(latency, [index.edge_keys[e][1] for e in path]) for latency, path in paths]
+
+
+def test_cycle_members_share_a_component():
+    index = GraphIndex(edges(), services=["lonely"])
+    component = dict(zip(index.names, index.component.tolist()))
+    assert component["api"] == component["cache"]
+    others = {component[name] for name in ("gateway", "db", "queue", "worker", "lonely")}
+    assert len(others) == 5 and component["api"] not in others
+    assert index.component_count == 6
+
+
+def test_blast_radius_follows_calls_through_the_cycle():
+    index = GraphIndex(edges(), services=["lonely"])
+    assert index.blast_radius("gateway", upstream=False) == [
+        ("api", 1), ("cache", 2), ("db", 2), ("queue", 2), ("worker", 3),
+    ]
+    assert index.blast_radius("db", upstream=True) == [
+        ("api", 1), ("worker", 1), ("cache", 2), ("gateway", 2), ("queue", 2),
+    ]
+    assert index.blast_radius("cache", upstream=True) == [("api", 1), ("gateway", 2)]
+    assert index.blast_radius("lonely", upstream=False) == []
+
+
+def test_hot_paths_are_simple_and_slowest_first():
+    index = GraphIndex(edges())
+    paths, exhaustive = index.hot_paths("gateway", "db", k=5)
+    assert exhaustive
+    assert path_keys(index, paths) == [
+        (180.0, ["api", "queue", "worker", "db"]),
+        (15.0, ["api", "db"]),
+    ]
+    assert path_keys(index, index.hot_paths("gateway", "db", k=1)[0]) == [(180.0, ["api", "queue", "worker", "db"])]
+
+
+def test_unreachable_target_has_no_paths():
+    index = GraphIndex(edges())
+    assert index.hot_paths("db", "gateway", k=3) == ([], True)
+    assert not index.can_reach(index.position["worker"], index.position["api"])
+
+
+def test_registry_keeps_the_index_while_the_topology_holds():
+    registry = GraphIndexRegistry()
+    first = registry.update("1h", edges())
+    faster = registry.update("1h", edges({**LATENCY, ("queue", "worker"): 1.0}))
+    assert faster is first
+    assert path_keys(first, first.hot_paths("gateway", "db", k=1)[0]) == [(81.0, ["api", "queue", "worker", "db"])]
+
+    rebuilt = registry.update("1h", edges({**LATENCY, ("db", "gateway"): 1.0}))
+    assert rebuilt is not first
+    assert registry.get("1h") is rebuilt
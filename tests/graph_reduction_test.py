@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server.models.observability import DependencyGraph, GraphEdge, GraphNode
+from server.routers import dependencies
+from server.services.graph_reduction import prune
+
+
+def node(name: str, requests: int, health: str = "healthy") -> GraphNode:
+    return GraphNode(id=name, health=health, errorRate=0.0, requestCount=requests)
+
+
+def edge(source: str, target: str, calls: int) -> GraphEdge:
+    return GraphEdge(source=source, target=target, callCount=calls)
+
+
+def test_unhealthy_nodes_are_kept_past_the_node_budget():
+    nodes = (
+        [node(f"warn{i}", 10, "warning") for i in range(40)]
+        + [node(f"crit{i}", 10, "critical") for i in range(10)]
+        + [node(f"busy{i}", 1000) for i in range(50)]
+    )
+    pruned = prune(DependencyGraph(nodes=nodes, edges=[]), max_nodes=20, max_edges=None, rank_by="traffic")
+    assert len(pruned.nodes) == 50
+    assert all(n.health != "healthy" for n in pruned.nodes)
+    assert pruned.hiddenNodes == 50
+
+
+def test_unhealthy_nodes_rank_first_then_by_traffic():
+    nodes = [
+        node("quiet-critical", 1, "critical"),
+        node("busy", 1000),
+        node("quiet-warning", 2, "warning"),
+        node("medium", 500),
+        node("idle", 1),
+    ]
+    pruned = prune(DependencyGraph(nodes=nodes, edges=[]), max_nodes=3, max_edges=None, rank_by="traffic")
+    assert {n.id for n in pruned.nodes} == {"quiet-critical", "quiet-warning", "busy"}
+
+    pruned = prune(DependencyGraph(nodes=nodes, edges=[]), max_nodes=1, max_edges=None, rank_by="traffic")
+    assert [n.id for n in pruned.nodes] == ["quiet-critical", "quiet-warning"]
+
+
+def test_unhealthy_node_keeps_its_strongest_edge_past_the_edge_budget():
+    nodes = [node("a", 100), node("b", 100), node("c", 100), node("sick", 1, "critical")]
+    edges = [edge("a", "b", 100), edge("b", "c", 90), edge("c", "sick", 5), edge("a", "sick", 3)]
+    pruned = prune(DependencyGraph(nodes=nodes, edges=edges), max_nodes=None, max_edges=1, rank_by="traffic")
+    assert [(e.source, e.target) for e in pruned.edges] == [("a", "b"), ("c", "sick")]
+    assert pruned.hiddenEdges == 2
+
+
+@pytest.mark.parametrize("query", ["max_nodes=5001", "max_edges=20001", "max_nodes=0"])
+def test_graph_budgets_are_bounded(query):
+    app = FastAPI()
+    app.include_router(dependencies.router)
+    response = TestClient(app).get(f"/graph?{query}")
+    assert response.status_code == 422
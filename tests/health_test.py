@@ -0,0 +1,123 @@
+import numpy as np
+
+from server.services.health import WARMUP_MINUTES, HealthEngine
+from server.services.http_cache import snapshot_etag
+from server.services.rollups import BUCKET_COUNT, HISTOGRAM_DTYPE, MinuteBlock, RollupStore, bucket_index
+
+START = 28_000_800  # an epoch minute at midnight UTC
+
+
+def make_store() -> RollupStore:
+    return RollupStore(
+        "test", lambda: "", lambda row: row["service_name"], retention_minutes=3 * 24 * 60, lateness_minutes=0
+    )
+
+
+def block(store: RollupStore, traffic: dict) -> MinuteBlock:
+    """One minute: service -> (requests, errors, latency ms of every request)."""
+    key_ids, counts, errors, hists = [], [], [], []
+    for name, (count, error_count, latency_ms) in traffic.items():
+        hist = np.zeros(BUCKET_COUNT, dtype=HISTOGRAM_DTYPE)
+        hist[bucket_index(latency_ms)] = count
+        key_ids.append(store.key_id(name))
+        counts.append(count)
+        errors.append(error_count)
+        hists.append(hist)
+    return MinuteBlock(
+        key_ids=np.array(key_ids, dtype=np.int32),
+        count=np.array(counts, dtype=np.int64),
+        errors=np.array(errors, dtype=np.int64),
+        duration_sum=np.array([c * t[2] for c, t in zip(counts, traffic.values())], dtype=np.float64),
+        duration_max=np.array([t[2] for t in traffic.values()], dtype=np.float64),
+        hist=np.stack(hists),
+    )
+
+
+def run(engine: HealthEngine, minutes, traffic: dict) -> None:
+    """Append `minutes` identical minutes to the store and let the engine consume them."""
+    start = engine.rollups.watermark or START
+    blocks = {minute: block(engine.rollups, traffic) for minute in range(start, start + minutes)}
+    engine.rollups.replace(start, start + minutes, blocks)
+    engine.update()
+
+
+def status(engine: HealthEngine, service: str = "checkout") -> str:
+    return engine.snapshot[service].health_status
+
+
+def steady_engine() -> HealthEngine:
+    engine = HealthEngine(make_store())
+    run(engine, 90, {"checkout": (1000, 0, 20.0)})
+    assert status(engine) == "healthy"
+    return engine
+
+
+def test_services_are_healthy_until_warmed_up():
+    engine = HealthEngine(make_store())
+    run(engine, WARMUP_MINUTES - 2, {"checkout": (1000, 0, 20.0)})
+    run(engine, 1, {"checkout": (1000, 900, 5000.0)})
+    assert status(engine) == "healthy"
+    assert engine.snapshot["checkout"].latency_z == 0.0
+
+
+def test_latency_regression_is_critical():
+    engine = steady_engine()
+    run(engine, 5, {"checkout": (1000, 0, 400.0)})
+    assert status(engine) == "critical"
+    assert engine.snapshot["checkout"].latency_z >= 5
+
+
+def test_error_burst_is_flagged():
+    engine = steady_engine()
+    run(engine, 5, {"checkout": (1000, 200, 20.0)})
+    assert status(engine) == "critical"
+
+
+def test_traffic_surge_is_not_an_incident():
+    engine = steady_engine()
+    run(engine, 5, {"checkout": (3000, 0, 20.0)})
+    assert engine.snapshot["checkout"].throughput_z > 3
+    assert status(engine) == "healthy"
+
+
+def test_small_traffic_dip_is_not_an_incident():
+    engine = steady_engine()
+    run(engine, 10, {"checkout": (800, 0, 20.0)})
+    assert engine.snapshot["checkout"].throughput_z < -3
+    assert status(engine) == "healthy"
+
+
+def test_traffic_loss_is_a_warning():
+    engine = steady_engine()
+    run(engine, 10, {"checkout": (100, 0, 20.0)})
+    assert status(engine) == "warning"
+
+
+def test_seasonal_baseline_expects_the_usual_level_for_the_hour():
+    engine = HealthEngine(make_store())
+    # Two days of busy hour 0 and quiet hour 1: each hour-of-day slot learns its own level.
+    for _ in range(2):
+        run(engine, 60, {"checkout": (1000, 0, 20.0)})
+        run(engine, 60, {"checkout": (100, 0, 20.0)})
+        run(engine, 22 * 60, {"checkout": (500, 0, 20.0)})
+    run(engine, 60, {"checkout": (1000, 0, 20.0)})
+    run(engine, 30, {"checkout": (100, 0, 20.0)})
+    anomaly = engine.snapshot["checkout"]
+    assert anomaly.seasonal
+    assert anomaly.baseline_requests_per_minute < 200
+    assert status(engine) == "healthy"
+
+
+def test_scored_at_is_the_last_final_minute():
+    engine = steady_engine()
+    assert engine.scored_at == engine.snapshot["checkout"].updated_at
+
+
+def test_workers_scoring_the_same_data_share_an_etag():
+    first, second = steady_engine(), steady_engine()
+    first.version += 7
+    assert first.digest == second.digest
+    assert snapshot_etag("services/health", first.digest) == snapshot_etag("services/health", second.digest)
+
+    run(second, 5, {"checkout": (100, 0, 20.0)})
+    assert first.digest != second.digest
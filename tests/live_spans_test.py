@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from server.services import live_spans as live_spans_module
+from server.services.live_spans import LiveSpanBuffer, SpanBatch
+from server.services.timestamps import utcnow
+
+NOW = utcnow()
+
+
+class Index:
+    """The trace index as the live buffer sees it: a settled point and the traces it read."""
+
+    def __init__(self, settled, known):
+        self.settled = settled
+        self.ids = set(known)
+
+    def settled_until(self):
+        return self.settled
+
+    def known(self, trace_ids):
+        return self.ids & set(trace_ids)
+
+
+def spans(*traces) -> SpanBatch:
+    """One 1ms span per (trace_id, seconds ago)."""
+    starts = [int((NOW - timedelta(seconds=ago)).timestamp() * 1e9) for _, ago in traces]
+    return SpanBatch.from_columns({
+        "trace_id": [trace_id for trace_id, _ in traces],
+        "span_id": [f"s{i}" for i in range(len(traces))],
+        "parent_span_id": [""] * len(traces),
+        "service_name": ["checkout"] * len(traces),
+        "name": ["op"] * len(traces),
+        "start_ns": starts,
+        "end_ns": [start + 1_000_000 for start in starts],
+        "is_error": [False] * len(traces),
+    })
+
+
+def test_only_traces_the_warehouse_has_not_assembled_are_live(monkeypatch):
+    buffer = LiveSpanBuffer(retention_seconds=900, max_spans=1000)
+    buffer.add(spans(("settled", 600), ("indexed", 120), ("landing", 120), ("landing", 30), ("new", 10)))
+    index = Index(NOW - timedelta(seconds=300), known={"indexed"})
+    monkeypatch.setattr(live_spans_module, "trace_index", index)
+
+    live = buffer.spans_after_warehouse(900)
+    assert sorted(live.trace_id.tolist()) == ["landing", "landing", "new"]
@@ -0,0 +1,91 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server.routers import otlp
+from server.services.live_spans import ExportTooLarge, decode_export, gunzip
+
+EXPORT = {
+    "resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "checkout"}}]},
+        "scopeSpans": [{"spans": [{
+            "traceId": "0AF7651916CD43DD8448EB211C80319C",
+            "spanId": "B7AD6B7169203331",
+            "name": "GET /cart",
+            "startTimeUnixNano": "1700000000000000000",
+            "endTimeUnixNano": "1700000000250000000",
+        }]}],
+    }],
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    added = []
+    monkeypatch.setattr(otlp.live_spans, "add", added.append)
+    app = FastAPI()
+    app.include_router(otlp.router)
+    return TestClient(app), added
+
+
+def test_gunzip_round_trips_multiple_members():
+    body = gzip.compress(b"hello ") + gzip.compress(b"world")
+    assert gunzip(body, 1024) == b"hello world"
+
+
+def test_gunzip_stops_at_the_bound():
+    bomb = gzip.compress(b"\0" * (1024 * 1024))
+    with pytest.raises(ExportTooLarge):
+        gunzip(bomb, 64 * 1024)
+    assert len(gunzip(bomb, 1024 * 1024)) == 1024 * 1024
+
+
+def test_gunzip_rejects_truncated_bodies():
+    with pytest.raises(ValueError):
+        gunzip(gzip.compress(b"x" * 1000)[:-12], 1024)
+
+
+def test_gzipped_json_export_is_decoded():
+    batch = decode_export(gzip.compress(json.dumps(EXPORT).encode()), "application/json", "gzip")
+    assert batch.trace_id.tolist() == ["0af7651916cd43dd8448eb211c80319c"]
+    assert batch.service_name.tolist() == ["checkout"]
+
+
+def test_gzip_bomb_is_refused_with_413(client, monkeypatch):
+    http, added = client
+    monkeypatch.setattr(
+        otlp, "decode_export", lambda body, content_type, encoding: decode_export(body, content_type, encoding, 4096)
+    )
+    bomb = gzip.compress(b" " * (1024 * 1024))
+    response = http.post(
+        "/v1/traces", content=bomb, headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 413
+    assert added == []
+
+
+def test_export_reaches_the_live_buffer(client):
+    http, added = client
+    response = http.post("/v1/traces", json=EXPORT)
+    assert response.status_code == 200
+    assert len(added) == 1 and len(added[0]) == 1
+
+
+def test_oversized_body_is_refused_from_its_content_length(client, monkeypatch):
+    http, added = client
+    monkeypatch.setattr(otlp, "OTLP_MAX_BODY_BYTES", 1024)
+    response = http.post("/v1/traces", content=b" " * 2048, headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert added == []
+
+
+def test_chunked_body_is_refused_once_it_passes_the_limit(client, monkeypatch):
+    http, added = client
+    monkeypatch.setattr(otlp, "OTLP_MAX_BODY_BYTES", 1024)
+    chunks = iter([b" " * 512] * 8)
+    response = http.post("/v1/traces", content=chunks, headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert added == []
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import threading
+import time
+
+from server.services import progressive
+from server.services.progressive import progressive_ndjson
+
+
+def collect(stream) -> list:
+    async def run():
+        return [json.loads(line) async for line in stream]
+    return asyncio.run(run())
+
+
+def test_provisional_line_precedes_a_slow_exact_result():
+    def exact():
+        time.sleep(0.2)
+        return "exact"
+
+    lines = collect(progressive_ndjson([lambda: None, lambda: ("rollups", "coarse", 42.4)], exact, "key-1"))
+    assert lines == [
+        {"provisional": True, "source": "rollups", "data": "coarse", "age_seconds": 42},
+        {"provisional": False, "source": "warehouse", "data": "exact"},
+    ]
+    assert progressive.last_exact.get("key-1") == "exact"
+
+
+def test_slow_provisional_source_does_not_hold_back_the_exact_result():
+    release = threading.Event()
+
+    def slow_source():
+        release.wait(5)
+        return "sample", "coarse"
+
+    started = time.monotonic()
+    lines = collect(progressive_ndjson([slow_source], lambda: "exact", "key-2"))
+    elapsed = time.monotonic() - started
+    release.set()
+    assert lines == [{"provisional": False, "source": "warehouse", "data": "exact"}]
+    assert elapsed < 1
+
+
+def test_failed_exact_query_ends_the_stream_with_an_error():
+    def exact():
+        raise RuntimeError("warehouse down")
+
+    lines = collect(progressive_ndjson([], exact, "key-3"))
+    assert lines == [{"provisional": False, "error": "Query failed: warehouse down"}]
@@ -0,0 +1,125 @@
+import re
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from server.models.observability import ServiceHealth, TraceInfo
+from server.routers import services
+from server.services.live_spans import SpanBatch, live_spans
+from server.services.projection import parse_fields, placeholders, project
+from server.services.trace_pages import build_trace_page_query
+
+WAREHOUSE_ROW = {
+    "service_name": "checkout",
+    "current_latency_p50": "10.0",
+    "current_latency_p95": "20.0",
+    "current_latency_p99": "30.0",
+    "avg_duration_ms": "12.0",
+    "max_duration_ms": "40.0",
+    "error_count": "5",
+    "request_count": "10",
+    "error_rate": "0.5",
+    "requests_per_second": "0.01",
+}
+
+
+def selected_columns(query: str) -> list[str]:
+    return re.findall(r" as (\w+)", query.split("SELECT", 2)[-1])
+
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    """Fake the service list query: return the columns it selects and record the SQL."""
+    queries = []
+
+    def shared_rows(warehouse_manager, query, parameters=None):
+        queries.append(query)
+        return [{"service_name": "checkout", **{name: WAREHOUSE_ROW[name] for name in selected_columns(query)}}]
+
+    monkeypatch.setattr(services, "shared_rows", shared_rows)
+    return queries
+
+
+def live_span(monkeypatch, is_error: bool) -> None:
+    now = time.time_ns()
+    batch = SpanBatch.from_columns({
+        "trace_id": ["t1"],
+        "span_id": ["s1"],
+        "parent_span_id": [""],
+        "service_name": ["checkout"],
+        "name": ["op"],
+        "start_ns": [now - 2_000_000],
+        "end_ns": [now],
+        "is_error": [is_error],
+    })
+    monkeypatch.setattr(live_spans, "spans_after_warehouse", lambda seconds: batch)
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("error_rate,bogus", ServiceHealth)
+    assert error.value.status_code == 400
+
+
+def test_required_fields_are_always_selected():
+    assert parse_fields(" error_rate ,", ServiceHealth, ("service_name",)) == {"error_rate", "service_name"}
+    assert parse_fields(None, ServiceHealth) is None
+
+
+def test_projection_drops_placeholders():
+    fields = frozenset({"trace_id", "trace_start"})
+    trace = TraceInfo(trace_id="t", trace_start="2026-01-01 00:00:00", **placeholders(TraceInfo, fields))
+    assert project(trace, fields) == {"trace_id": "t", "trace_start": "2026-01-01 00:00:00"}
+
+
+def test_service_list_skips_percentiles_unless_requested(warehouse, monkeypatch):
+    live_span(monkeypatch, is_error=False)
+    fields = parse_fields("error_rate", ServiceHealth, services.SERVICE_LIST_REQUIRED)
+    services.exact_services(None, "1 HOUR", 3600, fields)
+    assert "PERCENTILE_CONT" not in warehouse[-1]
+
+    fields = parse_fields("current_latency_p95", ServiceHealth, services.SERVICE_LIST_REQUIRED)
+    services.exact_services(None, "1 HOUR", 3600, fields)
+    assert selected_columns(warehouse[-1]).count("current_latency_p95") == 1
+    assert "current_latency_p50" not in selected_columns(warehouse[-1])
+
+
+def test_live_merge_uses_warehouse_inputs_of_derived_fields(warehouse, monkeypatch):
+    live_span(monkeypatch, is_error=False)
+    fields = parse_fields("error_rate,avg_duration_ms", ServiceHealth, services.SERVICE_LIST_REQUIRED)
+    [service] = services.exact_services(None, "1 HOUR", 3600, fields)
+    assert service.request_count == 11
+    assert service.error_rate == pytest.approx(5 / 11)
+    assert service.avg_duration_ms == pytest.approx((12.0 * 10 + 2.0) / 11)
+
+
+def test_trace_listing_reads_only_selected_columns():
+    query, _ = build_trace_page_query("1 HOUR", 10, fields=frozenset({"trace_id", "trace_start", "span_count"}))
+    assert "span_count" in query
+    assert "services_involved" not in query
+    assert "total_trace_duration_ms" not in query
+
+
+def test_metrics_merge_uses_warehouse_inputs_of_derived_fields(monkeypatch):
+    queries = []
+    snapshot = {name.removeprefix("current_"): value for name, value in WAREHOUSE_ROW.items()}
+
+    def shared_rows(warehouse_manager, query, parameters=None):
+        queries.append(query)
+        if "time_bucket" in query:
+            return []
+        return [{name: snapshot[name] for name in selected_columns(query)}]
+
+    monkeypatch.setattr(services, "shared_rows", shared_rows)
+    monkeypatch.setattr(services, "WarehouseManager", lambda user_token=None: None)
+    live_span(monkeypatch, is_error=True)
+    app = FastAPI()
+    app.include_router(services.router)
+
+    response = TestClient(app).get("/checkout/metrics", params={"fields": "error_rate"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["current"] == {"error_rate": pytest.approx(6 / 11), "request_count": 11}
+    assert not any("PERCENTILE_CONT" in query for query in queries)
@@ -0,0 +1,158 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from server.services import rollups
+from server.services.rollups import RollupStore, bucket_index, minute_start
+from server.services.timestamps import format_timestamp, parse_timestamp
+
+START = 28_000_800
+
+
+class FakeWarehouse:
+    """Per-minute rollup rows, served for whatever [since, until) a refresh asks for."""
+
+    def __init__(self):
+        self.rows = {}
+        self.reads = []
+
+    def put(self, minute: int, service: str, count: int, errors: int = 0, duration_ms: float = 20.0) -> None:
+        self.rows.setdefault(minute, {})[service] = {
+            "minute": format_timestamp(minute_start(minute)),
+            "service_name": service,
+            "count": count,
+            "errors": errors,
+            "duration_sum": count * duration_ms,
+            "duration_max": duration_ms,
+            "bucket": bucket_index(duration_ms),
+        }
+
+    def shared_rows(self, warehouse_manager, query, parameters):
+        since = rollups.minute_of(parse_timestamp(parameters["since"]))
+        until = rollups.minute_of(parse_timestamp(parameters["until"]))
+        self.reads.append((since, until))
+        return [row for minute in range(since, until) for row in self.rows.get(minute, {}).values()]
+
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    fake = FakeWarehouse()
+    monkeypatch.setattr(rollups, "shared_rows", fake.shared_rows)
+    return fake
+
+
+def at(monkeypatch, minute: int, seconds: int = 0) -> None:
+    monkeypatch.setattr(rollups, "utcnow", lambda: minute_start(minute) + timedelta(seconds=seconds))
+
+
+def make_store(lateness_minutes: int = 15) -> RollupStore:
+    return RollupStore(
+        "test", lambda: "", lambda row: row["service_name"], retention_minutes=120, lateness_minutes=lateness_minutes
+    )
+
+
+def counts(store: RollupStore, service: str, start: int, end: int) -> dict:
+    key_id = store.find(service)
+    result = {}
+    for minute, block in store.blocks(start, end):
+        rows = [i for i, k in enumerate(block.key_ids) if k == key_id]
+        if rows:
+            result[minute] = (int(block.count[rows[0]]), int(block.errors[rows[0]]))
+    return result
+
+
+def test_first_refresh_loads_retention_up_to_the_current_minute(warehouse, monkeypatch):
+    for minute in range(START - 200, START + 10):
+        warehouse.put(minute, "checkout", 100)
+    at(monkeypatch, START + 10, seconds=30)
+    store = make_store()
+
+    assert store.refresh(None) == 120
+    assert warehouse.reads == [(START - 110, START + 10)]
+    assert store.watermark == START + 10
+    loaded = counts(store, "checkout", START - 300, START + 20)
+    # The current, still open minute is not loaded yet.
+    assert sorted(loaded) == list(range(START - 110, START + 10))
+
+
+def test_refresh_re_reads_the_lateness_window(warehouse, monkeypatch):
+    for minute in range(START, START + 30):
+        warehouse.put(minute, "checkout", 100)
+    at(monkeypatch, START + 30)
+    store = make_store(lateness_minutes=15)
+    store.refresh(None)
+
+    at(monkeypatch, START + 32)
+    assert store.refresh(None) == 17
+    assert warehouse.reads[-1] == (START + 15, START + 32)
+
+
+def test_late_minute_replaces_earlier_counts(warehouse, monkeypatch):
+    for minute in range(START, START + 30):
+        warehouse.put(minute, "checkout", 100, errors=1)
+    at(monkeypatch, START + 30)
+    store = make_store(lateness_minutes=15)
+    store.refresh(None)
+
+    # Spans for minute +20 land late; the warehouse now holds the complete minute.
+    warehouse.put(START + 20, "checkout", 160, errors=4)
+    warehouse.put(START + 20, "payments", 7)
+    at(monkeypatch, START + 31)
+    store.refresh(None)
+
+    checkout = counts(store, "checkout", START, START + 31)
+    assert checkout[START + 20] == (160, 4)
+    assert checkout[START + 19] == (100, 1)
+    assert sum(count for count, _ in checkout.values()) == 29 * 100 + 160
+    assert counts(store, "payments", START, START + 31) == {START + 20: (7, 0)}
+
+
+def test_minute_dropped_from_the_warehouse_is_cleared(warehouse, monkeypatch):
+    for minute in range(START, START + 30):
+        warehouse.put(minute, "checkout", 100)
+    at(monkeypatch, START + 30)
+    store = make_store(lateness_minutes=15)
+    store.refresh(None)
+
+    del warehouse.rows[START + 25]
+    at(monkeypatch, START + 31)
+    store.refresh(None)
+    assert START + 25 not in counts(store, "checkout", START, START + 31)
+
+
+def test_minutes_before_the_lateness_window_are_final(warehouse, monkeypatch):
+    for minute in range(START, START + 30):
+        warehouse.put(minute, "checkout", 100)
+    at(monkeypatch, START + 30)
+    store = make_store(lateness_minutes=15)
+    store.refresh(None)
+
+    warehouse.put(START + 5, "checkout", 999)
+    at(monkeypatch, START + 31)
+    store.refresh(None)
+    assert counts(store, "checkout", START + 5, START + 6) == {START + 5: (100, 0)}
+
+
+def test_retention_trims_old_minutes(warehouse, monkeypatch):
+    for minute in range(START, START + 130):
+        warehouse.put(minute, "checkout", 100)
+    at(monkeypatch, START + 100)
+    store = make_store()
+    store.refresh(None)
+    at(monkeypatch, START + 130)
+    store.refresh(None)
+    assert min(counts(store, "checkout", START - 10, START + 130)) == START + 10
+
+
+def test_minute_of_takes_naive_values_as_utc(monkeypatch):
+    # A local timezone other than UTC, so a naive value read as local time would be hours off.
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        aware = minute_start(START) + timedelta(seconds=59)
+        assert rollups.minute_of(aware) == START
+        assert rollups.minute_of(aware.replace(tzinfo=None)) == START
+    finally:
+        monkeypatch.undo()
+        time.tzset()
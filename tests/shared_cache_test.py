@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+
+import pytest
+
+from server.services import shared_cache as shared_cache_module
+from server.services import trace_details
+from server.services.shared_cache import SharedCache, private_directory, shared_rows
+from server.services.warehouse_manager import identity_of
+
+
+def make_cache(tmp_path, **kwargs) -> SharedCache:
+    return SharedCache(str(tmp_path / "cache" / "shared.sqlite3"), 1024 * 1024, **kwargs)
+
+
+def test_values_round_trip_as_json(tmp_path):
+    cache = make_cache(tmp_path)
+    rows = [{"service_name": "checkout", "request_count": "12", "error_rate": None}]
+    assert cache.set("rows", rows, 60)
+    assert cache.get("rows") == rows
+
+
+def test_values_that_are_not_json_are_not_stored(tmp_path):
+    cache = make_cache(tmp_path)
+    assert not cache.set("object", object(), 60)
+    assert cache.get("object") is None
+
+
+def test_cache_directory_is_private(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("key", 1, 60)
+    assert os.stat(tmp_path / "cache").st_mode & 0o077 == 0
+
+
+def test_directory_writable_by_others_is_refused(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        private_directory(str(directory))
+
+    cache = SharedCache(str(directory / "shared.sqlite3"), 1024 * 1024)
+    assert cache.get("key") is None
+    assert not cache.enabled
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() == 0, reason="needs a directory owned by another user")
+def test_directory_owned_by_another_user_is_refused():
+    with pytest.raises(PermissionError):
+        private_directory("/")
+
+
+def test_threads_of_one_worker_compute_once(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return [{"value": "1"}]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute, 60)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [[{"value": "1"}]] * 8
+
+
+def test_lease_is_exclusive_across_workers(tmp_path):
+    first = make_cache(tmp_path)
+    second = make_cache(tmp_path)
+    assert first.acquire("key")
+    assert not second.acquire("key")
+    first.release("key")
+    assert second.acquire("key")
+
+
+def test_waiting_worker_reads_the_leaseholder_value(tmp_path):
+    holder = make_cache(tmp_path)
+    waiter = make_cache(tmp_path)
+    assert holder.acquire("key")
+
+    def publish():
+        time.sleep(0.2)
+        holder.set("key", "shared", 60)
+        holder.release("key")
+
+    threading.Thread(target=publish).start()
+    assert waiter.get_or_compute("key", lambda: "computed", 60, lease_seconds=5) == "shared"
+
+
+def test_failed_computation_reaches_every_waiting_thread(tmp_path):
+    cache = make_cache(tmp_path)
+    release = threading.Event()
+
+    def compute():
+        release.wait()
+        raise RuntimeError("warehouse down")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute("key", compute, 60)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["warehouse down"] * 3
+    assert cache._flights == {}
+
+
+class FakeManager:
+    def __init__(self, user_token):
+        self.identity = identity_of(user_token)
+        self.user_token = user_token
+        self.queries = []
+
+    def execute_query(self, query, parameters=None):
+        self.queries.append(query)
+        return [{"caller": self.user_token}]
+
+    def iter_query(self, query, parameters=None):
+        self.queries.append(query)
+        ids = parameters.values()
+        if "traces_assembled_silver" in query:
+            return iter([{"trace_id": t, "trace_start": self.user_token} for t in ids])
+        return iter([])
+
+
+def test_identity_does_not_reveal_the_token():
+    assert identity_of(None) == identity_of("") == "app"
+    assert identity_of("alice-token") == identity_of("alice-token")
+    assert identity_of("alice-token") != identity_of("bob-token")
+    assert "alice-token" not in identity_of("alice-token")
+
+
+def test_shared_rows_are_not_served_to_another_caller(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache_module, "shared_cache", make_cache(tmp_path))
+    alice, bob = FakeManager("alice-token"), FakeManager("bob-token")
+    assert shared_rows(alice, "SELECT 1") == [{"caller": "alice-token"}]
+    assert shared_rows(bob, "SELECT 1") == [{"caller": "bob-token"}]
+    assert shared_rows(alice, "SELECT 1") == [{"caller": "alice-token"}]
+    assert len(alice.queries) == len(bob.queries) == 1
+
+
+def test_trace_details_are_scoped_by_caller(tmp_path, monkeypatch):
+    monkeypatch.setattr(trace_details, "shared_cache", make_cache(tmp_path))
+    monkeypatch.setattr(trace_details, "trace_detail_cache", trace_details.TTLCache(16, 60))
+    alice, bob = FakeManager("alice-token"), FakeManager("bob-token")
+    trace_details.prefetch_trace_details(alice, ["t1"])
+    assert trace_details.get_trace_detail(alice, "t1").trace_start == "alice-token"
+    assert trace_details.get_trace_detail(bob, "t1").trace_start == "bob-token"
+    assert len(alice.queries) == 2
+
+    state = trace_details.export_trace_details()
+    monkeypatch.setattr(trace_details, "trace_detail_cache", trace_details.TTLCache(16, 60))
+    assert trace_details.restore_trace_details(state)
+    assert (identity_of("alice-token"), "t1") in trace_details.trace_detail_cache
+    assert (identity_of("bob-token"), "t1") in trace_details.trace_detail_cache
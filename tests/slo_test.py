@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from server.models.observability import SloDefinition
+from server.services.rollups import BUCKET_COUNT, HISTOGRAM_DTYPE, MinuteBlock, RollupStore, bucket_index
+from server.services.slo import SloLedger
+
+START = 28_000_800
+
+AVAILABILITY = SloDefinition(name="checkout-available", service_name="checkout", kind="availability", objective=0.99)
+LATENCY = SloDefinition(
+    name="checkout-fast", service_name="checkout", kind="latency", objective=0.99, latency_threshold_ms=300
+)
+
+
+def make_ledger(*definitions: SloDefinition) -> SloLedger:
+    store = RollupStore(
+        "test", lambda: "", lambda row: row["service_name"], retention_minutes=3 * 24 * 60, lateness_minutes=0
+    )
+    ledger = SloLedger(store, history_minutes=3 * 24 * 60)
+    ledger.load(definitions)
+    return ledger
+
+
+def block(store: RollupStore, requests: int, errors: int, latency_ms: float) -> MinuteBlock:
+    hist = np.zeros((1, BUCKET_COUNT), dtype=HISTOGRAM_DTYPE)
+    hist[0, bucket_index(latency_ms)] = requests
+    return MinuteBlock(
+        key_ids=np.array([store.key_id("checkout")], dtype=np.int32),
+        count=np.array([requests], dtype=np.int64),
+        errors=np.array([errors], dtype=np.int64),
+        duration_sum=np.array([requests * latency_ms], dtype=np.float64),
+        duration_max=np.array([latency_ms], dtype=np.float64),
+        hist=hist,
+    )
+
+
+def run(ledger: SloLedger, minutes: int, requests: int, errors: int, latency_ms: float = 20.0) -> None:
+    """Append `minutes` identical minutes of checkout traffic and fold them into the ledger."""
+    store = ledger.rollups
+    start = store.watermark or START
+    blocks = {minute: block(store, requests, errors, latency_ms) for minute in range(start, start + minutes)}
+    store.replace(start, start + minutes, blocks)
+    ledger.update()
+
+
+def rates(status) -> dict:
+    return {rate.window: rate for rate in status.burn_rates}
+
+
+def test_short_error_burst_burns_only_the_short_window():
+    ledger = make_ledger(AVAILABILITY)
+    run(ledger, 60, 1000, 0)
+    run(ledger, 5, 1000, 200)
+    [status] = ledger.evaluate()
+    by_window = rates(status)
+
+    assert by_window["5m"].minutes_covered == 5
+    assert by_window["5m"].bad_count == 1000
+    assert by_window["5m"].burn_rate == pytest.approx(20.0)
+    assert by_window["1h"].minutes_covered == 60
+    assert by_window["1h"].total_count == 60_000
+    assert by_window["1h"].burn_rate == pytest.approx(1000 / 60_000 / 0.01)
+    # Longer windows hold every minute seen so far.
+    assert by_window["6h"].total_count == 65_000
+    assert by_window["3d"].burn_rate == pytest.approx(1000 / 65_000 / 0.01)
+    assert status.budget_remaining == pytest.approx(1 - 1000 / 65_000 / 0.01)
+    # 1h is under 14.4x, so only the slow-burn warning policy fires.
+    assert status.status == "warning"
+    assert status.alerts == ["warning: burn rate above 1x over 3d and 6h"]
+
+
+def test_sustained_errors_are_critical():
+    ledger = make_ledger(AVAILABILITY)
+    run(ledger, 65, 1000, 200)
+    [status] = ledger.evaluate()
+    assert all(rate.burn_rate == pytest.approx(20.0) for rate in status.burn_rates)
+    assert status.status == "critical"
+    assert len(status.alerts) == 3
+
+
+def test_clean_traffic_keeps_the_budget():
+    ledger = make_ledger(AVAILABILITY)
+    run(ledger, 120, 1000, 5)
+    [status] = ledger.evaluate()
+    assert rates(status)["1h"].burn_rate == pytest.approx(0.5)
+    assert status.budget_remaining == pytest.approx(0.5)
+    assert status.status == "ok"
+    assert status.alerts == []
+
+
+def test_latency_slo_counts_slow_requests_as_bad():
+    ledger = make_ledger(AVAILABILITY, LATENCY)
+    run(ledger, 55, 1000, 0, latency_ms=20.0)
+    run(ledger, 5, 1000, 0, latency_ms=5000.0)
+    available, fast = ledger.evaluate()
+    assert rates(available)["5m"].bad_count == 0
+    assert rates(fast)["5m"].bad_count == 5000
+    assert rates(fast)["1h"].bad_count == 5000
+    assert rates(fast)["1h"].total_count == 60_000
+
+
+def test_incremental_updates_match_a_single_backfill():
+    incremental = make_ledger(AVAILABILITY)
+    for errors in (0, 30, 0, 300, 10):
+        run(incremental, 20, 1000, errors)
+
+    backfilled = make_ledger(AVAILABILITY)
+    blocks = {}
+    for i, errors in enumerate((0, 30, 0, 300, 10)):
+        for minute in range(START + 20 * i, START + 20 * (i + 1)):
+            blocks[minute] = block(backfilled.rollups, 1000, errors, 20.0)
+    backfilled.rollups.replace(START, START + 100, blocks)
+    backfilled.update()
+
+    assert incremental.evaluate()[0].burn_rates == backfilled.evaluate()[0].burn_rates
+
+
+def test_unknown_service_and_no_data_report_ok():
+    ledger = make_ledger(SloDefinition(name="ghost", service_name="ghost", kind="availability", objective=0.9))
+    [status] = ledger.evaluate()
+    assert status.status == "ok" and status.burn_rates == []
+    run(ledger, 10, 1000, 500)
+    [status] = ledger.evaluate()
+    assert all(rate.total_count == 0 and rate.burn_rate == 0.0 for rate in status.burn_rates)
+    assert status.status == "ok"
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from server.models.observability import TraceInfo
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.top_traces import SLOT_LEVELS, TopTraceTracker
+
+NOW = utcnow().replace(microsecond=0)
+
+
+def trace(trace_id: str, duration_ms: float, seconds_ago: float, services=("checkout",)) -> TraceInfo:
+    return TraceInfo(
+        trace_id=trace_id,
+        trace_start=format_timestamp(NOW - timedelta(seconds=seconds_ago)),
+        services_involved=list(services),
+        total_duration_ms=duration_ms,
+        span_count=1,
+    )
+
+
+def slowest(tracker: TopTraceTracker, seconds: int = 3600) -> list:
+    return [(t.trace_id, t.total_duration_ms) for t in tracker.slowest("checkout", seconds, tracker.k)]
+
+
+def test_newer_copy_in_another_slot_replaces_the_older_one():
+    tracker = TopTraceTracker(k=5)
+    tracker.add(trace("t1", 10.0, seconds_ago=60), has_error=False)
+    tracker.add(trace("t1", 5000.0, seconds_ago=1000), has_error=False)
+    assert slowest(tracker) == [("t1", 5000.0)]
+    assert slowest(tracker, seconds=SLOT_LEVELS[-1][1]) == [("t1", 5000.0)]
+
+
+def test_changed_copy_in_the_same_slot_replaces_the_older_one():
+    tracker = TopTraceTracker(k=2)
+    tracker.add(trace("t1", 10.0, seconds_ago=60), has_error=False)
+    tracker.add(trace("t2", 20.0, seconds_ago=60), has_error=False)
+    tracker.add(trace("t1", 30.0, seconds_ago=60), has_error=False)
+    assert slowest(tracker) == [("t1", 30.0), ("t2", 20.0)]
+
+
+def test_slowest_keeps_the_k_slowest_per_window():
+    tracker = TopTraceTracker(k=3)
+    for i in range(6):
+        tracker.add(trace(f"t{i}", float(i), seconds_ago=600 * i + 30), has_error=False)
+    assert slowest(tracker) == [("t5", 5.0), ("t4", 4.0), ("t3", 3.0)]
+    assert slowest(tracker, seconds=900) == [("t1", 1.0), ("t0", 0.0)]
+
+
+def test_backfill_ranks_the_last_hour_per_minute(monkeypatch):
+    queries = []
+
+    class Warehouse:
+        def iter_query(self, query, parameters):
+            queries.append((query, parameters))
+            return iter([])
+
+    tracker = TopTraceTracker(k=5)
+    tracker.refresh(Warehouse())
+    [(query, parameters)] = queries
+    assert "FLOOR(unix_timestamp(trace_start) / 60) as slot_0" in query
+    assert "PARTITION BY service_name, slot_0" in query
+    assert "slow_rank_0 <= 5" in query
+    for level, (_, retention) in enumerate(SLOT_LEVELS):
+        since = utcnow() - timedelta(seconds=retention)
+        assert abs((since - parse_timestamp(parameters[f"since_{level}"])).total_seconds()) < 5
+
+
+def test_amended_assembled_trace_updates_its_entry():
+    tracker = TopTraceTracker(k=5)
+    tracker.add_assembled(trace("t1", 10.0, seconds_ago=60), has_error=False)
+    tracker.add_assembled(trace("t1", 250.0, seconds_ago=90), has_error=True)
+    assert slowest(tracker) == [("t1", 250.0)]
+    assert [t.trace_id for t in tracker.recent_errors("checkout", 3600, 5)] == ["t1"]
+
+
+def test_warehouse_copy_is_authoritative_over_the_assembled_one():
+    tracker = TopTraceTracker(k=5)
+    tracker.add_assembled(trace("t1", 900.0, seconds_ago=60), has_error=True)
+    tracker.add(trace("t1", 400.0, seconds_ago=60), has_error=False)
+    assert slowest(tracker) == [("t1", 400.0)]
+    assert tracker.recent_errors("checkout", 3600, 5) == []
+
+    # A late amendment from the assembler does not undo the warehouse copy.
+    tracker.add_assembled(trace("t1", 950.0, seconds_ago=60), has_error=True)
+    assert slowest(tracker) == [("t1", 400.0)]
@@ -0,0 +1,57 @@
+import time
+
+from server.services.trace_analysis import Span, _link, analyze_spans
+
+
+def span(span_id: str, parent: str = None, start: float = 0.0, duration: float = 10.0) -> Span:
+    return Span(span_id, parent, span_id, "svc", start, duration, False)
+
+
+def test_tree_links_parents_children_and_depth():
+    spans = [span("a"), span("b", "a", 1), span("c", "a", 2), span("d", "b", 3)]
+    parent, children, order, depth = _link(spans)
+    assert parent == [-1, 0, 0, 1]
+    assert children == [[1, 2], [3], [], []]
+    assert order == [0, 1, 2, 3]
+    assert depth == [0, 1, 1, 2]
+
+
+def test_missing_parent_and_self_parent_become_roots():
+    spans = [span("a", "gone"), span("b", "b"), span("c", "b")]
+    parent, _children, order, depth = _link(spans)
+    assert parent == [-1, -1, 1]
+    assert sorted(order) == [0, 1, 2]
+    assert depth == [0, 0, 1]
+
+
+def test_parent_cycle_is_cut_once():
+    # a -> b -> c -> a, with d hanging off the cycle.
+    spans = [span("d", "a"), span("a", "c"), span("b", "a"), span("c", "b")]
+    parent, children, order, depth = _link(spans)
+    assert parent.count(-1) == 1
+    assert sorted(order) == [0, 1, 2, 3]
+    assert sum(len(kids) for kids in children) == 3
+    root = parent.index(-1)
+    assert depth[root] == 0
+    assert all(depth[i] == depth[parent[i]] + 1 for i in range(4) if i != root)
+
+
+def test_many_cycles_link_in_linear_time():
+    pairs = 20_000
+    spans = []
+    for i in range(pairs):
+        spans += [span(f"{i}a", f"{i}b", start=i), span(f"{i}b", f"{i}a", start=i)]
+    started = time.perf_counter()
+    parent, _children, order, depth = _link(spans)
+    assert time.perf_counter() - started < 2.0
+    assert parent.count(-1) == pairs
+    assert len(order) == 2 * pairs
+    assert max(depth) == 1
+
+
+def test_analysis_survives_cycles():
+    spans = [span("a", "b", 0, 100), span("b", "a", 10, 50)]
+    analysis = analyze_spans("t", spans)
+    assert analysis.span_count == 2
+    assert sorted(analysis.waterfall.depth) == [0, 1]
+    assert sum(analysis.waterfall.critical_path_ms) == 100
@@ -0,0 +1,60 @@
+import time
+
+from server.services.live_spans import SpanBatch
+from server.services.trace_assembler import NANOS_PER_SECOND, TraceAssembler
+
+SECOND = NANOS_PER_SECOND
+
+
+def spans(*rows) -> SpanBatch:
+    """SpanBatch from (trace_id, span_id, service_name, start_ns, end_ns) rows."""
+    return SpanBatch.from_columns({
+        "trace_id": [row[0] for row in rows],
+        "span_id": [row[1] for row in rows],
+        "parent_span_id": ["" for _ in rows],
+        "service_name": [row[2] for row in rows],
+        "name": ["op" for _ in rows],
+        "start_ns": [row[3] for row in rows],
+        "end_ns": [row[4] for row in rows],
+        "is_error": [False for _ in rows],
+    })
+
+
+def make_assembler() -> TraceAssembler:
+    return TraceAssembler(inactivity_seconds=30, lateness_seconds=10, max_open=1000, max_closed=1000)
+
+
+def test_span_from_the_future_does_not_advance_the_watermark():
+    assembler = make_assembler()
+    now = time.time_ns()
+    assembler.add(spans(("skewed", "a", "clock", now, now + 3600 * SECOND)))
+    assert assembler.watermark_ns <= time.time_ns()
+
+    assembler.add(spans(("normal", "b", "checkout", now - 2 * SECOND, now - SECOND)))
+    assert assembler.late_dropped == 0
+    assert "normal" in assembler._open
+
+
+def test_spans_behind_the_watermark_are_dropped():
+    assembler = make_assembler()
+    now = time.time_ns()
+    assembler.add(spans(("recent", "a", "checkout", now - 2 * SECOND, now)))
+    assembler.add(spans(("stale", "b", "checkout", now - 120 * SECOND, now - 100 * SECOND)))
+    assert assembler.late_dropped == 1
+    assert "stale" not in assembler._open
+
+
+def test_watermark_closes_traces_past_the_inactivity_gap():
+    assembler = make_assembler()
+    closed = []
+    assembler.subscribe(lambda trace, has_error: closed.append(trace))
+    now = time.time_ns()
+    assembler.add(spans(
+        ("old", "a", "checkout", now - 60 * SECOND, now - 59 * SECOND),
+        ("old", "b", "payments", now - 60 * SECOND, now - 58 * SECOND),
+    ))
+    assembler.add(spans(("new", "c", "checkout", now - SECOND, now)))
+    assert [trace.trace_id for trace in closed] == ["old"]
+    assert closed[0].services_involved == ["checkout", "payments"]
+    assert closed[0].span_count == 2
+    assert closed[0].total_duration_ms == 2000.0
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+import pytest
+
+from server.models.observability import TraceInfo
+from server.services import trace_index as trace_index_module
+from server.services.timestamps import format_timestamp, parse_timestamp, utcnow
+from server.services.trace_index import RecentTraceIndex, provisional_since, service_trace_rows
+from server.services.trace_pages import decode_cursor, encode_cursor, paginate
+
+NOW = utcnow().replace(microsecond=0)
+
+
+def trace(trace_id: str, minutes_ago: float, services=("checkout",)) -> TraceInfo:
+    return TraceInfo(
+        trace_id=trace_id,
+        trace_start=format_timestamp(NOW - timedelta(minutes=minutes_ago)),
+        services_involved=list(services),
+        total_duration_ms=1.0,
+        span_count=1,
+    )
+
+
+def sort_key(t: TraceInfo):
+    return parse_timestamp(t.trace_start), t.trace_id
+
+
+class FakeWarehouse:
+    """traces_assembled_silver as a list; only rows that have "landed" are visible."""
+
+    def __init__(self, traces):
+        self.traces = list(traces)
+        self.pages = 0
+
+    def iter_query(self, query, parameters):
+        since = parse_timestamp(parameters["since"])
+        for t in sorted(self.traces, key=sort_key):
+            if parse_timestamp(t.trace_start) > since:
+                yield {**t.model_dump(), "has_error": False}
+
+    def fetch_trace_page(self, warehouse_manager, interval, limit, cursor=None, service_name=None):
+        self.pages += 1
+        rows = [t for t in self.traces if service_name in t.services_involved]
+        rows = [t for t in rows if parse_timestamp(t.trace_start) >= NOW - timedelta(hours=1)]
+        if cursor is not None:
+            start, trace_id = decode_cursor(cursor)
+            rows = [t for t in rows if sort_key(t) < (parse_timestamp(start), trace_id)]
+        return iter(sorted(rows, key=sort_key, reverse=True)[: limit + 1])
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    warehouse = FakeWarehouse([trace(f"t{i:03d}", minutes_ago=i) for i in range(0, 120, 3)])
+    index = RecentTraceIndex(window_seconds=1800, max_traces=10_000, lateness_seconds=300)
+    index.refresh(warehouse)
+    monkeypatch.setattr(trace_index_module, "trace_index", index)
+    monkeypatch.setattr(trace_index_module, "fetch_trace_page", warehouse.fetch_trace_page)
+    return warehouse, index
+
+
+def all_pages(warehouse, limit):
+    cursor, seen = None, []
+    while True:
+        rows = service_trace_rows(warehouse, "checkout", "1 HOUR", 3600, limit, cursor)
+        page, cursor = paginate(rows, limit)
+        seen.extend(t.trace_id for t in page)
+        if cursor is None:
+            return seen
+
+
+def test_cursor_round_trips():
+    start, trace_id = "2026-01-01T00:00:00Z", "abc123"
+    assert decode_cursor(encode_cursor(start, trace_id)) == (start, trace_id)
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 100])
+def test_pages_match_the_warehouse_listing(setup, limit):
+    warehouse, _ = setup
+    expected = [t.trace_id for t in sorted(warehouse.traces, key=sort_key, reverse=True)
+                if parse_timestamp(t.trace_start) >= NOW - timedelta(hours=1)]
+    assert all_pages(warehouse, limit) == expected
+
+
+def test_first_page_is_served_from_memory_and_marked_provisional(setup):
+    warehouse, index = setup
+    rows = list(service_trace_rows(warehouse, "checkout", "1 HOUR", 3600, 5))
+    assert [t.trace_id for t in rows] == ["t000", "t003", "t006", "t009", "t012", "t015"]
+    assert warehouse.pages == 0
+    assert provisional_since() == index.settled_until()
+
+
+def test_trace_landing_after_the_feed_passed_it_is_listed_after_a_refresh(setup):
+    warehouse, index = setup
+    # Assembled late: starts 2 minutes ago, behind the feed's newest trace_start.
+    late = trace("late", minutes_ago=2)
+    warehouse.traces.append(late)
+    assert parse_timestamp(late.trace_start) >= provisional_since()
+    assert "late" not in all_pages(warehouse, limit=5)
+
+    index.refresh(warehouse)
+    assert "late" in all_pages(warehouse, limit=5)
+
+
+def test_cold_index_is_not_provisional(monkeypatch):
+    monkeypatch.setattr(trace_index_module, "trace_index", RecentTraceIndex(1800, 10_000, 300))
+    assert provisional_since() is None
@@ -0,0 +1,36 @@
+from server.models.observability import TraceInfo
+from server.services.trace_pages import decode_cursor, iter_ndjson, paginate, tee_trace_ids
+
+
+def trace(trace_id: str, second: int) -> TraceInfo:
+    return TraceInfo(
+        trace_id=trace_id,
+        trace_start=f"2026-01-01T00:00:{59 - second:02d}Z",
+        services_involved=["checkout"],
+        total_duration_ms=1.0,
+        span_count=1,
+    )
+
+
+ROWS = [trace(f"t{i}", i) for i in range(4)]
+
+
+def test_prefetch_ids_exclude_the_look_ahead_row():
+    trace_ids = []
+    page, cursor = paginate(tee_trace_ids(iter(ROWS), trace_ids, 3), 3)
+    assert [t.trace_id for t in page] == trace_ids == ["t0", "t1", "t2"]
+    assert decode_cursor(cursor)[1] == "t2"
+
+
+def test_ndjson_prefetch_ids_exclude_the_look_ahead_row():
+    trace_ids = []
+    lines = list(iter_ndjson(tee_trace_ids(iter(ROWS), trace_ids, 3), 3))
+    assert len(lines) == 4
+    assert trace_ids == ["t0", "t1", "t2"]
+
+
+def test_last_page_records_every_row():
+    trace_ids = []
+    page, cursor = paginate(tee_trace_ids(iter(ROWS[:2]), trace_ids, 3), 3)
+    assert cursor is None
+    assert trace_ids == ["t0", "t1"]
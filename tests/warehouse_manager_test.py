@@ -0,0 +1,27 @@
+from server.services import warehouse_manager as warehouse_manager_module
+from server.services.cache import TTLCache
+from server.services.warehouse_manager import WarehouseManager, identity_of
+
+
+def manager(user_token, warehouse_id, detections) -> WarehouseManager:
+    """A manager whose auto-detection picks `warehouse_id`, without building an SDK client."""
+    wm = WarehouseManager.__new__(WarehouseManager)
+    wm.identity = identity_of(user_token)
+    wm._warehouse_id = None
+
+    def detect():
+        detections.append(user_token)
+        return warehouse_id
+
+    wm._auto_detect_warehouse = detect
+    return wm
+
+
+def test_detected_warehouse_is_cached_per_identity(monkeypatch):
+    monkeypatch.setattr(warehouse_manager_module, "_detected_warehouse_ids", TTLCache(16, 60))
+    detections = []
+    assert manager("alice-token", "wh-a", detections).get_warehouse_id() == "wh-a"
+    assert manager("bob-token", "wh-b", detections).get_warehouse_id() == "wh-b"
+    assert manager("alice-token", "wh-other", detections).get_warehouse_id() == "wh-a"
+    assert manager(None, "wh-app", detections).get_warehouse_id() == "wh-app"
+    assert detections == ["alice-token", "bob-token", None]